@@ -12,6 +12,7 @@ from functools import partial
 from more_itertools import all_equal, ilen
 
 from ..utils.formats import pluralize
+from ..utils.memberstats import get_member_counts
 from ..utils.misc import emoji_url
 from ..utils.paginator import Paginator, FieldPaginator
 from ..utils.time import human_timedelta
@@ -237,9 +238,10 @@ class Stats:
         return guild_count_string[0] in {'1', '5'} and set(guild_count_string[1:]) == {'0'}
 
     async def send_guild_stats(self, guild, colour, header, *, check_bot_farm=True):
-        bots = sum(m.bot for m in guild.members)
+        counts = get_member_counts(self.bot, guild)
+        bots = counts.bots
         total = guild.member_count
-        online = sum(m.status is discord.Status.online for m in guild.members)
+        online = counts.online
 
         guild_count = self.bot.guild_count
         guild_count_message = f'Now in **{guild_count}** servers!'
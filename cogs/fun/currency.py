@@ -1,9 +1,18 @@
+import array
+import asyncio
+import bisect
 import collections
+import contextlib
+import datetime
 import discord
 import enum
+import glob
 import io
+import logging
 import math
+import os
 import random
+import uuid
 
 from discord.ext import commands
 from PIL import Image
@@ -11,8 +20,12 @@ from PIL import Image
 from ..utils.converter import union
 from ..utils.examples import get_example, wrap_example
 from ..utils.formats import pluralize
+from ..utils.jsonf import JSONS_PATH
+from ..utils.paginator import KeysetPaginator
 from ..utils.time import duration_units
 
+log = logging.getLogger(__name__)
+
 
 __schema__ = """
     CREATE TABLE IF NOT EXISTS currency (
@@ -40,11 +53,22 @@ __schema__ = """
         amount INTEGER NOT NULL
     );
 
+    -- Batches of balance changes that have been written from the balance
+    -- cache, so a batch is never applied twice when replaying the journal.
+    CREATE TABLE IF NOT EXISTS currency_flushes (
+        id TEXT PRIMARY KEY,
+        flushed_at TIMESTAMP NOT NULL DEFAULT (now() at time zone 'utc')
+    );
+
+    -- For the leaderboard and ranks. user_id is there to break ties.
+    CREATE INDEX IF NOT EXISTS currency_amount_idx ON currency (amount DESC, user_id DESC);
+
 """
 
 
 # Cooldown for ->daily$
 DAILY_CASH_COOLDOWN_TIME = 60 * 60 * 24
+DAILY_CASH_COOLDOWN = datetime.timedelta(seconds=DAILY_CASH_COOLDOWN_TIME)
 # minimum account age in days before one can use ->give or ->daily$
 MINIMUM_ACCOUNT_AGE = 7
 MINIMUM_ACCOUNT_AGE_IN_SECONDS = MINIMUM_ACCOUNT_AGE * 24 * 60 * 60
@@ -111,6 +135,498 @@ class _DummyUser(collections.namedtuple('_DummyUser', 'id')):
         return f'<Unknown User | ID: {self.id}>'
 
 
+# The widest (in pixels) the image from ->flip <number> can get. Coins are
+# scaled down to fit, Discord shrinks big images anyway so anything bigger
+# would just be wasted encoding time.
+MAX_FLIP_IMAGE_WIDTH = 640
+
+# Where pending balance changes are written to before they're flushed.
+JOURNAL_PATH = f'{JSONS_PATH}currency-journal'
+# How often (in seconds) the pending balance changes are written to the db.
+FLUSH_INTERVAL = 10
+# Longest to wait (in seconds) before trying to replay the journals again.
+REPLAY_MAX_RETRY_DELAY = 300
+# Whether or not to keep every balance in memory for ->leaderboard rank.
+# Turn this off if memory is tight, ranks will be counted in the db instead.
+USE_RANK_INDEX = True
+
+
+def _read_journal(path):
+    deltas = collections.defaultdict(int)
+    with open(path) as f:
+        for line in f:
+            try:
+                user_id, delta = map(int, line.split())
+            except ValueError:
+                # Probably a partially-written line from a crash. Nothing
+                # was applied from it so we can safely skip it.
+                continue
+            deltas[user_id] += delta
+    return deltas
+
+
+class _RankIndex:
+    """Every positive balance, sorted, so someone's rank can be found
+    with a binary search rather than counting everyone richer than them.
+
+    The amounts are stored in an array to keep the memory down. Updates
+    have to shift the array around, but that's a memmove which is cheap
+    compared to going to the db.
+    """
+    __slots__ = ('_amounts',)
+
+    def __init__(self, amounts=()):
+        self._amounts = array.array('q', sorted(amounts))
+
+    def __len__(self):
+        return len(self._amounts)
+
+    def _discard(self, amount):
+        amounts = self._amounts
+        index = bisect.bisect_left(amounts, amount)
+        if index < len(amounts) and amounts[index] == amount:
+            del amounts[index]
+
+    def update(self, old, new):
+        if old == new:
+            return
+        if old > 0:
+            self._discard(old)
+        if new > 0:
+            bisect.insort(self._amounts, new)
+
+    def rank(self, amount):
+        """Returns the rank someone with the given amount would have.
+
+        People with the same amount share the same rank.
+        """
+        return len(self._amounts) - bisect.bisect_right(self._amounts, amount) + 1
+
+
+class _BalanceCache:
+    """Write-back cache for everyone's balances.
+
+    Gambling commands change the same few balances over and over again in
+    a short time, so rather than hitting the db every time, the balances
+    are kept in memory and changes are written in one batch every now and
+    then.
+
+    Every change is appended to a journal before it's applied, so if the
+    bot crashes before a flush, the changes are replayed on the next start.
+    Each flushed batch is recorded in currency_flushes, so a batch is never
+    applied twice.
+
+    Transfers don't go through the journal, they're done in the db in one
+    statement along with the give log, so the money can't move without
+    being logged.
+    """
+
+    def __init__(self, bot, *, journal=JOURNAL_PATH, flush_interval=FLUSH_INTERVAL):
+        self.bot = bot
+        self._journal_path = journal
+        self._journal = None
+
+        self._balances = {}
+        self._deltas = {}
+        # Batches that have been taken out of the journal but haven't
+        # been written to the db yet (usually because the write failed).
+        self._unflushed = []
+        self._touched = set()
+        # Only built once someone asks for their rank.
+        self._ranks = None
+        self._ranks_lock = asyncio.Lock()
+
+        self._locks = collections.defaultdict(asyncio.Lock)
+        self._flush_lock = asyncio.Lock()
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._task = bot.loop.create_task(self._run(flush_interval))
+
+    # ------- Journal stuffs -------
+
+    def _batch_path(self, batch_id):
+        return f'{self._journal_path}.{batch_id}'
+
+    def _rotate_journal(self):
+        batch_id = uuid.uuid4().hex
+        if self._journal is not None:
+            self._journal.close()
+
+        if os.path.exists(self._journal_path):
+            os.replace(self._journal_path, self._batch_path(batch_id))
+
+        self._journal = open(self._journal_path, 'a')
+        return batch_id
+
+    async def _write_batch(self, batch_id, deltas):
+        user_ids, amounts = zip(*deltas.items())
+        async with self.bot.pool.acquire() as connection, connection.transaction():
+            query = """INSERT INTO currency_flushes (id) VALUES ($1)
+                       ON CONFLICT (id) DO NOTHING
+                       RETURNING id;
+                    """
+            if await connection.fetchval(query, batch_id) is None:
+                # Already written, we must've crashed before removing the journal.
+                return
+
+            query = """INSERT INTO currency (user_id, amount)
+                       SELECT * FROM unnest($1::BIGINT[], $2::INTEGER[])
+                       ON CONFLICT (user_id)
+                       DO UPDATE SET amount = currency.amount + EXCLUDED.amount;
+                    """
+            await connection.execute(query, list(user_ids), list(amounts))
+
+    async def _replay_journals(self):
+        self._rotate_journal()
+
+        for path in glob.glob(self._batch_path('*')):
+            deltas = _read_journal(path)
+            if deltas:
+                await self._write_batch(path.rpartition('.')[2], deltas)
+            # The old cache might've been in the middle of flushing this one.
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+        query = "DELETE FROM currency_flushes WHERE flushed_at < (now() at time zone 'utc') - INTERVAL '7 days';"
+        await self.bot.pool.execute(query)
+
+    async def _run(self, interval):
+        # Nothing can touch a balance until the journals are replayed, so
+        # keep trying rather than leaving everyone waiting on _ready forever.
+        delay = 0
+        while True:
+            try:
+                await self._replay_journals()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                delay = min(max(delay * 2, 5), REPLAY_MAX_RETRY_DELAY)
+                log.exception('Failed to replay the balance journals, trying again in %d seconds.', delay)
+                await asyncio.sleep(delay)
+            else:
+                break
+
+        self._ready.set()
+
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception('Failed to flush balances, will try again later.')
+
+    # ------- Flushing --------
+
+    def _evict(self):
+        # Only keep the balances that were used since the last flush. The
+        # ones with pending changes must be kept, otherwise they'd be
+        # reloaded from the db without those changes.
+        keep = self._touched.union(self._deltas, *(d for _, d in self._unflushed))
+        for user_id in list(self._balances):
+            if user_id not in keep and not self._locks[user_id].locked():
+                del self._balances[user_id]
+                self._locks.pop(user_id, None)
+
+        self._touched.clear()
+
+    async def flush(self):
+        """Writes all pending changes to the db."""
+        await self._ready.wait()
+        async with self._flush_lock:
+            if self._deltas:
+                # No awaits here, the journal must have exactly what's in the batch.
+                deltas, self._deltas = self._deltas, {}
+                self._unflushed.append((self._rotate_journal(), deltas))
+
+            while self._unflushed:
+                batch_id, deltas = self._unflushed[0]
+                await self._write_batch(batch_id, deltas)
+                del self._unflushed[0]
+                # A new cache might've replayed (and removed) it already.
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self._batch_path(batch_id))
+
+            self._evict()
+
+    async def close(self):
+        if self._closed:
+            return
+
+        self._closed = True
+        self._task.cancel()
+        if not self._ready.is_set():
+            # Never got to start, so everything is still in the journal.
+            return
+
+        try:
+            await self.flush()
+        finally:
+            self._journal.close()
+
+    def detach(self):
+        """Stops the cache without writing anything, leaving the pending
+        changes in the journal for the next cache to replay.
+
+        This is for when the cog is unloaded, as we can't wait for a flush
+        there. The next cache replays the journal before it reads anything,
+        so it won't see balances from before the changes.
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        self._task.cancel()
+        if self._journal is None:
+            return
+
+        # No awaits here, everything pending has to end up in a batch file.
+        self._rotate_journal()
+        self._journal.close()
+
+    # ------- Balance stuffs --------
+
+    async def _load(self, user_id):
+        # Must be called with the user's lock held.
+        try:
+            return self._balances[user_id]
+        except KeyError:
+            pass
+
+        query = 'SELECT amount FROM currency WHERE user_id = $1;'
+        amount = self._balances[user_id] = await self.bot.pool.fetchval(query, user_id) or 0
+        return amount
+
+    def _set(self, user_id, delta):
+        old = self._balances[user_id]
+        self._balances[user_id] = old + delta
+        if self._ranks is not None:
+            self._ranks.update(old, old + delta)
+        self._touched.add(user_id)
+
+    def _apply(self, user_id, delta):
+        # Must be called with the user's lock held, after _load.
+        self._journal.write(f'{user_id} {delta}\n')
+        self._journal.flush()
+
+        self._set(user_id, delta)
+        self._deltas[user_id] = self._deltas.get(user_id, 0) + delta
+
+    async def get(self, user_id):
+        await self._ready.wait()
+        async with self._locks[user_id]:
+            self._touched.add(user_id)
+            return await self._load(user_id)
+
+    async def change(self, user_id, delta, *, required=None):
+        """Adds delta to a user's balance, but only if they have at least
+        required (if given).
+
+        Returns the new balance, or None if they didn't have enough.
+        """
+        await self._ready.wait()
+        async with self._locks[user_id]:
+            balance = await self._load(user_id)
+            if required is not None and balance < required:
+                return None
+
+            self._apply(user_id, delta)
+            return balance + delta
+
+    async def change_in_db(self, user_id, update):
+        """Runs update, a coroutine function that changes a user's balance
+        in the db directly, keeping the cached balance in sync.
+
+        update should return the amount the balance was changed by, or 0 if
+        it wasn't changed. This is for when a balance change has to be in
+        the same statement as something else.
+        """
+        await self._ready.wait()
+        async with self._locks[user_id]:
+            await self._load(user_id)
+            delta = await update()
+            if delta:
+                self._set(user_id, delta)
+            return delta
+
+    async def transfer(self, giver_id, recipient_id, amount):
+        """Moves money from one user to another and logs it in the give log.
+
+        Returns the giver's new balance, or None if they didn't have enough.
+        """
+        if giver_id == recipient_id:
+            raise ValueError("can't transfer money to the same user")
+
+        await self._ready.wait()
+        # Always lock in the same order so two opposite transfers can't deadlock.
+        first, second = sorted((giver_id, recipient_id))
+        async with self._locks[first], self._locks[second]:
+            balance = await self._load(giver_id)
+            if balance < amount:
+                return None
+
+            await self._load(recipient_id)
+
+            # The db has to have both balances before it can do the transfer.
+            # Nothing else can change them while we hold their locks.
+            await self.flush()
+
+            # Also add it to the give log. This is so we can detect someone using
+            # alts to give a main account more money.
+            query = """WITH debit AS (
+                           UPDATE currency SET amount = amount - $3
+                           WHERE user_id = $1 AND amount >= $3
+                           RETURNING amount
+                       ), credit AS (
+                           INSERT INTO currency (user_id, amount)
+                           SELECT $2, $3 FROM debit
+                           ON CONFLICT (user_id)
+                           DO UPDATE SET amount = currency.amount + $3
+                       ), log AS (
+                           INSERT INTO givelog (giver, recipient, amount)
+                           SELECT $1, $2, $3 FROM debit
+                       )
+                       SELECT amount FROM debit;
+                    """
+            new_balance = await self.bot.pool.fetchval(query, giver_id, recipient_id, amount)
+            if new_balance is None:
+                return None
+
+            self._set(giver_id, -amount)
+            self._set(recipient_id, amount)
+            return new_balance
+
+    # ------- Ranks --------
+
+    async def _rank_index(self):
+        async with self._ranks_lock:
+            if self._ranks is not None:
+                return self._ranks
+
+            # Hold the flush lock so a batch can't get written while we're
+            # reading, otherwise it might end up being counted twice.
+            async with self._flush_lock:
+                query = 'SELECT amount FROM currency WHERE amount > 0;'
+                records = await self.bot.pool.fetch(query)
+
+                # The db doesn't have the changes that haven't been flushed
+                # yet, so those have to be patched in. No awaits from here on.
+                pending = collections.Counter()
+                for deltas in (*(d for _, d in self._unflushed), self._deltas):
+                    pending.update(deltas)
+
+                ranks = _RankIndex(amount for amount, in records)
+                for user_id, delta in pending.items():
+                    balance = self._balances[user_id]
+                    ranks.update(balance - delta, balance)
+
+                self._ranks = ranks
+                return ranks
+
+    async def _count_rank(self, amount):
+        # Everything up to now has to be in the db for the count to be right.
+        await self.flush()
+        query = 'SELECT COUNT(*) FROM currency WHERE amount > $1;'
+        return await self.bot.pool.fetchval(query, amount) + 1
+
+    async def rank(self, user_id):
+        """Returns a user's rank and balance.
+
+        The rank is None if they have no money.
+        """
+        balance = await self.get(user_id)
+        if balance <= 0:
+            return None, balance
+
+        if not USE_RANK_INDEX:
+            return await self._count_rank(balance), balance
+
+        ranks = await self._rank_index()
+        return ranks.rank(balance), balance
+
+
+class _CoinImages:
+    """The coin images for ->flip, and the scaled-down copies of them for
+    flipping a bunch of coins at once.
+    """
+
+    def __init__(self):
+        # The raw files are kept around for single flips, so we don't have
+        # to hit the disk (or re-encode anything) every time.
+        self._files = {}
+        for side in SIDES:
+            with open(f'data/images/coins/{side}.png', 'rb') as f:
+                self._files[side] = f.read()
+
+        # Also due to the fact that we're using these over and over again
+        # we need to cache these. It's a really bad idea to open these
+        # in the commands due to concurrency issues and potential race
+        # conditions.
+        self._images = {
+            side: Image.open(io.BytesIO(data)).convert('RGBA')
+            for side, data in self._files.items()
+        }
+
+        if len({size for image in self._images.values() for size in image.size}) != 1:
+            raise RuntimeError("Images must be the same size.")
+
+        # Coins that have been scaled down for bigger flips, keyed by the
+        # size of a coin.
+        self._scaled = {self.size: self._images}
+
+    @property
+    def size(self):
+        return self._images[Side.heads].size[0]
+
+    def close(self):
+        for images in self._scaled.values():
+            for image in images.values():
+                image.close()
+
+    def file(self, side):
+        return discord.File(io.BytesIO(self._files[side]), 'coin.png')
+
+    def _of_size(self, size):
+        # This runs in an executor, but the worst that can happen is that
+        # two threads scale the same coins, which is harmless.
+        try:
+            return self._scaled[size]
+        except KeyError:
+            pass
+
+        coins = self._scaled[size] = {
+            side: image.resize((size, size), Image.LANCZOS)
+            for side, image in self._images.items()
+        }
+        return coins
+
+    def flip_image(self, num_sides):
+        stats = collections.Counter()
+
+        root = num_sides ** 0.5
+        height, width = round(root), int(math.ceil(root))
+
+        size = min(self.size, MAX_FLIP_IMAGE_WIDTH // width)
+        images = self._of_size(size)
+        image = Image.new('RGBA', (width * size, height * size))
+
+        for i, side in enumerate(random.choices(SIDES, WEIGHTS, k=num_sides)):
+            y, x = divmod(i, width)
+            image.paste(images[side], (x * size, y * size))
+            stats[side] += 1
+
+        message = ' and '.join(pluralize(**{str(side)[:-1]: n}) for side, n in stats.items())
+
+        f = io.BytesIO()
+        # The default compression level is really slow for what little
+        # it saves on an image this size.
+        image.save(f, 'png', compress_level=1)
+        f.seek(0)
+
+        return message, discord.File(f, filename='flipcoins.png')
+
+
 class NotNegative(commands.BadArgument):
     pass
 
@@ -170,23 +686,11 @@ class Money:
     """
     def __init__(self, bot):
         self.bot = bot
-
-        with open('data/images/coins/heads.png', 'rb') as heads, \
-             open('data/images/coins/tails.png', 'rb') as tails:
-            # Force the files to be read by converting them.
-            # Normally having them not read is ok but in this case it's not,
-            # because we close the actual files causing them to fail
-            # when we actually need these.
-            #
-            # Also due to the fact that we're using this over and over again
-            # we need to cache these. It's a really bad idea to open these
-            # in the commands due to concurrency issues and potential race
-            # conditions.
-            self._heads_image = Image.open(heads).convert('RGBA')
-            self._tails_image = Image.open(tails).convert('RGBA')
-
-        if len({*self._heads_image.size, *self._tails_image.size}) != 1:
-            raise RuntimeError("Images must be the same size.")
+        self._coins = _CoinImages()
+        self.balances = _BalanceCache(bot)
+        # user_id -> when they can use ->daily$ again. This is only so
+        # people spamming it don't hit the db, the db has the final say.
+        self._daily_cooldowns = collections.OrderedDict()
 
     async def __error(self, ctx, error):
         if isinstance(error, NotNegative):
@@ -194,65 +698,119 @@ class Money:
         elif isinstance(error, AccountTooYoung):
             await ctx.send(error)
 
-    @property
-    def image_size(self):
-        return self._heads_image.size[0]
-
     def __unload(self):
-        self._heads_image.close()
-        self._tails_image.close()
+        self._coins.close()
+        self.balances.detach()
+
+    async def shutdown(self):
+        await self.balances.close()
 
     @property
     def money_emoji(self):
         return self.bot.emoji_config.money
 
-    async def get_money(self, user_id, *, connection=None):
-        connection = connection or self.bot.pool
-        query = 'SELECT amount FROM currency WHERE user_id = $1;'
-        row = await connection.fetchrow(query, user_id)
-        return row['amount'] if row else 0
+    # All balance changes must go through these, as the balances are cached.
 
-    async def add_money(self, user_id, amount, *, connection=None):
-        connection = connection or self.bot.pool
+    async def get_money(self, user_id):
+        return await self.balances.get(user_id)
 
-        query = """INSERT INTO currency (user_id, amount) VALUES ($1, $2)
-                   ON CONFLICT (user_id)
-                   DO UPDATE SET amount = currency.amount + $2
-                """
-        await connection.execute(query, user_id, amount)
+    async def add_money(self, user_id, amount):
+        await self.balances.change(user_id, amount)
+
+    async def add_money_many(self, user_ids, amount):
+        """Gives the same amount of money to multiple users."""
+        for user_id in user_ids:
+            await self.balances.change(user_id, amount)
+
+    async def settle_bet(self, user_id, amount, payout=0):
+        """Takes amount from a user and gives them payout, but only if they
+        have at least amount.
+
+        Returns the user's new balance, or None if they didn't have enough.
+        """
+        return await self.balances.change(user_id, payout - amount, required=amount)
+
+    def withdraw(self, user_id, amount):
+        """Takes money from a user, but only if they have enough.
+
+        Returns the user's new balance, or None if they didn't have enough.
+        """
+        return self.settle_bet(user_id, amount)
+
+    def transfer(self, giver_id, recipient_id, amount):
+        """Moves money from one user to another and logs it in the give log.
+
+        Returns the giver's new balance, or None if they didn't have enough,
+        in which case nothing happens.
+        """
+        return self.balances.transfer(giver_id, recipient_id, amount)
 
     @commands.command(aliases=['$'])
     async def cash(self, ctx, user: discord.Member = None):
         """Shows how much money you have."""
         user = user or ctx.author
-        amount = await self.get_money(user.id, connection=ctx.db)
+        amount = await self.get_money(user.id)
 
         if not amount:
             return await ctx.send(f'{user} has nothing :frowning:')
 
         await ctx.send(f'{user} has **{amount}** {self.money_emoji}!')
 
-    @commands.command(aliases=['lb'])
+    @commands.group(aliases=['lb'], invoke_without_command=True)
     async def leaderboard(self, ctx):
-        """Shows the 10 richest people"""
+        """Shows the richest people"""
+        # Make sure the db is up to date with the cached balances.
+        await self.balances.flush()
+
+        total = await ctx.db.fetchval('SELECT COUNT(*) FROM currency WHERE amount > 0;')
+        if not total:
+            return await ctx.send('No one has any money... :frowning:')
+
+        first_query = """SELECT user_id, amount FROM currency
+                         WHERE amount > 0
+                         ORDER BY amount DESC, user_id DESC
+                         LIMIT $1 OFFSET $2;
+                      """
         query = """SELECT user_id, amount FROM currency
-                   WHERE amount > 0
-                   ORDER BY amount DESC
-                   LIMIT 10;
+                   WHERE amount > 0 AND (amount, user_id) < ($1, $2)
+                   ORDER BY amount DESC, user_id DESC
+                   LIMIT $3;
                 """
 
         get_user = ctx.bot.get_user
-        fields = (
-            f'{(get_user(user_id) or _DummyUser(user_id)).mention} with {amount}'
-            for user_id, amount in await ctx.db.fetch(query)
-        )
+        pool = ctx.pool
+
+        # The rank is carried in the key, as there's no telling where a page
+        # starts otherwise.
+        async def fetch(last, limit, *, offset=0):
+            # The connection is released once the paginator starts, so we
+            # have to go through the pool.
+            if last is None:
+                position = offset
+                records = await pool.fetch(first_query, limit, offset)
+            else:
+                last_amount, last_user_id, position = last
+                records = await pool.fetch(query, last_amount, last_user_id, limit)
+
+            return [
+                ((amount, user_id, position),
+                 f'`{position}.` {(get_user(user_id) or _DummyUser(user_id)).mention} with {amount}')
+                for position, (user_id, amount) in enumerate(records, position + 1)
+            ]
+
+        pages = KeysetPaginator(ctx, fetch, total=total, per_page=10, title='Leaderboard')
+        await pages.interact()
+
+    @leaderboard.command(name='rank')
+    async def leaderboard_rank(self, ctx, *, user: discord.Member = None):
+        """Shows where you (or someone else) are on the leaderboard."""
+        user = user or ctx.author
+        rank, amount = await self.balances.rank(user.id)
 
-        # TODO: Paginate this, this might be a bad idea when the bot gets 
-        #       extremely big due to memory issues as all the entries would 
-        #       be stored in memory, but it should make things a little 
-        #       smoother. Maybe I could chunk it?
-        embed = discord.Embed(colour=ctx.bot.colour, description='\n'.join(fields))
-        await ctx.send(embed=embed)
+        if rank is None:
+            return await ctx.send(f"{user} has nothing, so they're not on the leaderboard :frowning:")
+
+        await ctx.send(f'{user} is **#{rank}** with **{amount}** {self.money_emoji}!')
 
     @commands.command()
     @maybe_not_alt()
@@ -264,39 +822,29 @@ class Money:
         if ctx.author == user:
             return await ctx.send('Yeah... how would that work?')
 
-        money = await self.get_money(ctx.author.id, connection=ctx.db)
-        if money < amount:
+        if await self.transfer(ctx.author.id, user.id, amount) is None:
             return await ctx.send("You don't have enough...")
 
-        query = 'UPDATE currency SET amount = amount - $2 WHERE user_id = $1;'
-        await ctx.db.execute(query, ctx.author.id, amount)
-
-        await self.add_money(user.id, amount, connection=ctx.db)
-
-        # Also add it to the give log. This is so we can detect someone using
-        # alts to give a main account more money.
-        query = 'INSERT INTO givelog (giver, recipient, amount) VALUES ($1, $2, $3)'
-        await ctx.db.execute(query, ctx.author.id, user.id, amount)
         await ctx.send('\N{OK HAND SIGN}')
 
     @commands.command()
     @commands.is_owner()
     async def award(self, ctx, amount: int, *, user: discord.User):
         """Awards some money to a user"""
-        await self.add_money(user.id, amount, connection=ctx.db)
+        await self.add_money(user.id, amount)
         await ctx.send('\N{OK HAND SIGN}')
 
     @commands.command()
     @commands.is_owner()
     async def take(self, ctx, amount: int, *, user: discord.User):
         """Takes some money away from a user"""
-        money = await self.get_money(user.id, connection=ctx.db)
+        money = await self.get_money(user.id)
         if not money:
             return await ctx.send(f"{user.mention} has no money left. "
                                   "You might be cruel, but I'm not...")
 
         amount = min(money, amount)
-        await self.add_money(user.id, -amount, connection=ctx.db)
+        await self.add_money(user.id, -amount)
         await ctx.send('\N{OK HAND SIGN}')
 
     # =============== Generic gambling commands go here ================
@@ -306,7 +854,7 @@ class Money:
     async def _default_flip(self, ctx):
         """Flip called with no arguments"""
         side = random.choices(SIDES, WEIGHTS)[0]
-        file = discord.File(f'data/images/coins/{side}.png', 'coin.png')
+        file = self._coins.file(side)
 
         embed = (discord.Embed(colour=ctx.bot.colour, description=f'...flipped **{side}**')
                  .set_author(name=ctx.author.display_name, icon_url=ctx.author.avatar_url)
@@ -315,34 +863,6 @@ class Money:
 
         await ctx.send(file=file, embed=embed)
 
-    def _flip_image(self, num_sides):
-        images = {
-            Side.heads: self._heads_image,
-            Side.tails: self._tails_image,
-        }
-        stats = collections.Counter()
-
-        root = num_sides ** 0.5
-        height, width = round(root), int(math.ceil(root))
-
-        sides = (random.choices(SIDES, WEIGHTS)[0] for _ in range(num_sides))
-
-        size = self.image_size
-        image = Image.new('RGBA', (width * size, height * size))
-
-        for i, side in enumerate(sides):
-            y, x = divmod(i, width)
-            image.paste(images[side], (x * size, y * size))
-            stats[side] += 1
-
-        message = ' and '.join(pluralize(**{str(side)[:-1]: n}) for side, n in stats.items())
-
-        f = io.BytesIO()
-        image.save(f, 'png')
-        f.seek(0)
-
-        return message, discord.File(f, filename='flipcoins.png')
-
     async def _numbered_flip(self, ctx, number):
         if number == 1:
             await self._default_flip(ctx)
@@ -351,7 +871,7 @@ class Money:
         elif number <= 0:
             await ctx.send("Please tell me how that's gonna work...")
         else:
-            message, file = await ctx.bot.loop.run_in_executor(None, self._flip_image, number)
+            message, file = await ctx.bot.loop.run_in_executor(None, self._coins.flip_image, number)
 
             embed = (discord.Embed(colour=ctx.bot.colour, description=f'...flipped {message}')
                      .set_author(name=ctx.author.display_name, icon_url=ctx.author.avatar_url)
@@ -383,34 +903,29 @@ class Money:
         side = side_or_number
         is_betting = amount is not None
 
-        if is_betting:
-            money = await self.get_money(ctx.author.id, connection=ctx.db)
-            if money < amount:
-                return await ctx.send("You don't have enough...")
-            new_amount = -amount
-
         # The actual coin flipping. Someone help me make this more elegant.
         actual = random.choices(SIDES, WEIGHTS)[0]
         won = actual == side
 
+        if is_betting:
+            payout = amount * 2 if won else 0  # 2 + 5 * (actual == Side.edge))
+            money = await self.settle_bet(ctx.author.id, amount, payout)
+            if money is None:
+                return await ctx.send("You don't have enough...")
+
         if won:
             message = 'Yay, you got it!'
             colour = 0x4CAF50
             if is_betting:
-                new_amount += amount * 2  # 2 + 5 * (actual == Side.edge))
-                message += f'\nYou won **{new_amount}**{self.money_emoji}'
+                message += f'\nYou won **{payout - amount}**{self.money_emoji}'
         else:
             message = "Noooooooo, you didn't get it. :("
             colour = 0xf44336
             if is_betting:
-                lost = '**everything**' if amount == money else f'**{amount}**{self.money_emoji}'
+                lost = '**everything**' if not money else f'**{amount}**{self.money_emoji}'
                 message += f'\nYou lost {lost}.'
 
-        if is_betting:
-            query = 'UPDATE currency SET amount = amount + $2 WHERE user_id = $1'
-            await ctx.db.execute(query, ctx.author.id, new_amount)
-
-        file = discord.File(f'data/images/coins/{actual}.png', 'coin.png')
+        file = self._coins.file(actual)
 
         embed = (discord.Embed(colour=colour, description=message)
                  .set_author(name=ctx.author.display_name, icon_url=ctx.author.avatar_url)
@@ -430,37 +945,65 @@ class Money:
         author_id = ctx.author.id
         now = ctx.message.created_at
 
-        # Check if the person used the command within 24 hours
-        query = 'SELECT latest_time FROM daily_cash_cooldowns WHERE user_id = $1;'
-        row = await ctx.db.fetchrow(query, author_id)
-
-        if row:
-            delta = (now - row['latest_time']).total_seconds()
-            retry_after = DAILY_CASH_COOLDOWN_TIME - delta
-
-            if retry_after > 0:
-                return await ctx.send(
-                    f"Don't be greedy... Wait at least {duration_units(retry_after)} "
-                    "before doing this command again!"
+        ready_at = self._daily_cooldowns.get(author_id)
+        if ready_at is None or ready_at <= now:
+            amount = random.randint(100, 200)
+            credited = False
+
+            # Checking and updating the cooldown, giving the money and logging
+            # it is all done in one go, so two daily$'s at the same time can't
+            # both get through.
+            query = """WITH cooldown AS (
+                           INSERT INTO daily_cash_cooldowns AS d (user_id, latest_time)
+                           VALUES ($1, $2)
+                           ON CONFLICT (user_id) DO UPDATE SET latest_time = $2
+                           WHERE d.latest_time IS NULL OR d.latest_time <= $2 - $3::INTERVAL
+                           RETURNING user_id
+                       ),
+                       credit AS (
+                           INSERT INTO currency (user_id, amount)
+                           SELECT user_id, $4 FROM cooldown
+                           ON CONFLICT (user_id)
+                           DO UPDATE SET amount = currency.amount + EXCLUDED.amount
+                           RETURNING user_id
+                       ),
+                       logged AS (
+                           INSERT INTO dailylog (user_id, time, amount)
+                           SELECT user_id, $2, $4 FROM credit
+                       )
+                       SELECT EXISTS(SELECT 1 FROM credit),
+                              (SELECT latest_time FROM daily_cash_cooldowns WHERE user_id = $1);
+                    """
+
+            async def update():
+                nonlocal credited, ready_at
+                credited, latest_time = await ctx.db.fetchrow(
+                    query, author_id, now, DAILY_CASH_COOLDOWN, amount
                 )
+                # The select sees the cooldown from before the insert.
+                ready_at = (now if credited else latest_time) + DAILY_CASH_COOLDOWN
+                return amount if credited else 0
 
-        # Update the cooldown
-        query = """INSERT INTO daily_cash_cooldowns (user_id, latest_time) VALUES ($1, $2)
-                   ON CONFLICT (user_id)
-                   DO UPDATE SET latest_time = $2;
-                """
-        await ctx.db.execute(query, author_id, now)
+            await self.balances.change_in_db(author_id, update)
 
-        amount = random.randint(100, 200)
-        await self.add_money(author_id, amount, connection=ctx.db)
+            cooldowns = self._daily_cooldowns
+            cooldowns.pop(author_id, None)
+            cooldowns[author_id] = ready_at
+            # The cooldowns are mostly in order of when they end, so the
+            # expired ones can be cleaned up from the front.
+            while cooldowns and next(iter(cooldowns.values())) <= now:
+                cooldowns.popitem(last=False)
 
-        # Add it to the daily log so we can use this later
-        query = 'INSERT INTO dailylog (user_id, time, amount) VALUES ($1, $2, $3);'
-        await ctx.db.execute(query, author_id, now, amount)
+            if credited:
+                return await ctx.send(
+                    f'{ctx.author.mention}, for your daily hope you will receive '
+                    f'**{amount}** {self.money_emoji}! Spend them wisely!'
+                )
 
+        retry_after = (ready_at - now).total_seconds()
         await ctx.send(
-            f'{ctx.author.mention}, for your daily hope you will receive '
-            f'**{amount}** {self.money_emoji}! Spend them wisely!'
+            f"Don't be greedy... Wait at least {duration_units(retry_after)} "
+            "before doing this command again!"
         )
 
 
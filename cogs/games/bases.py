@@ -241,6 +241,22 @@ class TwoPlayerGameCog:
 
             await self._end_game(ctx, inst, result)
 
+    async def _play_against_bot(self, ctx, **kwargs):
+        """Runs a game against the bot itself.
+
+        Games that support this should make the moves for ctx.me, and
+        expose this through a subcommand.
+        """
+        if ctx.channel.id in self.running_games:
+            return await ctx.send(f"There's a {self.__class__.name} game already running in this channel...")
+
+        await ctx.release()
+        with _swap_item(self.running_games, ctx.channel.id, self.__game_class__(ctx, ctx.me, **kwargs)):
+            inst = self.running_games[ctx.channel.id]
+            result = await inst.run()
+
+        await self._end_game(ctx, inst, result)
+
     async def _game_join(self, ctx):
         """Joins a {name} game.
 
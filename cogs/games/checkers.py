@@ -1,30 +1,13 @@
-import itertools
+import time
 
-from more_itertools import chunked, pairwise, sliced, spy
+from more_itertools import chunked, pairwise
+
+from ..utils import cache
 
 BLACK, WHITE = False, True
 PIECES = BK_PIECE, WH_PIECE = 'bw'
 KINGS = BK_KING, WH_KING = 'BW'
 
-_is_king = str.isupper
-
-def _get_checkers(start, end, direction):
-    return [
-        (x, y) for y, x in itertools.product(range(start, end + direction, direction), range(8))
-        if (x + y) % 2 == 1
-    ]
-
-_STARTING_BOARD = [
-    ' ', BK_PIECE, ' ', BK_PIECE, ' ', BK_PIECE, ' ', BK_PIECE,
-    BK_PIECE, ' ', BK_PIECE, ' ', BK_PIECE, ' ', BK_PIECE, ' ',
-    ' ', BK_PIECE, ' ', BK_PIECE, ' ', BK_PIECE, ' ', BK_PIECE,
-    ' ', ' ', ' ', ' ', ' ', ' ', ' ', ' ',
-    ' ', ' ', ' ', ' ', ' ', ' ', ' ', ' ',
-    WH_PIECE, ' ', WH_PIECE, ' ', WH_PIECE, ' ', WH_PIECE, ' ',
-    ' ', WH_PIECE, ' ', WH_PIECE, ' ', WH_PIECE, ' ', WH_PIECE,
-    WH_PIECE, ' ', WH_PIECE, ' ', WH_PIECE, ' ', WH_PIECE, ' ',
-]
-
 X = 'abcdefgh'
 Y = '87654321'
 
@@ -35,37 +18,260 @@ def _i_to_xy(i):
     y, x = divmod(i, 8)
     return X[x] + Y[y]
 
-def _xy_to_i(xy):
-    x, y = xy
-    return _to_i(X.index(x), Y.index(y))
-
-def _in_range(x, y):
-    return 0 <= x < 8 and 0 <= y < 8
-
-def _moves(x, y, dy):
-    return [_to_i(x + dx, y + dy) for dx in (-1, 1) if _in_range(x + dx, y + dy)]
-
-def _captures(x, y, dy):
-    return [
-        (_to_i(x + dx, y + dy), _to_i(x + dx * 2, y + dy * 2))
-        for dx in (-1, 1)
-        if _in_range(x + dx, y + dy) and _in_range(x + dx * 2, y + dy * 2)
-    ]
-
-def _make_dict(f):
-    moves = {}
-    moves[BK_PIECE] = {_to_i(x, y): f(x, y, 1) for x, y in _get_checkers(0, 8, 1)}
-    moves[WH_PIECE] = {_to_i(x, y): f(x, y, -1) for x, y in _get_checkers(8, 0, -1)}
-    # Kings can move anywhere
-    moves[BK_KING] = moves[WH_KING] = {
-        k: moves[WH_PIECE].get(k, []) + moves[BK_PIECE].get(k, [])
-        for k in moves[BK_PIECE].keys() | moves[WH_PIECE].keys()
-    }
-    return moves
+# ------ Bitboards ------
+#
+# Squares are numbered 0-63 from a8 to h1, and each colour (and the kings
+# of either colour) is a 64-bit int with a bit set for every square that
+# has one of those pieces. Black starts at the top and moves down the
+# board (towards higher squares), white starts at the bottom and moves up.
+
+_FULL = (1 << 64) - 1
+_NOT_A_FILE = sum(1 << i for i in range(64) if i % 8 != 0)
+_NOT_H_FILE = sum(1 << i for i in range(64) if i % 8 != 7)
+
+# Direction -> squares a piece can go in that direction from without
+# wrapping around to the other side of the board.
+_DIRECTIONS = {7: _NOT_A_FILE, 9: _NOT_H_FILE, -7: _NOT_H_FILE, -9: _NOT_A_FILE}
+_FORWARD = {BLACK: (7, 9), WHITE: (-7, -9)}
+_PROMOTION_ROW = {BLACK: 0xFF << 56, WHITE: 0xFF}
+
+_STARTING_POSITION = (
+    # Black, white, kings
+    sum(1 << i for i in range(24) if sum(divmod(i, 8)) % 2),
+    sum(1 << i for i in range(40, 64) if sum(divmod(i, 8)) % 2),
+    0,
+)
+
+
+def _shift(bb, direction):
+    return (bb << direction) & _FULL if direction > 0 else bb >> -direction
+
+
+def _squares(bb):
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def _popcount(bb):
+    return bin(bb).count('1')
+
+
+# Moves are stored as ints, with the number of squares in the lowest 4 bits
+# and each square taking up 6 bits after that.
+
+def _encode(squares):
+    move = len(squares)
+    for i, square in enumerate(squares):
+        move |= square << (4 + 6 * i)
+    return move
+
+
+def _decode(move):
+    return [(move >> (4 + 6 * i)) & 63 for i in range(move & 15)]
+
+
+def _is_jump(move):
+    return abs((move >> 4 & 63) - (move >> 10 & 63)) in {14, 18}
+
+
+def _move_to_str(move):
+    return ''.join(map(_i_to_xy, _decode(move)))
+
+
+def _jumps_from(path, directions, theirs, empty, captured, promotion_row, out):
+    square = path[-1]
+    bit = 1 << square
+    found = False
+    for direction in directions:
+        mask = _DIRECTIONS[direction]
+        over = _shift(bit & mask, direction) & theirs & ~captured
+        if not over or not _shift(over & mask, direction) & empty:
+            continue
+
+        found = True
+        path.append(square + 2 * direction)
+        if promotion_row & (1 << path[-1]):
+            # Pieces that reach the back rank get kinged, which ends the move.
+            out.append(_encode(path))
+        else:
+            _jumps_from(path, directions, theirs, empty, captured | over, promotion_row, out)
+        path.pop()
+
+    if not found and len(path) > 1:
+        out.append(_encode(path))
+
+
+@cache.cache(maxsize=4096)
+def _legal_moves(black, white, kings, turn):
+    """Return a tuple of all the legal moves (as ints) in a position.
+
+    If there are any jumps one could make, only those are returned, as
+    jumps must be made according to the rules of Checkers.
+    """
+    mine, theirs = (white, black) if turn else (black, white)
+    empty = ~(black | white) & _FULL
+    forward = _FORWARD[turn]
+    men = mine & ~kings
+
+    jumps = []
+    for square in _squares(mine):
+        is_king = kings >> square & 1
+        _jumps_from(
+            [square], _DIRECTIONS if is_king else forward, theirs,
+            # The piece that's moving leaves its square.
+            empty | (1 << square), 0, 0 if is_king else _PROMOTION_ROW[turn], jumps
+        )
+
+    if jumps:
+        return tuple(jumps)
+
+    moves = []
+    for direction, mask in _DIRECTIONS.items():
+        movers = mine & kings | (men if direction in forward else 0)
+        for end in _squares(_shift(movers & mask, direction) & empty):
+            moves.append(_encode((end - direction, end)))
+    return tuple(moves)
+
+
+def _apply_move(black, white, kings, turn, move):
+    """Return the position after a move is made, as (black, white, kings, turn)"""
+    squares = _decode(move)
+    start, end = 1 << squares[0], 1 << squares[-1]
+
+    captured = 0
+    for before, after in pairwise(squares):
+        # A two step rather than a one step means a capture.
+        if abs(before - after) in {14, 18}:
+            captured |= 1 << ((before + after) // 2)
+
+    if kings & start:
+        kings ^= start | end
+    elif end & _PROMOTION_ROW[turn]:
+        kings |= end
+    kings &= ~captured
+
+    if turn:
+        white ^= start | end
+        black &= ~captured
+    else:
+        black ^= start | end
+        white &= ~captured
+
+    return black, white, kings, not turn
+
+
+# ------ AI ------
+
+_WIN_SCORE = 100000
+_MAN_SCORE, _KING_SCORE = 100, 175
+_BACK_ROW = {BLACK: 0xFF, WHITE: 0xFF << 56}
+_CENTER = sum(1 << _to_i(x, y) for x in range(2, 6) for y in range(3, 5))
+
+_EXACT, _LOWER, _UPPER = range(3)
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _evaluate(black, white, kings, turn):
+    score = (
+        _MAN_SCORE * (_popcount(black & ~kings) - _popcount(white & ~kings))
+        + _KING_SCORE * (_popcount(black & kings) - _popcount(white & kings))
+        # Keeping the back row filled stops the other side from kinging.
+        + 10 * (_popcount(black & ~kings & _BACK_ROW[BLACK]) - _popcount(white & ~kings & _BACK_ROW[WHITE]))
+        + 5 * (_popcount(black & _CENTER) - _popcount(white & _CENTER))
+    )
+    return -score if turn else score
+
+
+class _Search:
+    """Negamax with alpha-beta pruning and a transposition table."""
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.table = {}
+        self.nodes = 0
+
+    def negamax(self, position, depth, ply, alpha, beta):
+        self.nodes += 1
+        if not self.nodes & 511 and time.monotonic() > self.deadline:
+            raise _Timeout
+
+        moves = _legal_moves(*position)
+        if not moves:
+            # No moves left means we lost, the sooner the worse.
+            return -_WIN_SCORE + ply, None
+
+        # Always play out the captures, otherwise the evaluation is garbage.
+        if depth <= 0 and not _is_jump(moves[0]):
+            return _evaluate(*position), None
+
+        original_alpha = alpha
+        best = None
+        entry = self.table.get(position)
+        if entry is not None:
+            entry_depth, flag, value, best = entry
+            if entry_depth >= depth:
+                if flag == _EXACT:
+                    return value, best
+                if flag == _LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value, best
+
+        if best in moves:
+            moves = (best, *(m for m in moves if m != best))
+
+        best_value = -_WIN_SCORE - 1
+        for move in moves:
+            value, _ = self.negamax(_apply_move(*position, move), depth - 1, ply + 1, -beta, -alpha)
+            value = -value
+            if value > best_value:
+                best_value, best = value, move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= original_alpha:
+            flag = _UPPER
+        elif best_value >= beta:
+            flag = _LOWER
+        else:
+            flag = _EXACT
+        self.table[position] = depth, flag, best_value, best
+        return best_value, best
+
+
+def best_move(position, *, time_limit=1.5, max_depth=64):
+    """Return the best move (as an int) in a position, thinking for at
+    most about time_limit seconds.
 
-# Generate lookup table for moves
-_MOVES = _make_dict(_moves)
-_CAPTURES = _make_dict(_captures)
+    This searches deeper and deeper until it runs out of time, using the
+    result of the deepest search that finished.
+    """
+    moves = _legal_moves(*position)
+    if len(moves) == 1:
+        return moves[0]
+
+    search = _Search(time.monotonic() + time_limit)
+    move = moves[0]
+    for depth in range(1, max_depth + 1):
+        try:
+            value, best = search.negamax(position, depth, 0, -_WIN_SCORE - 1, _WIN_SCORE + 1)
+        except _Timeout:
+            break
+
+        if best is not None:
+            move = best
+        if abs(value) >= _WIN_SCORE - max_depth:
+            # Found a forced win (or loss), searching deeper won't change it.
+            break
+
+    return move
 
 
 class Board:
@@ -81,9 +287,11 @@ class Board:
     Y = [f'{i}\u20e3' for i in Y]
 
     def __init__(self):
-        self._board = _STARTING_BOARD[:]
+        self._black, self._white, self._kings = _STARTING_POSITION
         self._half_moves = 0
         self.turn = WHITE
+        # str -> int, for the current position
+        self._legal = None
 
     def __str__(self):
         board = '\n'.join(f'{y}{"".join(chunk)}' for y, chunk in zip(self.Y, chunked(self._tiles(), 8)))
@@ -93,14 +301,27 @@ class Board:
     def half_moves(self):
         return self._half_moves
 
+    @property
+    def position(self):
+        return self._black, self._white, self._kings, self.turn
+
     def _tiles(self):
         tiles = self.TILES
-        for i, char in enumerate(self._board):
-            key = not sum(divmod(i, 8)) % 2 if char == ' ' else char
+        for i in range(64):
+            bit = 1 << i
+            if self._black & bit:
+                key = KINGS[BLACK] if self._kings & bit else PIECES[BLACK]
+            elif self._white & bit:
+                key = KINGS[WHITE] if self._kings & bit else PIECES[WHITE]
+            else:
+                key = not sum(divmod(i, 8)) % 2
             yield tiles[key]
 
-    def _find_all_pieces(self, colour):
-        return [i for i, v in enumerate(self._board) if v.lower() == colour]
+    def _legal_moves(self):
+        legal = self._legal
+        if legal is None:
+            legal = self._legal = {_move_to_str(m): m for m in _legal_moves(*self.position)}
+        return legal
 
     def legal_moves(self):
         """Generate all legal moves in the current position.
@@ -108,87 +329,26 @@ class Board:
         If there are any jumps one could make, those get generated instead,
         as jumps must be made according to the rules of Checkers.
         """
-        jumps_exist, jumps = spy(self.jumps())
-        if jumps_exist:
-            yield from jumps
-            return
-
-        board = self._board
-        for i in self._find_all_pieces(PIECES[self.turn]):
-            for end in _MOVES[board[i]][i]:
-                if board[end] == ' ':
-                    yield _i_to_xy(i) + _i_to_xy(end)
-
-    def jumps(self):
-        """Generate all jumps one can make in the current position"""
-        owner = PIECES[self.turn]
-        return itertools.chain.from_iterable(map(self.jumps_from, self._find_all_pieces(owner)))
-
-    def jumps_from(self, square):
-        """Generate all jumps from a particular square in the current position"""
-        board = self._board
-        captures = _CAPTURES[board[square]]
-
-        def jump_helper(square, captured):
-            is_king = _is_king(board[square])
-            for jump_over, jump_end in captures[square]:
-                if board[jump_over].lower() != PIECES[not self.turn]:
-                    continue
-
-                if jump_over in captured:
-                    # no loops
-                    continue
-
-                if board[jump_end] != ' ':
-                    # The square must be empty (obviously)
-                    continue
-
-                if not is_king and square >> 3 == 7 * self.turn:
-                    # When a piece reaches the back rank they're supposed to be
-                    # kinged and can't jump anymore. Exception is if the piece
-                    # was already a king.
-                    yield square, jump_end
-                else:
-                    chain_exists, squares = spy(jump_helper(jump_end, captured | {jump_over}))
-                    if chain_exists:
-                        for sequence in squares:
-                            yield (square, *sequence)
-                    else:
-                        yield (square, jump_end)
-
-        return (''.join(map(_i_to_xy, s)) for s in jump_helper(square, set()))
+        return iter(self._legal_moves())
 
     def is_game_over(self):
         """Return True if the game is over for the current player. False otherwise."""
-        return next(self.legal_moves(), None) is None
+        return not self._legal_moves()
 
     def move(self, move):
         """Take a move and apply it to the game"""
-        if move not in self.legal_moves():
-            raise ValueError(f'illegal move: {move!r}')
-
-        board = self._board
-        squares = [_xy_to_i(xy) for xy in sliced(move, 2)]
-        end = squares[-1]
-
-        piece = board[squares[0]]
-        if end >> 3 == 7 * (not self.turn) and not _is_king(piece):
-            # New king
-            piece = piece.upper()
-
-        for before, after in pairwise(squares):
-            difference = abs(before - after)
-            if difference not in {18, 14}:
-                continue
-
-            # A two step rather than a one step means a capture.
-            square_between = min(before, after) + difference // 2
-            board[square_between] = ' '
+        try:
+            encoded = self._legal_moves()[move]
+        except KeyError:
+            raise ValueError(f'illegal move: {move!r}') from None
 
-        board[squares[0]] = ' '
-        board[end] = piece
+        self._black, self._white, self._kings, self.turn = _apply_move(*self.position, encoded)
         self._half_moves += 1
-        self.turn = not self.turn
+        self._legal = None
+
+    def best_move(self, **kwargs):
+        """Return the move Chiaki would make in the current position."""
+        return _move_to_str(best_move(self.position, **kwargs))
 
 
 # Below is the game logic. If you just want to copy the board, Ignore this.
@@ -287,6 +447,10 @@ class CheckersSession:
         self._display.description = f'{instructions}{board}'
         self._display.set_author(name=header, icon_url=icon)
 
+    async def _make_ai_move(self):
+        move = await self._ctx.bot.loop.run_in_executor(None, self._board.best_move)
+        self._board.move(move)
+
     async def _loop(self):
         wait_for = self._ctx.bot.wait_for
         # needed cuz we're looking this up a few times
@@ -295,6 +459,10 @@ class CheckersSession:
         while not self._board.is_game_over():
             self._update_display()
             async with temp_message(self._ctx, embed=self._display):
+                if self.current == self._ctx.me:
+                    await self._make_ai_move()
+                    continue
+
                 try:
                     user_message = await wait_for('message', timeout=120, check=self._check)
                 except asyncio.TimeoutError:
@@ -322,5 +490,12 @@ class Checkers(TwoPlayerGameCog, game_cls=CheckersSession):
     async def _end_game(self, ctx, inst, result):
         pass
 
+    async def _game_ai(self, ctx):
+        """Starts a game of {name} against me.
+
+        I'll take a second or two to think about each move.
+        """
+        await self._play_against_bot(ctx)
+
 def setup(bot):
     bot.add_cog(Checkers(bot))
@@ -4,9 +4,9 @@ import discord
 import enum
 import itertools
 import random
+import time
 
 from collections import namedtuple
-from more_itertools import first_true, locate, one, windowed
 
 from . import errors
 from .bases import Status, TwoPlayerGameCog
@@ -19,22 +19,211 @@ NUM_ROWS = 6
 NUM_COLS = 7
 WINNING_LENGTH = 4
 
+# ------ Bitboards ------
+#
+# The board is stored as a bitboard, one for each player, with each column
+# taking up NUM_ROWS + 1 bits, from the bottom up. The extra bit at the top
+# of each column is always empty, so lines can't wrap around between
+# columns when the board is shifted. For a 7x6 board that's 49 bits.
+#
+#  6 13 20 27 34 41 48
+#  5 12 19 26 33 40 47
+#  4 11 18 25 32 39 46
+#  3 10 17 24 31 38 45
+#  2  9 16 23 30 37 44
+#  1  8 15 22 29 36 43
+#  0  7 14 21 28 35 42
+
+_H1 = NUM_ROWS + 1
+_BOTTOM = sum(1 << (col * _H1) for col in range(NUM_COLS))
+_FULL = _BOTTOM * ((1 << NUM_ROWS) - 1)
+_COLUMNS = [((1 << NUM_ROWS) - 1) << (col * _H1) for col in range(NUM_COLS)]
+_BOTTOMS = [1 << (col * _H1) for col in range(NUM_COLS)]
+# Vertical, diagonal (\), horizontal, diagonal (/)
+_DIRECTIONS = (1, _H1 - 1, _H1, _H1 + 1)
+
+assert WINNING_LENGTH == 4, 'the bitboard stuff only works for a length of 4'
+
+
+def _is_win(bb):
+    for shift in _DIRECTIONS:
+        pairs = bb & (bb >> shift)
+        if pairs & (pairs >> 2 * shift):
+            return True
+    return False
+
+
+def _winning_cells(bb):
+    cells = 0
+    for shift in _DIRECTIONS:
+        starts = bb & (bb >> shift) & (bb >> 2 * shift) & (bb >> 3 * shift)
+        cells |= starts | (starts << shift) | (starts << 2 * shift) | (starts << 3 * shift)
+    return cells
+
+
+def _threats(position, mask):
+    """Return the empty cells that would complete a line for position."""
+    # Vertical lines can only be completed from the top.
+    result = (position << 1) & (position << 2) & (position << 3)
 
-def _board_iterator_helper(num_cols, num_rows, length):
-    cols, rows = range(num_cols), range(num_rows)
-    for col in cols:
-        yield from (tuple((col, r) for r in row) for row in windowed(rows, length))
+    for shift in _DIRECTIONS[1:]:
+        pair = (position << shift) & (position << 2 * shift)
+        result |= pair & (position << 3 * shift)
+        result |= pair & (position >> shift)
+        pair = (position >> shift) & (position >> 2 * shift)
+        result |= pair & (position << shift)
+        result |= pair & (position >> 3 * shift)
 
-    for row in rows:
-        yield from (tuple((c, row) for c in col) for col in windowed(cols, WINNING_LENGTH))
+    return result & (_FULL ^ mask)
 
-    for row_diag, col_diag in itertools.product(range(num_rows - length + 1), range(num_cols - length + 1)):
-        yield tuple((col_diag + d, row_diag + d) for d in range(length))
-        yield tuple((col_diag + d, ~row_diag - d) for d in range(length))
 
-_default_indices = list(_board_iterator_helper(NUM_COLS, NUM_ROWS, WINNING_LENGTH))
+def _popcount(n):
+    return bin(n).count('1')
 
 
+# ------ AI ------
+
+_WIN_SCORE = 1000
+_CENTER_ORDER = sorted(range(NUM_COLS), key=lambda c: abs(NUM_COLS // 2 - c))
+_CENTER_WEIGHTS = [
+    sum(1 << (col * _H1 + row) for row in range(NUM_ROWS)) for col in _CENTER_ORDER[:3]
+]
+
+_EXACT, _LOWER, _UPPER = range(3)
+
+
+class _Timeout(Exception):
+    pass
+
+
+class _Search:
+    """Negamax with alpha-beta pruning and a transposition table.
+
+    Positions are given as (position, mask), where position has the
+    stones of the player to move and mask has every stone.
+    """
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.table = {}
+        self.nodes = 0
+
+    def _evaluate(self, position, mask):
+        opponent = position ^ mask
+        # Threats are what wins connect four, and the middle columns are
+        # part of the most lines.
+        score = 8 * (_popcount(_threats(position, mask)) - _popcount(_threats(opponent, mask)))
+        for weight, column in zip((3, 2, 1), _CENTER_WEIGHTS):
+            score += weight * (_popcount(position & column) - _popcount(opponent & column))
+        return score
+
+    def _ordered_moves(self, position, mask, possible, best):
+        moves = [
+            (col, move) for col, move in
+            ((col, possible & _COLUMNS[col]) for col in _CENTER_ORDER)
+            if move
+        ]
+        # Try the moves that make the most threats first, then the best
+        # move we found last time.
+        moves.sort(key=lambda m: _popcount(_threats(position | m[1], mask)), reverse=True)
+        if best is not None:
+            moves.sort(key=lambda m: m[0] != best)
+        return moves
+
+    def negamax(self, position, mask, depth, alpha, beta):
+        self.nodes += 1
+        if not self.nodes & 1023 and time.monotonic() > self.deadline:
+            raise _Timeout
+
+        moves_played = _popcount(mask)
+        if moves_played == NUM_ROWS * NUM_COLS:
+            return 0, None
+
+        possible = (mask + _BOTTOM) & _FULL
+        wins = _threats(position, mask) & possible
+        if wins:
+            col = next(c for c in _CENTER_ORDER if wins & _COLUMNS[c])
+            return _WIN_SCORE - moves_played, col
+
+        opponent_threats = _threats(position ^ mask, mask)
+        forced = possible & opponent_threats
+        if forced:
+            if forced & (forced - 1):
+                # They have two ways to win, we can only block one.
+                return -(_WIN_SCORE - moves_played - 1), None
+            possible = forced
+
+        # Don't play right under a cell they need.
+        possible &= ~(opponent_threats >> 1)
+        if not possible:
+            return -(_WIN_SCORE - moves_played - 1), None
+
+        if depth == 0:
+            return self._evaluate(position, mask), None
+
+        key = position + mask
+        original_alpha = alpha
+        best = None
+        entry = self.table.get(key)
+        if entry is not None:
+            entry_depth, flag, value, best = entry
+            if entry_depth >= depth:
+                if flag == _EXACT:
+                    return value, best
+                if flag == _LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value, best
+
+        best_value = -_WIN_SCORE - 1
+        for col, move in self._ordered_moves(position, mask, possible, best):
+            value, _ = self.negamax(position ^ mask, mask | move, depth - 1, -beta, -alpha)
+            value = -value
+            if value > best_value:
+                best_value, best = value, col
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= original_alpha:
+            flag = _UPPER
+        elif best_value >= beta:
+            flag = _LOWER
+        else:
+            flag = _EXACT
+        self.table[key] = depth, flag, best_value, best
+        return best_value, best
+
+
+def best_move(position, mask, *, time_limit=0.9):
+    """Return the best column to play for position, thinking for at most
+    about time_limit seconds.
+
+    This searches deeper and deeper until it runs out of time, using the
+    result of the deepest search that finished.
+    """
+    search = _Search(time.monotonic() + time_limit)
+    possible = (mask + _BOTTOM) & _FULL
+    move = next(c for c in _CENTER_ORDER if possible & _COLUMNS[c])
+
+    for depth in range(1, NUM_ROWS * NUM_COLS - _popcount(mask) + 1):
+        try:
+            value, col = search.negamax(position, mask, depth, -_WIN_SCORE - 1, _WIN_SCORE + 1)
+        except _Timeout:
+            break
+
+        if col is not None:
+            move = col
+        if abs(value) >= _WIN_SCORE - NUM_ROWS * NUM_COLS:
+            # Found a forced win (or loss), searching deeper won't change it.
+            break
+
+    return move
+
+
+# ------ Actual board ------
+
 class Tile(enum.Enum):
     NONE = '\N{MEDIUM BLACK CIRCLE}'
     X = '\N{LARGE RED CIRCLE}'
@@ -44,11 +233,6 @@ class Tile(enum.Enum):
         return self.value
 
 
-def _is_full(line):
-    line = set(line)
-    return len(line) == 1 and Tile.NONE not in line
-
-
 _winning_tile_indices = {Tile.X: 0, Tile.O: 1}
 
 
@@ -57,38 +241,55 @@ class Board:
     _winning_tiles = ['\N{HEAVY BLACK HEART}', '\N{BLUE HEART}']
 
     def __init__(self):
-        self._board = [[Tile.NONE] * NUM_ROWS for _ in range(NUM_COLS)]
+        self._boards = {Tile.X: 0, Tile.O: 0}
+        self._mask = 0
+        self._winning_cells = 0
         self._last_column = None
 
+    def _tile_at(self, column, row):
+        bit = 1 << (column * _H1 + row)
+        for tile, bb in self._boards.items():
+            if bb & bit:
+                if self._winning_cells & bit:
+                    # TODO: Custom emojis for tiles?
+                    return self._winning_tiles[_winning_tile_indices[tile]]
+                return tile
+        return Tile.NONE
+
     def __str__(self):
-        fmt = ''.join(itertools.repeat('{}', NUM_COLS))
-        return self.top_row + '\n' + '\n'.join(map(fmt.format, *map(reversed, self._board)))
+        rows = (
+            ''.join(str(self._tile_at(col, row)) for col in range(NUM_COLS))
+            for row in reversed(range(NUM_ROWS))
+        )
+        return self.top_row + '\n' + '\n'.join(rows)
 
     def is_full(self):
-        return Tile.NONE not in itertools.chain.from_iterable(self._board)
+        return self._mask == _FULL
 
     def place(self, column, piece):
-        board_column = self._board[column]
-        board_column[board_column.index(Tile.NONE)] = piece
-        self._last_column = column
+        if not 0 <= column < NUM_COLS:
+            raise IndexError(f'column must be between 0 and {NUM_COLS - 1}')
 
-    def mark_winning_lines(self):
-        b = self._board
+        # Adding the bottom bit carries up to the first empty cell. If the
+        # column is full it carries into the top bit, which is masked out.
+        move = (self._mask + _BOTTOMS[column]) & _COLUMNS[column]
+        if not move:
+            raise ValueError(f'column {column} is full')
 
-        lines = (tuple(b[c][r] for c, r in line) for line in _default_indices)
-        for line_idx in locate(lines, _is_full):
-            indices = _default_indices[line_idx]
-            winner = b[indices[0][0]][indices[0][1]]
-            emoji = self._winning_tiles[_winning_tile_indices[winner]]
+        self._boards[piece] |= move
+        self._mask |= move
+        self._last_column = column
 
-            for c, r in indices:
-                # TODO: Custom emojis for tiles?
-                b[c][r] = emoji
+    def best_move(self, piece, **kwargs):
+        """Return the column Chiaki would play for piece."""
+        return best_move(self._boards[piece], self._mask, **kwargs)
+
+    def mark_winning_lines(self):
+        self._winning_cells = _winning_cells(self._boards[Tile.X]) | _winning_cells(self._boards[Tile.O])
 
     @property
     def winner(self):
-        lines = (tuple(self._board[c][r] for c, r in line) for line in _default_indices)
-        return first_true(lines, (None, ), _is_full)[0]
+        return next((tile for tile, bb in self._boards.items() if _is_win(bb)), None)
 
     @property
     def top_row(self):
@@ -151,7 +352,15 @@ class ConnectFourSession:
         else:
             return True
 
+    async def _make_ai_move(self):
+        symbol = self.current.symbol
+        column = await self.ctx.bot.loop.run_in_executor(None, self._board.best_move, symbol)
+        self._board.place(column, symbol)
+
     async def wait_for_player_move(self):
+        if self.current.user == self.ctx.me:
+            return await self._make_ai_move()
+
         message = await self.ctx.bot.wait_for('message', timeout=60, check=self._check)
         with contextlib.suppress(discord.HTTPException):
             await message.delete()
@@ -226,7 +435,12 @@ class ConnectFourSession:
         return discord.utils.get(self._players, symbol=self._board.winner)
 
 class Connect4(TwoPlayerGameCog, name='Connect 4', game_cls=ConnectFourSession, aliases=['con4']):
-    pass
+    async def _game_ai(self, ctx):
+        """Starts a game of {name} against me.
+
+        I'll take about a second to think about each move.
+        """
+        await self._play_against_bot(ctx)
 
 def setup(bot):
     bot.add_cog(Connect4(bot))
\ No newline at end of file
@@ -1,5 +1,7 @@
 import itertools
+import random
 import string
+import time
 from collections import Counter
 
 from more_itertools import flatten, interleave_longest
@@ -183,18 +185,308 @@ class Board:
         return self._moves
 
 
+# ------ AI ------
+#
+# For the AI, the lines are numbered, horizontal ones first (row by row),
+# then the vertical ones, and a position is just a bitmask of the lines
+# that have been made.
+
+def _popcount(n):
+    return bin(n).count('1')
+
+
+class _Layout:
+    """The line numbering for a board of a given size."""
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+        self.num_horizontal = num_horizontal = (height + 1) * width
+        self.num_lines = num_horizontal + height * (width + 1)
+        self.full = (1 << self.num_lines) - 1
+
+        # box -> mask of its four lines, line -> boxes it's a side of
+        self.boxes = []
+        self.line_boxes = [[] for _ in range(self.num_lines)]
+        for y, x in itertools.product(range(height), range(width)):
+            lines = (
+                y * width + x,
+                (y + 1) * width + x,
+                num_horizontal + y * (width + 1) + x,
+                num_horizontal + y * (width + 1) + x + 1,
+            )
+            for line in lines:
+                self.line_boxes[line].append(len(self.boxes))
+            self.boxes.append(sum(1 << line for line in lines))
+
+    def lines_of(self, board):
+        lines = 0
+        for y, row in enumerate(board._horizontal):
+            for x, line in enumerate(row):
+                if line is not None:
+                    lines |= 1 << (y * self.width + x)
+
+        for y, row in enumerate(board._vertical):
+            for x, line in enumerate(row):
+                if line is not None:
+                    lines |= 1 << (self.num_horizontal + y * (self.width + 1) + x)
+        return lines
+
+    def to_move(self, line):
+        if line < self.num_horizontal:
+            y, x = divmod(line, self.width)
+            return _i_to_xy(x, y) + _i_to_xy(x + 1, y)
+
+        y, x = divmod(line - self.num_horizontal, self.width + 1)
+        return _i_to_xy(x, y) + _i_to_xy(x, y + 1)
+
+
+_layouts = {}
+
+
+def _get_layout(width, height):
+    try:
+        return _layouts[width, height]
+    except KeyError:
+        layout = _layouts[width, height] = _Layout(width, height)
+        return layout
+
+
+def _bits(n):
+    while n:
+        low = n & -n
+        yield low.bit_length() - 1
+        n ^= low
+
+
+class _Timeout(Exception):
+    pass
+
+
+_EXACT, _LOWER, _UPPER = range(3)
+
+
+class _Player:
+    """Plays Dots and Boxes.
+
+    While there are safe lines left (lines that don't give away a box), it
+    just takes whatever boxes it can and plays a safe line. Once those
+    run out, everything left is a chain or a loop, and it searches the
+    rest of the game with alpha-beta, only looking at one line per chain
+    (or two for chains of two) to give away, and at taking a box or
+    double-dealing when there are boxes to take.
+
+    If the search doesn't finish in time, it falls back to giving away
+    the smallest chain, keeping control when there are long chains left.
+    """
+    def __init__(self, layout, deadline):
+        self.layout = layout
+        self.deadline = deadline
+        self.table = {}
+        self.nodes = 0
+
+    def _sides(self, lines):
+        return [_popcount(lines & box) for box in self.layout.boxes]
+
+    def _safe_lines(self, lines, sides):
+        line_boxes = self.layout.line_boxes
+        return [
+            line for line in _bits(self.layout.full & ~lines)
+            if all(sides[b] < 2 for b in line_boxes[line])
+        ]
+
+    def _captures(self, lines, sides):
+        """Return (line, box) for every box that can be taken."""
+        boxes = self.layout.boxes
+        return [
+            ((boxes[b] & ~lines).bit_length() - 1, b)
+            for b, count in enumerate(sides) if count == 3
+        ]
+
+    def _double_deals(self, lines, sides, captures):
+        # Given a box that can be taken, if the box after it is the last
+        # one in the chain, the two can be left for the opponent by making
+        # the line at the end of the chain. They get the two boxes, but
+        # have to give us the next chain.
+        layout = self.layout
+        for line, box in captures:
+            for next_box in layout.line_boxes[line]:
+                if next_box == box or sides[next_box] != 2:
+                    continue
+
+                end = (layout.boxes[next_box] & ~lines & ~(1 << line)).bit_length() - 1
+                if all(b == next_box for b in layout.line_boxes[end]):
+                    yield end
+
+    def _components(self, lines, sides):
+        """Return the chains and loops as (boxes, open lines, is_loop)"""
+        layout = self.layout
+        seen = set()
+        for start, count in enumerate(sides):
+            if count != 2 or start in seen:
+                continue
+
+            boxes, open_lines, stack = {start}, set(), [start]
+            while stack:
+                box = stack.pop()
+                for line in _bits(layout.boxes[box] & ~lines):
+                    open_lines.add(line)
+                    for other in layout.line_boxes[line]:
+                        if other not in boxes and sides[other] == 2:
+                            boxes.add(other)
+                            stack.append(other)
+
+            seen |= boxes
+            yield boxes, open_lines, len(open_lines) == len(boxes)
+
+    def _sacrifices(self, lines, sides):
+        line_boxes = self.layout.line_boxes
+        options, shapes = [], set()
+        for boxes, open_lines, is_loop in sorted(self._components(lines, sides), key=lambda c: len(c[0])):
+            shape = len(boxes), is_loop
+            if shape in shapes:
+                # Giving away a chain that looks exactly the same as one we
+                # already tried won't change anything.
+                continue
+            shapes.add(shape)
+
+            ends = [line for line in open_lines if sum(b in boxes for b in line_boxes[line]) == 1]
+            middles = [line for line in open_lines if sum(b in boxes for b in line_boxes[line]) == 2]
+            if is_loop or not ends:
+                options.append(next(iter(open_lines)))
+                continue
+
+            options.append(ends[0])
+            if len(boxes) == 2 and middles:
+                # Giving it away with the middle line stops them from
+                # double-dealing.
+                options.append(middles[0])
+
+        return options
+
+    def _options(self, lines, sides):
+        """Return the lines worth trying in the endgame, with how many
+        boxes each one takes.
+        """
+        captures = self._captures(lines, sides)
+        if captures:
+            line, box = captures[0]
+            count = sum(sides[b] == 3 for b in self.layout.line_boxes[line])
+            return [(line, count), *((end, 0) for end in self._double_deals(lines, sides, captures))]
+
+        return [(line, 0) for line in self._sacrifices(lines, sides)]
+
+    def negamax(self, lines, alpha, beta):
+        self.nodes += 1
+        if not self.nodes & 255 and time.monotonic() > self.deadline:
+            raise _Timeout
+
+        if lines == self.layout.full:
+            return 0, None
+
+        original_alpha = alpha
+        entry = self.table.get(lines)
+        if entry is not None:
+            flag, value, best = entry
+            if flag == _EXACT:
+                return value, best
+            if flag == _LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value, best
+
+        best_value, best = None, None
+        for line, taken in self._options(lines, self._sides(lines)):
+            child = lines | 1 << line
+            if taken:
+                # We get to move again.
+                value, _ = self.negamax(child, alpha - taken, beta - taken)
+                value += taken
+            else:
+                value, _ = self.negamax(child, -beta, -alpha)
+                value = -value
+
+            if best_value is None or value > best_value:
+                best_value, best = value, line
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= original_alpha:
+            flag = _UPPER
+        elif best_value >= beta:
+            flag = _LOWER
+        else:
+            flag = _EXACT
+        self.table[lines] = flag, best_value, best
+        return best_value, best
+
+    def _fallback(self, lines, sides):
+        captures = self._captures(lines, sides)
+        if captures:
+            deals = list(self._double_deals(lines, sides, captures))
+            if deals:
+                # Only worth keeping control if there's something big left.
+                rest = [
+                    (len(boxes), is_loop) for boxes, _, is_loop in self._components(lines, sides)
+                    if not any(b for _, b in captures if b in boxes)
+                ]
+                if any(size >= 3 for size, _ in rest):
+                    return deals[0]
+            return captures[0][0]
+
+        return self._sacrifices(lines, sides)[0]
+
+    def best_line(self, lines):
+        sides = self._sides(lines)
+        safe = self._safe_lines(lines, sides)
+        if safe:
+            captures = self._captures(lines, sides)
+            # Free boxes, there's no reason to not take them yet.
+            return captures[0][0] if captures else random.choice(safe)
+
+        try:
+            _, line = self.negamax(lines, -len(sides) - 1, len(sides) + 1)
+        except _Timeout:
+            line = None
+
+        return self._fallback(lines, sides) if line is None else line
+
+
+def best_move(board, *, time_limit=0.8):
+    """Return the move Chiaki would make, thinking for at most about
+    time_limit seconds.
+    """
+    layout = _get_layout(board.width, board.height)
+    player = _Player(layout, time.monotonic() + time_limit)
+    return layout.to_move(player.best_line(layout.lines_of(board)))
+
+
 # Board that uses PIL for image. If you just want to copy the board, Ignore this.
 import asyncio
 import io
 
 from PIL import Image, ImageDraw, ImageFont
 
+from ..utils import cache
+from ..utils.processes import run_in_process
+
 LINE_LENGTH = 120
 LINE_WIDTH = 10
 LINE_RADIUS = LINE_WIDTH // 2
 DOT_SIZE = 20
 DOT_RADIUS = DOT_SIZE // 2
-LINE_COLOURS = [(255, 0, 0, 255), (0, 0, 255, 255)]
+BASE = LINE_LENGTH + DOT_SIZE
+
+# The images only use a few colours, so they're drawn with a palette, which
+# is a lot smaller (and faster to encode) than full RGBA.
+#            background       dots/text  lines                    boxes
+_PALETTE = [(245, 245, 245), (0, 0, 0), (255, 0, 0), (0, 0, 255), (204, 0, 0), (0, 0, 204)]
+_BACKGROUND, _BLACK = 0, 1
+LINE_COLOURS = [2, 3]
+BOX_COLOURS = [4, 5]
 
 
 try:
@@ -206,103 +498,136 @@ MARGIN_SIZE = 60
 TEXT_OFFSET = MARGIN_SIZE / 3
 
 
-class ImageBoard(Board):
-    def _grid_image(self):
-        w, h = self.width, self.height
-        base = LINE_LENGTH + DOT_SIZE
-        size = (base * w + DOT_SIZE, base * h + DOT_SIZE)
-        grid_image = Image.new('RGBA', size)
-        draw = ImageDraw.Draw(grid_image)
+def _draw_dot(draw, x, y):
+    ex, ey = BASE * x + MARGIN_SIZE, BASE * y + MARGIN_SIZE
+    draw.ellipse([ex, ey, ex + DOT_SIZE, ey + DOT_SIZE], _BLACK)
 
-        def draw_from(list_, x_offset, y_offset, handle):
-            for y, row in enumerate(list_):
-                start_y = base * y + y_offset
 
-                for x, space in enumerate(row):
-                    if space is None:
-                        continue
+@cache.cache(maxsize=16)
+def _background(width, height):
+    """Return the parts of the image that never change for a given board
+    size, i.e. the dots and the labels. Don't modify this, copy it.
+    """
+    size = BASE * width + DOT_SIZE + MARGIN_SIZE * 2, BASE * height + DOT_SIZE + MARGIN_SIZE * 2
+    image = Image.new('P', size, _BACKGROUND)
+    image.putpalette([c for colour in _PALETTE for c in colour])
+    draw = ImageDraw.Draw(image)
+
+    # A-H
+    for i, char in enumerate(string.ascii_uppercase[:width + 1]):
+        text_width, _ = draw.textsize(char, font=_XY_FONT)
+        xy = (i * BASE + MARGIN_SIZE + text_width // 4, TEXT_OFFSET)
+        draw.text(xy, char, fill=_BLACK, font=_XY_FONT)
+    # 1-8
+    for i in range(height + 1):
+        xy = (TEXT_OFFSET, i * BASE + MARGIN_SIZE)
+        draw.text(xy, str(i + 1), fill=_BLACK, font=_XY_FONT)
 
-                    start_x = base * x + x_offset
-                    colour = LINE_COLOURS[space]
-                    handle(start_x, start_y, colour)
+    for x, y in itertools.product(range(width + 1), range(height + 1)):
+        _draw_dot(draw, x, y)
 
-        def draw_line(index):
-            def draw_line(x, y, colour):
-                coords = [x, y] * 2
-                coords[2 + index] += LINE_LENGTH
-                draw.line(coords, fill=colour, width=LINE_WIDTH)
-            return draw_line
+    return image
 
-        draw_from(self._horizontal, DOT_SIZE, DOT_RADIUS, draw_line(0))
-        draw_from(self._vertical, DOT_RADIUS, DOT_SIZE, draw_line(1))
 
-        def draw_box(x, y, colour):
-            end_x = x + LINE_LENGTH + DOT_RADIUS
-            end_y = y + LINE_LENGTH + DOT_RADIUS
-            colour = (*(round(c * 0.8) for c in colour[:3]), 255, )
-            draw.rectangle([x, y, end_x, end_y], fill=colour)
+def _encode_png(image):
+    # This runs in another process, so it has to be a top-level function.
+    f = io.BytesIO()
+    image.save(f, 'png', optimize=True)
+    return f.getvalue()
 
-        draw_from(self._boxes, DOT_RADIUS + LINE_RADIUS, DOT_RADIUS + LINE_RADIUS, draw_box)
 
-        for x, y in itertools.product(range(self.width + 1), range(self.height + 1)):
-            ex, ey = base * x, base * y
-            draw.ellipse([ex, ey, ex + DOT_SIZE, ey + DOT_SIZE], (0, 0, 0, 255))
+class ImageBoard(Board):
+    """Board that's also drawn as an image.
+
+    Rather than drawing the whole thing every time, only the lines and
+    boxes that were made since the last time are drawn onto a canvas
+    that's kept around, on top of the background for the board's size.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._canvas = None
+        self._new_lines = []
+        self._new_boxes = []
+
+    def _check_and_set_squares(self, x, y):
+        filled = super()._check_and_set_squares(x, y)
+        if filled:
+            self._new_boxes.append((x, y))
+        return filled
 
-        return grid_image
+    def _make_line(self, p1, p2):
+        super()._make_line(p1, p2)
+        (x1, y1), (x2, y2) = p1, p2
+        self._new_lines.append((x1 == x2, min(x1, x2), min(y1, y2)))
 
     def _image(self):
-        # For performance reasons it might be better to lump this with
-        # the grid... For maintainability reasons, I'm separating the
-        # grid with the text.
-        w, h = self.width, self.height
-        base = LINE_LENGTH + DOT_SIZE
-
-        grid = self._grid_image()
-        grid_w, grid_h = grid.size
-        size = grid_w + MARGIN_SIZE * 2, grid_h + MARGIN_SIZE * 2
-
-        image = Image.new('RGBA', size, (245, 245, 245, 255))
-        image.paste(grid, (MARGIN_SIZE, MARGIN_SIZE), mask=grid)
-        text_draw = ImageDraw.Draw(image)
-
-        # A-H
-        for i, char in enumerate(string.ascii_uppercase[:w + 1]):
-            w, h = text_draw.textsize(char, font=_XY_FONT)
-            xy = (i * base + MARGIN_SIZE + w // 4, TEXT_OFFSET)
-            text_draw.text(xy, char, fill=0, font=_XY_FONT)
-        # 1-8
-        for i in range(h):
-            char = str(i + 1)
-            w, h = text_draw.textsize(char, font=_XY_FONT)
-            xy = (TEXT_OFFSET, i * base + MARGIN_SIZE)
-            text_draw.text(xy, char, fill=0, font=_XY_FONT)
-
-        return image
+        canvas = self._canvas
+        if canvas is None:
+            canvas = self._canvas = _background(self.width, self.height).copy()
+
+        draw = ImageDraw.Draw(canvas)
+        # The dots have to be on top, so the ones that got drawn over have
+        # to be drawn again.
+        dots = set()
+
+        # Boxes are always drawn after their lines, since a box is only
+        # made once all four of its lines are.
+        for vertical, x, y in self._new_lines:
+            if vertical:
+                colour = LINE_COLOURS[self._vertical[y][x]]
+                start_x, start_y = BASE * x + DOT_RADIUS, BASE * y + DOT_SIZE
+                end_x, end_y = start_x, start_y + LINE_LENGTH
+                dots.update(((x, y), (x, y + 1)))
+            else:
+                colour = LINE_COLOURS[self._horizontal[y][x]]
+                start_x, start_y = BASE * x + DOT_SIZE, BASE * y + DOT_RADIUS
+                end_x, end_y = start_x + LINE_LENGTH, start_y
+                dots.update(((x, y), (x + 1, y)))
+
+            coords = [c + MARGIN_SIZE for c in (start_x, start_y, end_x, end_y)]
+            draw.line(coords, fill=colour, width=LINE_WIDTH)
+
+        for x, y in self._new_boxes:
+            start_x = BASE * x + DOT_RADIUS + LINE_RADIUS + MARGIN_SIZE
+            start_y = BASE * y + DOT_RADIUS + LINE_RADIUS + MARGIN_SIZE
+            end_x, end_y = start_x + LINE_LENGTH + DOT_RADIUS, start_y + LINE_LENGTH + DOT_RADIUS
+            draw.rectangle([start_x, start_y, end_x, end_y], fill=BOX_COLOURS[self._boxes[y][x]])
+            dots.update(itertools.product((x, x + 1), (y, y + 1)))
+
+        for x, y in dots:
+            _draw_dot(draw, x, y)
+
+        self._new_lines.clear()
+        self._new_boxes.clear()
+        return canvas
 
     def _image_file(self):
-        image = self._image()
-        f = io.BytesIO()
-        image.save(f, 'png')
-        f.seek(0)
-        return f
+        return io.BytesIO(_encode_png(self._image()))
 
     def image(self, *, async_=False, loop=None):
+        # The drawing itself is only a few calls, so it's fine to do here.
+        image = self._image().copy()
         if not async_:
-            return self._image()
-        loop = loop or asyncio.get_event_loop()
-        return loop.run_in_executor(None, self._image)
+            return image
+
+        future = (loop or asyncio.get_event_loop()).create_future()
+        future.set_result(image)
+        return future
+
+    async def _image_file_async(self, loop):
+        # Copy it so the canvas can't change while it's being sent over.
+        data = await run_in_process(_encode_png, self._image().copy(), loop=loop)
+        return io.BytesIO(data)
 
     def image_file(self, *, async_=False, loop=None):
         if not async_:
             return self._image_file()
-        loop = loop or asyncio.get_event_loop()
-        return loop.run_in_executor(None, self._image_file)
+        return self._image_file_async(loop)
 
 
 # Below is the game logic. If you just want to copy the board, Ignore this.
 
 import contextlib
-import random
 import re
 
 import discord
@@ -387,12 +712,21 @@ class DotsAndBoxesSession:
         file = await board.image_file(async_=True)
         self._image = discord.File(file, 'dots-and-boxes.png')
 
+    async def _make_ai_move(self):
+        move = await self._ctx.bot.loop.run_in_executor(None, best_move, self._board)
+        self._board.move(move)
+
     async def _loop(self):
         wait_for = self._ctx.bot.wait_for
         # needed cuz we're looking this up a few times
         resigned = Status.QUIT
 
         while not self._board.is_finished():
+            if self.current == self._ctx.me:
+                # No need to show the board for every line Chiaki makes.
+                await self._make_ai_move()
+                continue
+
             await self._update_display()
             async with temp_message(self._ctx, embed=self._display, file=self._image):
                 try:
@@ -424,6 +758,10 @@ class DotsAndBoxes(TwoPlayerGameCog, game_cls=DotsAndBoxesSession, cmd='dots-box
     async def _end_game(self, ctx, inst, result):
         pass
 
+    async def _game_ai(self, ctx):
+        """Starts a game of {name} against me."""
+        await self._play_against_bot(ctx)
+
 def setup(bot):
     bot.add_cog(DotsAndBoxes(bot))
  
\ No newline at end of file
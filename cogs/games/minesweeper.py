@@ -3,6 +3,7 @@ import collections
 import contextlib
 import enum
 import itertools
+import logging
 import random
 import re
 import textwrap
@@ -14,13 +15,17 @@ from string import ascii_lowercase, ascii_uppercase
 
 import discord
 from discord.ext import commands
-from more_itertools import chunked, tail
+from more_itertools import tail
 
+from ..utils import cache
 from ..utils.formats import pluralize
 from ..utils.misc import emoji_url, REGIONAL_INDICATORS
 from ..utils.paginator import InteractiveSession, trigger
+from ..utils.processes import run_in_process
 from ..utils.time import duration_units
 
+log = logging.getLogger(__name__)
+
 
 __schema__ = """
     CREATE TABLE IF NOT EXISTS minesweeper_games (
@@ -91,7 +96,21 @@ class FlagType(enum.Enum):
 
 
 SURROUNDING = list(filter(any, itertools.product(range(-1, 2), repeat=2)))
-VISIBLE, FLAG, UNSURE, MINE = range(4)
+# Cell states. Whether or not a cell is a mine is kept separately.
+HIDDEN, VISIBLE, FLAG, UNSURE = range(4)
+
+_NUMBER_TILES = ['\N{BLACK LARGE SQUARE}', *(f'{i}\u20e3' for i in range(1, 9))]
+
+
+@cache.cache(maxsize=32)
+def _neighbour_table(width, height):
+    """Return the indices of the cells around each cell of a board."""
+    return tuple(
+        tuple((y + dy) * width + x + dx for dx, dy in SURROUNDING
+              if 0 <= x + dx < width and 0 <= y + dy < height)
+        for y in range(height) for x in range(width)
+    )
+
 
 class Board:
     def __init__(self, width, height, mines):
@@ -100,7 +119,21 @@ class Board:
         self.height = height
         self._mine_count = mines
 
-        self._cell_types = ({}, set(), set(), set())
+        # Everything is kept in flat arrays, where (x, y) is at y * width + x.
+        size = width * height
+        self._neighbours = _neighbour_table(width, height)
+        self._mines = bytearray(size)
+        # How many mines surround each cell. Filled in when the mines are placed.
+        self._counts = bytearray(size)
+        self._states = bytearray(size)
+        self._placed = False
+        self._visible_count = 0
+        self._flag_count = 0
+
+        # Rendering every tile on every move adds up, so each row is only
+        # rendered again when something in it changed.
+        self._rows = [None] * height
+
         self._revealed = False
         self._explode_at = None
         self._blown_up = False
@@ -124,26 +157,47 @@ class Board:
         if mines <= 0:
             raise ValueError("A least one mine is required")
 
-    def _tiles(self):
-        visible, flags, unsures, mines = self._cell_types
-        reveal = self._revealed
-        visible_get = visible.get
-
-        for y, x in itertools.product(range(self.height), range(self.width)):
-            xy = x, y
-            number = visible_get(xy)
-            if number is not None:
-                yield f'{number}\u20e3' if number else '\N{BLACK LARGE SQUARE}'
-            elif xy in flags:
-                yield '\N{TRIANGULAR FLAG ON POST}'
-            elif xy in unsures:
-                yield '\N{BLACK QUESTION MARK ORNAMENT}'
-            elif xy in mines and reveal:
-                yield '\N{COLLISION SYMBOL}' if self._blown_up else '\N{TRIANGULAR FLAG ON POST}'
-            elif xy == self._explode_at:
-                yield '\N{COLLISION SYMBOL}'
-            else:
-                yield '\N{WHITE LARGE SQUARE}'
+    def _tile(self, index):
+        state = self._states[index]
+        if state == VISIBLE:
+            return _NUMBER_TILES[self._counts[index]]
+        if state == FLAG:
+            return '\N{TRIANGULAR FLAG ON POST}'
+        if state == UNSURE:
+            return '\N{BLACK QUESTION MARK ORNAMENT}'
+        if self._revealed and self._mines[index]:
+            return '\N{COLLISION SYMBOL}' if self._blown_up else '\N{TRIANGULAR FLAG ON POST}'
+        if index == self._explode_at:
+            return '\N{COLLISION SYMBOL}'
+        return '\N{WHITE LARGE SQUARE}'
+
+    def _row(self, y):
+        row = self._rows[y]
+        if row is None:
+            start = y * self.width
+            row = self._rows[y] = ''.join(map(self._tile, range(start, start + self.width)))
+        return row
+
+    def _render(self, x_row, y_row):
+        meta_text = (
+            f'**Marked:** {self.mines_marked} / {self.mine_count}\n'
+            f'**Flags Remaining:** {self.remaining_flags}'
+        )
+
+        top_row = '\u200b'.join(x_row[:self.width])
+        rows = map(self._row, range(self.height))
+        string = '\n'.join(map('{0}{1}'.format, y_row, rows))
+
+        return f'{meta_text}\n\u200b\n\N{BLACK LARGE SQUARE}{top_row}\n{string}'
+
+    def _invalidate(self, *indices):
+        if not indices:
+            self._rows = [None] * self.height
+            return
+
+        width, rows = self.width, self._rows
+        for i in indices:
+            rows[i // width] = None
 
     def __contains__(self, xy):
         x, y = xy
@@ -153,79 +207,94 @@ class Board:
         return '{0.__class__.__name__}({0.width}, {0.height}, {0.mine_count})'.format(self)
 
     def __str__(self):
-        meta_text = (
-            f'**Marked:** {self.mines_marked} / {self.mine_count}\n'
-            f'**Flags Remaining:** {self.remaining_flags}'
-        )
+        return self._render(REGIONAL_INDICATORS, REGIONAL_INDICATORS)
 
-        top_row = '\u200b'.join(REGIONAL_INDICATORS[:self.width])
-        rows = map(''.join, chunked(self._tiles(), self.width))
-        string = '\n'.join(map('{0}{1}'.format, REGIONAL_INDICATORS, rows))
+    def _place_mines_from(self, x, y):
+        start = y * self.width + x
+        surrounding = self._neighbours[start]
+        click_area = {start, *surrounding}
 
-        return f'{meta_text}\n\u200b\n\N{BLACK LARGE SQUARE}{top_row}\n{string}'
+        cells = [i for i in range(self.width * self.height) if i not in click_area]
+        placed = random.sample(cells, k=min(self._mine_count, len(cells)))
+        placed += random.sample(surrounding, self._mine_count - len(placed))
 
-    def _place_mines_from(self, x, y):
-        surrounding = set(self._get_neighbours(x, y))
-        click_area = surrounding | {(x, y)}
+        # All mines should be exhausted, unless we somehow made a malformed board.
+        assert len(placed) == self._mine_count, f"only {len(placed)} mines were placed"
+        self._set_mines(placed)
 
-        coords = list(itertools.filterfalse(
-            click_area.__contains__,
-            itertools.product(range(self.width), range(self.height))
-        ))
+    def _set_mines(self, indices):
+        mines, counts, neighbours = self._mines, self._counts, self._neighbours
+        for i in indices:
+            mines[i] = 1
+            for n in neighbours[i]:
+                counts[n] += 1
 
-        self.mines.update(random.sample(coords, k=min(self._mine_count, len(coords))))
-        self.mines.update(random.sample(surrounding, self._mine_count - len(self.mines)))
+        self._placed = True
 
-        # All mines should be exhausted, unless we somehow made a malformed board.
-        assert len(self.mines) == self._mine_count, f"only {len(self.mines)} mines were placed"
+    def place_mines(self, mines, start):
+        """Place the mines at the given indices, then open the start cell.
+
+        This is for boards whose mines were made ahead of time.
+        """
+        self._set_mines(mines)
+        y, x = divmod(start, self.width)
+        self.show(x, y)
 
-    def _is(self, type, x, y):
-        return (x, y) in self._cell_types[type]
+    def _is(self, state, x, y):
+        return self._states[y * self.width + x] == state
 
-    is_mine = partialmethod(_is, MINE)
     is_visible = partialmethod(_is, VISIBLE)
     is_flag = partialmethod(_is, FLAG)
     is_unsure = partialmethod(_is, UNSURE)
     del _is
 
-    def _get_neighbours(self, x, y):
-        pairs = ((x + surr_x, y + surr_y) for (surr_x, surr_y) in SURROUNDING)
-        return (p for p in pairs if p in self)
+    def is_mine(self, x, y):
+        return bool(self._mines[y * self.width + x])
 
     def show(self, x, y):
-        if not self.mines:
+        if not self._placed:
             self._place_mines_from(x, y)
 
-        xy = x, y
-        if any(xy in cells for cells in self._cell_types[:-1]):
+        start = y * self.width + x
+        states = self._states
+        if states[start] != HIDDEN:
             return
 
-        mines, flags = self.mines, self.flags
-        if xy in mines and xy not in flags:
+        if self._mines[start]:
             self._blown_up = True
             raise HitMine(x, y)
 
-        neighbours = list(self._get_neighbours(x, y))
-        surrounding = sum(n in mines for n in neighbours)
-        self._cell_types[VISIBLE][xy] = surrounding
-
-        if not surrounding:
-            for nx, ny in neighbours:
-                self.show(nx, ny)
+        # Open the empty region (if any) breadth-first. There can't be any
+        # mines around an empty cell, so there's no need to check for them.
+        counts, neighbours = self._counts, self._neighbours
+        states[start] = VISIBLE
+        opened = [start]
+        queue = collections.deque(opened)
+        while queue:
+            index = queue.popleft()
+            if counts[index]:
+                continue
 
-    def _modify(self, type, x, y):
-        if self.is_visible(x, y):
-            return
+            for n in neighbours[index]:
+                if states[n] == HIDDEN:
+                    states[n] = VISIBLE
+                    opened.append(n)
+                    queue.append(n)
 
-        types = self._cell_types
-        xy = x, y
-        was_thing = xy in types[type]
+        self._visible_count += len(opened)
+        self._invalidate(*opened)
 
-        for t in [FLAG, UNSURE]:
-            types[t].discard(xy)
+    def _modify(self, state, x, y):
+        index = y * self.width + x
+        states = self._states
+        old = states[index]
+        if old == VISIBLE:
+            return
 
-        if not was_thing:
-            types[type].add(xy)
+        new = HIDDEN if old == state else state
+        states[index] = new
+        self._flag_count += (new == FLAG) - (old == FLAG)
+        self._invalidate(index)
 
     unsure = partialmethod(_modify, UNSURE)
 
@@ -235,32 +304,22 @@ class Board:
 
     def reveal(self):
         self._revealed = True
+        self._invalidate()
 
     def explode(self, x, y):
-        self._explode_at = x, y
+        self._explode_at = index = y * self.width + x
+        self._invalidate(index)
 
     def is_solved(self):
-        return len(self.visible) + len(self.mines) == self.width * self.height
-
-    @property
-    def mines(self):
-        return self._cell_types[MINE]
-
-    @property
-    def flags(self):
-        return self._cell_types[FLAG]
-
-    @property
-    def visible(self):
-        return self._cell_types[VISIBLE]
+        return self._visible_count + self._mine_count == self.width * self.height
 
     @property
     def mine_count(self):
-        return len(self.mines) or self._mine_count
+        return self._mine_count
 
     @property
     def mines_marked(self):
-        return len(self.flags)
+        return self._flag_count
 
     @property
     def remaining_flags(self):
@@ -282,6 +341,145 @@ class Board:
         return cls(13, 13, 40, **kwargs)
 
 
+# ---------- No-guess boards ------------
+
+# How the solver sees each cell.
+_UNKNOWN, _SAFE, _KNOWN_MINE = range(3)
+
+
+def _deductions(constraints):
+    """Find the cells that must be safe or mines from a set of constraints.
+
+    Each constraint is a frozenset of unknown cells mapped to how many mines
+    are in them. It tries each constraint on its own first, then pairs of
+    constraints that overlap.
+    """
+    safe, mines = set(), set()
+    for cells, need in constraints.items():
+        if not need:
+            safe |= cells
+        elif need == len(cells):
+            mines |= cells
+
+    if safe or mines:
+        return safe, mines
+
+    by_cell = collections.defaultdict(list)
+    for cells in constraints:
+        for cell in cells:
+            by_cell[cell].append(cells)
+
+    for a, need_a in constraints.items():
+        for b in {b for cell in a for b in by_cell[cell]}:
+            if a is b:
+                continue
+
+            only_b = b - a
+            extra = constraints[b] - need_a
+            if not only_b:
+                continue
+            if extra == len(only_b):
+                # Every cell only b has is a mine, so a's mines must all be
+                # shared with b, leaving the rest of a safe.
+                mines |= only_b
+                safe |= a - b
+            elif not extra and a < b:
+                safe |= only_b
+
+    return safe, mines
+
+
+def _is_solvable(width, height, mines, start):
+    """Return whether a board can be cleared from the start cell using
+    only logic, without ever having to guess.
+    """
+    neighbours = _neighbour_table(width, height)
+    size = width * height
+    counts = bytearray(size)
+    for i in range(size):
+        if mines[i]:
+            for n in neighbours[i]:
+                counts[n] += 1
+
+    known = bytearray(size)
+    mine_total = sum(mines)
+    opened = found = 0
+    to_open = [start]
+
+    while True:
+        while to_open:
+            index = to_open.pop()
+            if known[index]:
+                continue
+
+            known[index] = _SAFE
+            opened += 1
+            if not counts[index]:
+                to_open.extend(n for n in neighbours[index] if not known[n])
+
+        if opened + mine_total == size:
+            return True
+
+        constraints = {}
+        for index in range(size):
+            if known[index] != _SAFE or not counts[index]:
+                continue
+
+            around = neighbours[index]
+            unknown = frozenset(n for n in around if not known[n])
+            if unknown:
+                found_around = sum(known[n] == _KNOWN_MINE for n in around)
+                constraints[unknown] = counts[index] - found_around
+
+        safe, new_mines = _deductions(constraints)
+        if not (safe or new_mines):
+            # Last resort, if we know where every mine is (or isn't) then
+            # the rest of the board is known too.
+            unknown = [i for i in range(size) if not known[i]]
+            remaining = mine_total - found
+            if not remaining:
+                safe = unknown
+            elif remaining == len(unknown):
+                new_mines = unknown
+            else:
+                return False
+
+        for index in new_mines:
+            known[index] = _KNOWN_MINE
+        found += len(new_mines)
+        to_open.extend(safe)
+
+
+def generate_no_guess_board(width, height, mines, *, time_limit=10):
+    """Generate mines for a board that can be cleared without guessing.
+
+    Returns a tuple of the mines' indices and the cell to start from, or
+    None if no board could be made in time. This is slow, so it should be
+    run in a process.
+    """
+    neighbours = _neighbour_table(width, height)
+    size = width * height
+    deadline = time.perf_counter() + time_limit
+
+    while time.perf_counter() < deadline:
+        # The start has to be empty, otherwise the first move is a guess.
+        start = random.randrange(size)
+        click_area = {start, *neighbours[start]}
+        cells = [i for i in range(size) if i not in click_area]
+        if len(cells) < mines:
+            continue
+
+        placed = random.sample(cells, mines)
+        board = bytearray(size)
+        for i in placed:
+            board[i] = 1
+
+        if _is_solvable(width, height, board, start):
+            return placed, start
+
+    return None
+
+
 # Subclass that will be used for minesweeper, so that we can see
 # the original board class in case we need it later.
 class CustomizableRowBoard(Board):
@@ -291,16 +489,7 @@ class CustomizableRowBoard(Board):
         self._y_row = y_row
 
     def __str__(self):
-        meta_text = (
-            f'**Marked:** {self.mines_marked} / {self.mine_count}\n'
-            f'**Flags Remaining:** {self.remaining_flags}'
-        )
-
-        top_row = '\u200b'.join(self._x_row[:self.width])
-        rows = map(''.join, chunked(self._tiles(), self.width))
-        string = '\n'.join(map('{0}{1}'.format, self._y_row, rows))
-
-        return f'{meta_text}\n\u200b\n\N{BLACK LARGE SQUARE}{top_row}\n{string}'
+        return self._render(self._x_row, self._y_row)
 
     def examples(self, xs, ys):
         # We have duplicate values in FlagType, so we can't just iterate
@@ -819,11 +1008,32 @@ def not_playing_minesweeper():
     return commands.check(predicate)
 
 
+# How many no-guess boards of each level to keep around.
+NO_GUESS_RESERVE_SIZE = 3
+# How long to try generating a no-guess board before giving up.
+NO_GUESS_TIME_LIMIT = 10
+# Longest to wait before trying again when a no-guess board couldn't be made.
+NO_GUESS_MAX_RETRY_DELAY = 300
+
+
 class Minesweeper:
     def __init__(self, bot):
         self.bot = bot
         self.sessions = {}
 
+        # No-guess boards take a while to make, so some are made in the
+        # background, so that people don't have to wait for them.
+        self._no_guess_boards = {
+            level: collections.deque()
+            for level in [Level.easy, Level.medium, Level.hard]
+        }
+        self._no_guess_wanted = asyncio.Event()
+        self._no_guess_wanted.set()
+        self._no_guess_filler = bot.loop.create_task(self._fill_no_guess_boards())
+
+    def __unload(self):
+        self._no_guess_filler.cancel()
+
     # Needed to set the "control scheme" for minesweeper.
     # Depending on whether or not the bot has access to the number emojis
     # we need to properly set the control scheme, otherwise we'll have
@@ -878,13 +1088,13 @@ class Minesweeper:
 
         return ''
 
-    async def _say_ending_embed(self, ctx, level, time):
+    async def _say_ending_embed(self, ctx, level, time, *, record=True):
         rounded = round(time, 2)
         text = f'You beat Minesweeper on {level} in {duration_units(rounded)}.'
 
         extra_text = ''
         # Check if the player broke the world record.
-        if level is not Level.custom:
+        if record:
             await ctx.acquire()
             extra_text = await self._get_record_text(ctx.author.id, level, time, connection=ctx.db)
 
@@ -922,11 +1132,74 @@ class Minesweeper:
         if won is None:
             return
         elif won:
-            await self._say_ending_embed(ctx, level, time)
+            await self._say_ending_embed(ctx, level, time, record=record)
 
         if record:
             await self._record_game(ctx, level, time=time, won=won)
 
+    async def _generate_no_guess_board(self, level):
+        board = getattr(Board, level.name)()
+        return await run_in_process(
+            generate_no_guess_board,
+            board.width, board.height, board.mine_count,
+            time_limit=NO_GUESS_TIME_LIMIT,
+            loop=self.bot.loop,
+        )
+
+    async def _top_up_no_guess_boards(self):
+        # Returns False if a board couldn't be made in time.
+        for level, boards in self._no_guess_boards.items():
+            while len(boards) < NO_GUESS_RESERVE_SIZE:
+                result = await self._generate_no_guess_board(level)
+                if result is None:
+                    log.warning("Couldn't make a no-guess %s board in %d seconds.", level, NO_GUESS_TIME_LIMIT)
+                    return False
+                boards.append(result)
+        return True
+
+    async def _fill_no_guess_boards(self):
+        delay = 0
+        while True:
+            await self._no_guess_wanted.wait()
+            self._no_guess_wanted.clear()
+
+            try:
+                filled = await self._top_up_no_guess_boards()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception('Failed to make no-guess Minesweeper boards.')
+                filled = False
+
+            if filled:
+                delay = 0
+                continue
+
+            # Wait longer each time so a broken process pool doesn't have
+            # us retrying non-stop, then try again.
+            delay = min(max(delay * 2, 5), NO_GUESS_MAX_RETRY_DELAY)
+            await asyncio.sleep(delay)
+            self._no_guess_wanted.set()
+
+    async def _get_no_guess_board(self, ctx, level):
+        try:
+            result = self._no_guess_boards[level].popleft()
+        except IndexError:
+            # We ran out, so we have no choice but to make one now.
+            async with ctx.typing():
+                result = await self._generate_no_guess_board(level)
+
+        self._no_guess_wanted.set()
+        if result is None:
+            return None
+
+        board = getattr(CustomizableRowBoard, level.name)(
+            x_row=ctx.__msw_x_row__,
+            y_row=ctx.__msw_y_row__
+        )
+        board.place_mines(*result)
+        return board
+
     @commands.group(aliases=['msw'], invoke_without_command=True)
     @not_playing_minesweeper()
     @commands.bot_has_permissions(embed_links=True, add_reactions=True)
@@ -965,6 +1238,27 @@ class Minesweeper:
             else:
                 await self._do_minesweeper(ctx, Level.custom, board, record=False)
 
+    @minesweeper.command(name='noguess', aliases=['ng'])
+    @not_playing_minesweeper()
+    @commands.bot_has_permissions(embed_links=True, add_reactions=True)
+    async def minesweeper_no_guess(self, ctx, level: Level = Level.easy):
+        """Starts a game of Minesweeper that never needs any guessing
+
+        Part of the board will already be opened. From there you
+        can always work out where the mines are.
+
+        These games don't count for the leaderboard.
+        """
+        if level is Level.custom:
+            return await ctx.send('Custom boards can\'t be played without guessing. Sorry. ;-;')
+
+        with self._create_session(ctx):
+            board = await self._get_no_guess_board(ctx, level)
+            if board is None:
+                return await ctx.send("I couldn't make a board in time. Please try again later.")
+
+            await self._do_minesweeper(ctx, level, board, record=False)
+
     @minesweeper.command(name='leaderboard', aliases=['lb'])
     async def minesweeper_leaderboard(self, ctx):
         """Shows the 10 fastest times for each level of Minesweeper."""
@@ -108,11 +108,9 @@ class _RaceWaiter:
         if currency is None:
             raise RuntimeError("Betting isn't available right now. Please try again later.")
 
-        money = await currency.get_money(member.id, connection=connection)
-        if money < amount:
+        if await currency.withdraw(member.id, amount) is None:
             raise RuntimeError(f"{member.mention}, you don't have enough...")
 
-        await currency.add_money(member.id, -amount)
         self.pot += amount
 
     async def add_member(self, member, amount, *, connection):
@@ -262,10 +260,8 @@ class RacingSession:
         amount = self.pot // num_winners
         ids = [winner.user.id for winner in self._winners]
 
-        query = """UPDATE currency SET amount = currency.amount + $1 
-                   WHERE user_id = ANY($2::BIGINT[])
-                """
-        await self.ctx.db.execute(query, amount, ids)
+        currency = self.ctx.bot.get_cog('Money')
+        await currency.add_money_many(ids, amount)
 
     async def run(self):
         await self._loop()
@@ -331,7 +327,7 @@ class Racing:
                         # must be at least two racers.
                         user = one(waiter.members).user
                         await ctx.acquire()
-                        await currency.add_money(user.id, amount, connection=ctx.db)
+                        await currency.add_money(user.id, amount)
 
                 return await ctx.send("Can't start the race. There weren't enough people. ;-;")
 
@@ -36,11 +36,9 @@ class RussianRouletteSession:
         if currency is None:
             raise InvalidGameState("Betting isn't available right now. Please try again later.")
 
-        money = await currency.get_money(member.id, connection=connection)
-        if money < amount:
+        if await currency.withdraw(member.id, amount) is None:
             raise InvalidGameState(f"{member.mention}, you don't have enough...")
 
-        await currency.add_money(member.id, -amount)
         self.pot += amount
 
     async def add_member(self, member, amount, *, connection):
@@ -163,13 +161,12 @@ class RussianRoulette:
                             # We can assert that there will only be one racer because there
                             # must be at least two players.
                             user = one(inst.players)
-                            await currency.add_money(user.id, amount, connection=ctx.db)
+                            await currency.add_money(user.id, amount)
 
                     return await ctx.send(e)
 
             if inst.pot:
-                query = 'UPDATE currency SET amount = currency.amount + $1 WHERE user_id = $2'
-                await ctx.db.execute(query, inst.pot, winner.id)
+                await self.bot.get_cog('Money').add_money(winner.id, inst.pot)
                 extra = f'You win **{inst.pot}**{ctx.bot.emoji_config.money}. Hope that was worth it...'
             else:
                 extra = ''
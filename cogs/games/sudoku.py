@@ -1,25 +1,40 @@
 import asyncio
+import collections
 import enum
 import functools
 import itertools
+import logging
 import random
 import re
 import textwrap
 
 import discord
 from discord.ext import commands
-from more_itertools import flatten, grouper, sliced
+from more_itertools import grouper, sliced
 
 from .manager import SessionManager
 from ..utils.paginator import InteractiveSession, trigger
 from ..utils.misc import emoji_url
+from ..utils.processes import run_in_process
+
+log = logging.getLogger(__name__)
 
 __schema__ = """
     CREATE TABLE IF NOT EXISTS saved_sudoku_games (
         user_id BIGINT PRIMARY KEY,
-        board SMALLINT[9][9] NOT NULL,  -- size is not enforced but w/e
-        clues SMALLINT[] NOT NULL
+        -- The board packed by Board.to_bytes
+        data BYTEA,
+
+        -- Old saves stored the board and clues as arrays instead. These
+        -- are only read now, they're replaced the next time it's saved.
+        board SMALLINT[9][9],  -- size is not enforced but w/e
+        clues SMALLINT[]
     );
+
+    -- Migration for the packed boards.
+    ALTER TABLE saved_sudoku_games ADD COLUMN IF NOT EXISTS data BYTEA;
+    ALTER TABLE saved_sudoku_games ALTER COLUMN board DROP NOT NULL;
+    ALTER TABLE saved_sudoku_games ALTER COLUMN clues DROP NOT NULL;
 """
 
 SUDOKU_ICON = emoji_url('\N{INPUT SYMBOL FOR NUMBERS}')
@@ -29,41 +44,255 @@ BOARD_SIZE = 81
 EMPTY = 0
 
 
-# Sudoku board generator by Gareth Rees
-# This works best when m = 3.
-# For some reason it goes significantly slower when m >= 4
-# And it doesn't work when m = 2
-def _make_board(m=3):
-    """Return a random filled m**2 x m**2 Sudoku board."""
-    n = m * m
-    nn = n * n
-    board = [[None] * n for _ in range(n)]
-
-    def search(c=0):
-        i, j = divmod(c, n)
-        i0, j0 = i - i % 3, j - j % 3  # Origin of mxm block
-        numbers = random.sample(range(1, n + 1), n)
-        for x in numbers:
-            if (x not in board[i]                      # row
-                and all(row[j] != x for row in board)  # column
-                and all(x not in row[j0:j0+m]          # block
-                        for row in board[i0:i])):
-                board[i][j] = x
-                if c + 1 >= nn or search(c + 1):
-                    return board
-        else:
-            # No number is valid in this cell: backtrack and try again.
-            board[i][j] = None
+# ---------- Solving and generating ------------
+#
+# Cells are numbered 0-80 going across the rows, and each row, column
+# and box keeps the numbers in it as a bitmask, with bit n set for n.
+
+_ALL_NUMBERS = 0b1111111110
+_BIT_COUNTS = [bin(i).count('1') for i in range(1 << 10)]
+
+# Rows are units 0-8, columns 9-17 and boxes 18-26.
+_CELL_UNITS = tuple(
+    (i // 9, 9 + i % 9, 18 + i // 27 * 3 + i % 9 // 3)
+    for i in range(BOARD_SIZE)
+)
+_UNIT_CELLS = tuple(
+    tuple(i for i in range(BOARD_SIZE) if unit in _CELL_UNITS[i])
+    for unit in range(27)
+)
+_PEERS = tuple(
+    tuple(sorted({p for unit in _CELL_UNITS[i] for p in _UNIT_CELLS[unit]} - {i}))
+    for i in range(BOARD_SIZE)
+)
+# Where each box crosses each row and column, for locked candidates.
+_INTERSECTIONS = tuple(
+    (box, line, frozenset(box) & frozenset(line))
+    for box in _UNIT_CELLS[18:]
+    for line in _UNIT_CELLS[:18]
+    if frozenset(box) & frozenset(line)
+)
+
+
+def _unit_masks(grid):
+    """Return the numbers used by each unit, or None if any are repeated."""
+    used = [0] * 27
+    for i, number in enumerate(grid):
+        if not number:
+            continue
+
+        bit = 1 << number
+        units = _CELL_UNITS[i]
+        if any(used[u] & bit for u in units):
             return None
+        for u in units:
+            used[u] |= bit
+    return used
+
+
+def _search(grid, used, empties, limit, shuffle=False):
+    """Count the solutions of a grid up to limit, filling in the last one found.
+
+    The cell with the fewest possible numbers is always tried first.
+    """
+    if not empties:
+        return 1
+
+    best = best_free = None
+    fewest = 10
+    for position, i in enumerate(empties):
+        r, c, b = _CELL_UNITS[i]
+        free = _ALL_NUMBERS & ~(used[r] | used[c] | used[b])
+        count = _BIT_COUNTS[free]
+        if count < fewest:
+            best, best_free, fewest = position, free, count
+            if count <= 1:
+                break
+
+    if not fewest:
+        return 0
+
+    # Swap-remove the cell, so the rest can be searched.
+    empties[best], empties[-1] = empties[-1], empties[best]
+    i = empties.pop()
+    units = _CELL_UNITS[i]
+
+    numbers = [n for n in range(1, 10) if best_free >> n & 1]
+    if shuffle:
+        random.shuffle(numbers)
+
+    found = 0
+    for number in numbers:
+        bit = 1 << number
+        for u in units:
+            used[u] |= bit
+        grid[i] = number
+
+        found += _search(grid, used, empties, limit - found, shuffle)
+        if found >= limit:
+            return found
+
+        for u in units:
+            used[u] &= ~bit
+
+    grid[i] = EMPTY
+    empties.append(i)
+    empties[best], empties[-1] = empties[-1], empties[best]
+    return found
+
+
+def count_solutions(grid, limit=2):
+    """Return how many solutions a grid has, stopping at limit."""
+    used = _unit_masks(grid)
+    if used is None:
+        return 0
+
+    empties = [i for i, number in enumerate(grid) if not number]
+    return _search(list(grid), used, empties, limit)
+
+
+def _filled_grid():
+    grid = [EMPTY] * BOARD_SIZE
+    _search(grid, [0] * 27, list(range(BOARD_SIZE)), 1, shuffle=True)
+    return grid
+
+
+# The techniques needed to solve a puzzle, from easiest to hardest.
+SINGLES, INTERSECTIONS, GUESSING = range(3)
+
+
+class _LogicSolver:
+    """Solves a puzzle the way a person would, to see how hard it is."""
+    __slots__ = ('grid', 'candidates')
+
+    def __init__(self, puzzle):
+        self.grid = list(puzzle)
+        self.candidates = [0] * BOARD_SIZE
+        for i, number in enumerate(self.grid):
+            if not number:
+                taken = 0
+                for p in _PEERS[i]:
+                    taken |= 1 << self.grid[p]
+                self.candidates[i] = _ALL_NUMBERS & ~taken
+
+    def _place(self, i, number):
+        self.grid[i] = number
+        self.candidates[i] = 0
+        mask = ~(1 << number)
+        candidates = self.candidates
+        for p in _PEERS[i]:
+            candidates[p] &= mask
+
+    def _singles(self):
+        grid, candidates = self.grid, self.candidates
+        progress = False
+        for i in range(BOARD_SIZE):
+            free = candidates[i]
+            if not grid[i] and _BIT_COUNTS[free] == 1:
+                self._place(i, free.bit_length() - 1)
+                progress = True
+
+        if progress:
+            return True
+
+        for cells in _UNIT_CELLS:
+            for number in range(1, 10):
+                bit = 1 << number
+                spots = [i for i in cells if candidates[i] & bit]
+                if len(spots) == 1:
+                    self._place(spots[0], number)
+                    progress = True
+
+        return progress
+
+    def _eliminate(self, cells, mask):
+        candidates = self.candidates
+        removed = False
+        for i in cells:
+            if candidates[i] & mask:
+                candidates[i] &= ~mask
+                removed = True
+        return removed
+
+    def _intersections(self):
+        candidates = self.candidates
+        progress = False
+
+        # Locked candidates: if a number in a box can only go where it
+        # crosses a line, it can't go anywhere else on that line, and
+        # the other way around.
+        for box, line, shared in _INTERSECTIONS:
+            for number in range(1, 10):
+                bit = 1 << number
+                for unit, other in [(box, line), (line, box)]:
+                    spots = [i for i in unit if candidates[i] & bit]
+                    if spots and shared.issuperset(spots):
+                        rest = [i for i in other if i not in shared]
+                        progress |= self._eliminate(rest, bit)
+
+        # Naked pairs: two cells in a unit that can only be the same two
+        # numbers take those numbers from the rest of the unit.
+        for cells in _UNIT_CELLS:
+            pairs = collections.Counter(
+                candidates[i] for i in cells if _BIT_COUNTS[candidates[i]] == 2
+            )
+            for mask, count in pairs.items():
+                if count == 2:
+                    rest = [i for i in cells if candidates[i] != mask]
+                    progress |= self._eliminate(rest, mask)
+
+        return progress
+
+    def grade(self):
+        """Return the hardest technique needed to solve the puzzle."""
+        hardest = SINGLES
+        while EMPTY in self.grid:
+            if self._singles():
+                continue
+            if not self._intersections():
+                return GUESSING
+            hardest = INTERSECTIONS
+        return hardest
+
+
+# Levels of puzzles, in the same order as Board.difficulty
+BEGINNER, INTERMEDIATE, EXPERT, MINIMUM = range(1, 5)
+
+# The clues each level should have, and the techniques it may need.
+# A clue range of None means removing as many clues as possible.
+_LEVEL_RULES = {
+    BEGINNER: ((40, 45), {SINGLES}),
+    INTERMEDIATE: ((27, 36), {SINGLES, INTERSECTIONS}),
+    EXPERT: (None, {INTERSECTIONS}),
+    MINIMUM: (None, {GUESSING}),
+}
 
-    return search()
 
+def generate_puzzle(level):
+    """Return a puzzle of the given level that has exactly one solution.
 
-def _get_squares(board):
-    size = len(board[0])
-    subsize = int(size ** 0.5)
-    for slice_ in sliced(board, subsize):
-        yield from zip(*(sliced(line, subsize) for line in slice_))
+    This can take a while, so it should be run in a process.
+    """
+    clue_range, techniques = _LEVEL_RULES[level]
+    while True:
+        puzzle = _filled_grid()
+        target = random.randint(*clue_range) if clue_range else 0
+        clues = BOARD_SIZE
+
+        cells = list(range(BOARD_SIZE))
+        random.shuffle(cells)
+        for i in cells:
+            if clues <= target:
+                break
+
+            number, puzzle[i] = puzzle[i], EMPTY
+            if count_solutions(puzzle) == 1:
+                clues -= 1
+            else:
+                puzzle[i] = number
+
+        if _LogicSolver(puzzle).grade() in techniques:
+            return puzzle
 
 
 def _get_coords(size):
@@ -75,33 +304,61 @@ _number_markers = [f'{i}\u20e3' for i in range(1, 10)]
 _top_row = '  '.join(map('\u200b'.join, grouper(3, _letter_markers)))
 _top_row = '\N{SOUTH EAST ARROW}  ' + _top_row
 _letters = 'abcdefghi'
+_unit_names = [
+    *(f'Row {i}' for i in range(1, 10)),
+    *(f'Column {c}' for c in _letters.upper()),
+    *(f'Box {i}' for i in range(1, 10)),
+]
+_row_format = '{0}  {1}{2}{3}  {4}{5}{6}  {7}{8}{9}'
 
 
 DEFAULT_CLUE_EMOJIS = tuple(_number_markers)
 
 
+# Saved games are packed into 53 bytes: the difficulty (0 if it's not
+# known), then every cell's number as a nibble, then a bitmap of which
+# cells are clues.
+_PACKED_CELLS_SIZE = (BOARD_SIZE + 1) // 2
+_PACKED_CLUES_SIZE = (BOARD_SIZE + 7) // 8
+
+def _pack_board(board, clues, difficulty):
+    cells = [*itertools.chain.from_iterable(board), EMPTY]
+    clue_bits = sum(1 << (y * 9 + x) for x, y in clues)
+
+    return b''.join([
+        bytes([difficulty or 0]),
+        bytes(high << 4 | low for high, low in zip(cells[::2], cells[1::2])),
+        clue_bits.to_bytes(_PACKED_CLUES_SIZE, 'little'),
+    ])
+
+
+def _unpack_board(data):
+    cells = [n for byte in data[1:_PACKED_CELLS_SIZE + 1] for n in (byte >> 4, byte & 15)]
+    clue_bits = int.from_bytes(data[_PACKED_CELLS_SIZE + 1:], 'little')
+
+    board = [cells[i:i + 9] for i in range(0, BOARD_SIZE, 9)]
+    clues = {(i % 9, i // 9) for i in range(BOARD_SIZE) if clue_bits >> i & 1}
+    return board, clues, data[0] or None
+
+
 class Board:
-    __slots__ = ('_board', '_clues', '_clue_markers', 'new', 'dirty')
+    __slots__ = (
+        '_board', '_clues', '_clue_markers', '_difficulty', '_unit_counts',
+        '_conflicts', '_filled', '_rows', 'new', 'dirty',
+    )
 
-    def __init__(self, clues):
+    def __init__(self, puzzle, difficulty):
         self.new = True
         self.dirty = True  # So we can save this right away
-        self._board = _make_board()
+        self._difficulty = difficulty
 
-        # put holes in the board.
-        coords = list(_get_coords(BLOCK_SIZE * BLOCK_SIZE))
-        random.shuffle(coords)
-        it = iter(coords)
-
-        # slice the iterator first to get the "clues"
-        self._clues = set(itertools.islice(it, clues))
-
-        # Fill the rest
-        for p in it:
-            self[p] = EMPTY
+        size = BLOCK_SIZE * BLOCK_SIZE
+        self._board = [list(row) for row in sliced(puzzle, size)]
+        self._clues = {divmod(i, size)[::-1] for i, number in enumerate(puzzle) if number}
 
         # Needed to specially mark the clues.
         self._clue_markers = DEFAULT_CLUE_EMOJIS
+        self._recount()
 
     def __getitem__(self, xy):
         x, y = xy
@@ -112,72 +369,97 @@ class Board:
             raise ValueError("cannot place a number in a pre-placed clue")
 
         x, y = xy
-        self._board[y][x] = value
+        row = self._board[y]
+        self._count(x, y, row[x], -1)
+        row[x] = value
+        self._count(x, y, value, 1)
+
+        self._rows[y] = None
         self.dirty = True
 
     def __repr__(self):
         return f'{self.__class__.__name__}(clues={len(self._clues)!r})'
 
     def __str__(self):
-        fmt = "{0}  {1}{2}{3}  {4}{5}{6}  {7}{8}{9}"
+        return _top_row + '\n' + '\n'.join(map(self._row, range(len(self._board))))
+
+    def _row(self, y):
+        # Only the rows that were changed need to be drawn again.
+        row = self._rows[y]
+        if row is not None:
+            return row
+
         clues = self._clues
         clue_markers = self._clue_markers
 
-        def draw_cell(y, cell_pair):
-            x, cell = cell_pair
+        def draw_cell(x, cell):
             if not cell:
                 return '\N{BLACK LARGE SQUARE}'
 
             return clue_markers[cell - 1] if (x, y) in clues else f'{cell}\u20e3'
 
-        return _top_row + '\n' + '\n'.join(
-            fmt.format(
-                _number_markers[i],
-                *map(draw_cell, itertools.repeat(i), enumerate(line)),
-                '\N{WHITE SMALL SQUARE}'
-            )
-            + '\n' * (((i + 1) % 3 == 0))
-            for i, line in enumerate(self._board)
-        )
+        row = _row_format.format(_number_markers[y], *itertools.starmap(draw_cell, enumerate(self._board[y])))
+        row += '\n' * ((y + 1) % 3 == 0)
+        self._rows[y] = row
+        return row
+
+    @property
+    def clue_markers(self):
+        return self._clue_markers
+
+    @clue_markers.setter
+    def clue_markers(self, markers):
+        self._clue_markers = markers
+        self._rows = [None] * len(self._board)
+
+    # Instead of checking every row, column and box each time, how many of
+    # each number is in them is kept up to date with every placement.
+    # Whenever a number is in a unit twice, that's a conflict.
+
+    def _recount(self):
+        self._unit_counts = [bytearray(10) for _ in range(27)]
+        self._conflicts = self._filled = 0
+        self._rows = [None] * len(self._board)
+
+        for y, row in enumerate(self._board):
+            for x, number in enumerate(row):
+                self._count(x, y, number, 1)
+
+    def _count(self, x, y, number, change):
+        if not number:
+            return
+
+        self._filled += change
+        for unit in _CELL_UNITS[y * 9 + x]:
+            counts = self._unit_counts[unit]
+            counts[number] += change
+            if change > 0 and counts[number] == 2:
+                self._conflicts += 1
+            elif change < 0 and counts[number] == 1:
+                self._conflicts -= 1
 
     def is_full(self):
-        return EMPTY not in flatten(self._board)
+        return self._filled == BOARD_SIZE
 
     def validate(self):
         # If the board is not full then it's not valid.
         if not self.is_full():
             raise ValueError('Fill the board first.')
 
-        row_markers = range(1, len(self._board[0]) + 1)
-        column_markers = _letters.upper()
-
-        required_nums = set(row_markers)
-
-        def check(lines, header, seq):
-            lines = enumerate(map(set, lines))
-            if all(line == required_nums for _, line in lines):
-                return
-
-            # If this is exhausted then the all clause would've been True
-            # and thus this won't be executed.
-            num, _ = next(lines, (10, None))
-            raise ValueError(f'{header} {seq[num - 1]} is invalid')
+        # A full board with no repeats has every number in every unit.
+        if not self._conflicts:
+            return
 
-        # Check rows
-        check(self._board, 'Row', row_markers)
-        # Check columns
-        check(zip(*self._board), 'Column', column_markers)
-        # Check boxes
-        check(map(flatten, _get_squares(self._board)), 'Box', row_markers)
+        unit = next(i for i, counts in enumerate(self._unit_counts) if max(counts) > 1)
+        raise ValueError(f'{_unit_names[unit]} is invalid')
 
     def clear(self):
         non_clues = itertools.filterfalse(self._clues.__contains__, _get_coords(len(self._board)))
         for p in non_clues:
             self[p] = EMPTY
 
-    def to_data(self):
-        size = len(self._board[0])
-        return self._board, [x * size + y for x, y in self._clues]
+    def to_bytes(self):
+        return _pack_board(self._board, self._clues, self._difficulty)
 
     @classmethod
     def from_data(cls, data):
@@ -185,35 +467,41 @@ class Board:
         size = BLOCK_SIZE * BLOCK_SIZE
         self = cls.__new__(cls)
 
-        self._board = data['board']
-        self._clues = {divmod(clue, size) for clue in data['clues']}
+        if data['data'] is not None:
+            self._board, self._clues, self._difficulty = _unpack_board(data['data'])
+        else:
+            self._board = data['board']
+            self._clues = {divmod(clue, size) for clue in data['clues']}
+            self._difficulty = None
+
         self.new = False
         self.dirty = False  # We don't need to save a game we just loaded.
         self._clue_markers = DEFAULT_CLUE_EMOJIS  # Needed to specially mark the clues.
+        self._recount()
 
         return self
 
     @classmethod
     def beginner(cls):
         """Returns a sudoku board suitable for beginners"""
-        return cls(clues=random.randint(40, 45))
+        return cls(generate_puzzle(BEGINNER), BEGINNER)
 
     @classmethod
     def intermediate(cls):
         """Returns a sudoku board suitable for intermediate players"""
-        return cls(clues=random.randint(27, 36))
+        return cls(generate_puzzle(INTERMEDIATE), INTERMEDIATE)
 
     @classmethod
     def expert(cls):
         """Returns a sudoku board suitable for experts"""
-        return cls(clues=random.randint(19, 22))
+        return cls(generate_puzzle(EXPERT), EXPERT)
 
     @classmethod
     def minimum(cls):
         """Returns a sudoku board with the minimum amount of clues needed
         to achieve a unique solution.
         """
-        return cls(clues=17)
+        return cls(generate_puzzle(MINIMUM), MINIMUM)
 
     # difficulty aliases
     easy = beginner
@@ -223,14 +511,13 @@ class Board:
 
     @property
     def difficulty(self):
-        num_clues = len(self._clues)
-        ranges = [(40, 45), (27, 36), (19, 22), (0, 17)]
-
-        for i, (low, high) in enumerate(ranges, 1):
-            if low <= num_clues <= high:
-                return i
+        if self._difficulty is not None:
+            return self._difficulty
 
-        return -1
+        # Saved games don't know how hard they are, so we have to guess
+        # from the number of clues.
+        num_clues = len(self._clues)
+        return next((i for i, low in enumerate([40, 27, 18], 1) if num_clues >= low), MINIMUM)
 
 
 class _EnumConverter:
@@ -256,6 +543,13 @@ _difficulties = [n for n, v in Board.__dict__.items() if isinstance(v, classmeth
 _difficulties.remove('from_data')
 Difficulty = enum.Enum('Difficulty', _difficulties, type=_EnumConverter)
 
+_difficulty_levels = {
+    'beginner': BEGINNER, 'easy': BEGINNER,
+    'intermediate': INTERMEDIATE, 'medium': INTERMEDIATE,
+    'expert': EXPERT, 'hard': EXPERT,
+    'minimum': MINIMUM, 'extreme': MINIMUM,
+}
+
 
 HELP_TEXT = '''
 The goal is to fill each space with a number
@@ -301,9 +595,12 @@ class SudokuSession(InteractiveSession):
     def __init__(self, ctx, board):
         super().__init__(ctx)
         self._board = board
+        # Set once the game is completed or the player quits, so the game
+        # doesn't get autosaved behind their back.
+        self.finished = False
 
         if ctx.bot_has_permissions(external_emojis=True):
-            self._board._clue_markers = ctx.bot.emoji_config.sudoku_clues
+            self._board.clue_markers = ctx.bot.emoji_config.sudoku_clues
 
         self._future = ctx.bot.loop.create_future()
         self._future.set_result(None)
@@ -403,15 +700,13 @@ class SudokuSession(InteractiveSession):
 
     async def _save(self):
         ctx = self.context
-        args = self._board.to_data()
-
-        query = """INSERT INTO saved_sudoku_games (user_id, board, clues)
-                   VALUES ($1, $2, $3)
+        query = """INSERT INTO saved_sudoku_games (user_id, data)
+                   VALUES ($1, $2)
                    ON CONFLICT (user_id)
-                   DO UPDATE SET board=$2, clues=$3;
+                   DO UPDATE SET data = $2, board = NULL, clues = NULL;
                 """
 
-        await self._bot.pool.execute(query, ctx.author.id, *args)
+        await self._bot.pool.execute(query, ctx.author.id, self._board.to_bytes())
         self._board.new = False
         self._board.dirty = False  # We saved the game, no new changes to save
 
@@ -437,6 +732,7 @@ class SudokuSession(InteractiveSession):
     @trigger('\N{BLACK SQUARE FOR STOP}', block=True)
     async def stop(self):
         """Quit"""
+        self.finished = True
         await super().stop()
 
         if not self._future.done():
@@ -452,6 +748,9 @@ class SudokuSession(InteractiveSession):
             save_changes = await self._confirm("There are unsaved changes. Save game?", timeout=25)
             if save_changes and await self._confirm_save():
                 await self._save()
+            else:
+                # They didn't want the changes, don't let autosave sneak them in.
+                self._board.dirty = False
 
         d = self.default()
         d.colour = 0x607D8B
@@ -506,6 +805,7 @@ class SudokuSession(InteractiveSession):
         else:
             embed.description = f'**Sudoku Complete!**\n\n{self._board}'
             embed.colour = 0x4CAF50
+            self.finished = True
 
             # stop() is a coro and it prompts if the user wants to save
             # so we can't use that here.
@@ -555,29 +855,34 @@ class SudokuSession(InteractiveSession):
                 await self.context.bot_missing_perms(e.missing_perms)
 
 
-def _board_setter(emoji, name, method):
+def _board_setter(emoji, name, difficulty):
     @trigger(emoji)
     async def set_func(self):
-        self.board = method()
+        self.difficulty = difficulty
         await self.stop()
     set_func.__name__ = name
     return set_func
 
+_RESUME_EMOJI = '\U0001f4be'
+
 class SudokuMenu(InteractiveSession, stop_emoji=None, stop_fallback=None):
     def __init__(self, ctx):
         super().__init__(ctx)
-        self._saved_board = None
+        self._saved_game = None
         self.board = None
+        self.difficulty = None
         self._reaction_map = SudokuMenu._reaction_map.copy()
+        # This is only shown once we know there's a game to resume.
+        self._resume = self._reaction_map.pop(_RESUME_EMOJI)
 
-    easy    = _board_setter('1\u20e3', 'Easy',    Board.easy)
-    medium  = _board_setter('2\u20e3', 'Medium',  Board.medium)
-    hard    = _board_setter('3\u20e3', 'Hard',    Board.hard)
-    extreme = _board_setter('4\u20e3', 'Extreme', Board.extreme)
+    easy    = _board_setter('1\u20e3', 'Easy',    'easy')
+    medium  = _board_setter('2\u20e3', 'Medium',  'medium')
+    hard    = _board_setter('3\u20e3', 'Hard',    'hard')
+    extreme = _board_setter('4\u20e3', 'Extreme', 'extreme')
 
-    @trigger('\U0001f4be')
+    @trigger(_RESUME_EMOJI)
     async def resume_game(self):
-        self.board = self._saved_board
+        self.board = Board.from_data(self._saved_game.result())
         await self.stop()
 
     def default(self):
@@ -591,30 +896,159 @@ class SudokuMenu(InteractiveSession, stop_emoji=None, stop_fallback=None):
         return prompt
 
     async def start(self):
-        query = 'SELECT * FROM saved_sudoku_games WHERE user_id = $1;'
-        board = await self._bot.pool.fetchrow(query, self.context.author.id)
-
-        if board is None:
-            del self._reaction_map['\U0001f4be']
-        else:
-            self._saved_board = Board.from_data(board)
+        # Don't make them wait for the saved game to load, the option to
+        # resume it is added once it's there.
+        query = 'SELECT data, board, clues FROM saved_sudoku_games WHERE user_id = $1;'
+        fetch = self._bot.pool.fetchrow(query, self.context.author.id)
+        self._saved_game = self._bot.loop.create_task(fetch)
 
         await super().start()
 
+    async def add_reactions(self):
+        await super().add_reactions()
+
+        if await self._saved_game is None:
+            return
+
+        self._reaction_map[_RESUME_EMOJI] = self._resume
+        await self._message.edit(embed=self.default())
+        await self._message.add_reaction(_RESUME_EMOJI)
+
+
+# How many puzzles of each level to keep ready.
+PUZZLE_RESERVE_SIZE = 3
+# Longest to wait before trying again when making puzzles failed.
+PUZZLE_MAX_RETRY_DELAY = 300
+# How often games in progress are saved, in seconds.
+AUTOSAVE_INTERVAL = 60
+
 
 class Sudoku:
     def __init__(self, bot):
         self.bot = bot
         self.sudoku_sessions = SessionManager()
 
-    async def _get_difficulty(self, ctx):
+        # The hard puzzles can take a bit to make, so we make some ahead
+        # of time so that no one has to wait for them.
+        self._puzzles = {
+            level: collections.deque()
+            for level in [BEGINNER, INTERMEDIATE, EXPERT, MINIMUM]
+        }
+        self._puzzles_wanted = asyncio.Event()
+        self._puzzles_wanted.set()
+        self._puzzle_filler = bot.loop.create_task(self._fill_puzzles())
+        self._autosaver = bot.loop.create_task(self._autosave_loop())
+
+    def __unload(self):
+        self._puzzle_filler.cancel()
+        self._autosaver.cancel()
+
+    async def shutdown(self):
+        await self.autosave()
+
+    async def autosave(self):
+        """Save every game in progress that changed since it was last saved.
+
+        Games that were completed or are being quit are left alone.
+
+        New games only get saved if they won't overwrite another saved game.
+        Those have to be saved by hand, as the player has to confirm it.
+        """
+        boards = {
+            user_id: session._board
+            for user_id, session in self.sudoku_sessions.sessions.items()
+            if session._board.dirty and not session.finished
+        }
+        if not boards:
+            return
+
+        # Any changes made while this is saving will be saved next time.
+        data = []
+        for board in boards.values():
+            data.append(board.to_bytes())
+            board.dirty = False
+
+        query = """INSERT INTO saved_sudoku_games AS s (user_id, data)
+                   SELECT * FROM unnest($1::BIGINT[], $2::BYTEA[])
+                   ON CONFLICT (user_id)
+                   DO UPDATE SET data = EXCLUDED.data, board = NULL, clues = NULL
+                   WHERE s.user_id = ANY($3::BIGINT[])
+                   RETURNING user_id;
+                """
+        overwritable = [user_id for user_id, board in boards.items() if not board.new]
+
+        try:
+            records = await self.bot.pool.fetch(query, list(boards), data, overwritable)
+        except:
+            for board in boards.values():
+                board.dirty = True
+            raise
+
+        saved = {user_id for user_id, in records}
+        for user_id, board in boards.items():
+            if user_id in saved:
+                board.new = False
+            else:
+                board.dirty = True
+
+    async def _autosave_loop(self):
+        while True:
+            await asyncio.sleep(AUTOSAVE_INTERVAL)
+            try:
+                await self.autosave()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception('Failed to autosave Sudoku games, will try again later.')
+
+    async def _top_up_puzzles(self):
+        for level, puzzles in self._puzzles.items():
+            while len(puzzles) < PUZZLE_RESERVE_SIZE:
+                puzzles.append(await run_in_process(generate_puzzle, level, loop=self.bot.loop))
+
+    async def _fill_puzzles(self):
+        delay = 0
+        while True:
+            await self._puzzles_wanted.wait()
+            self._puzzles_wanted.clear()
+
+            try:
+                await self._top_up_puzzles()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception('Failed to make Sudoku puzzles.')
+            else:
+                delay = 0
+                continue
+
+            # Back off before trying again, doubling the wait each time.
+            delay = min(max(delay * 2, 5), PUZZLE_MAX_RETRY_DELAY)
+            await asyncio.sleep(delay)
+            self._puzzles_wanted.set()
+
+    async def _new_board(self, difficulty):
+        level = _difficulty_levels[difficulty]
+        try:
+            puzzle = self._puzzles[level].popleft()
+        except IndexError:
+            puzzle = await run_in_process(generate_puzzle, level, loop=self.bot.loop)
+
+        self._puzzles_wanted.set()
+        return Board(puzzle, level)
+
+    async def _get_board(self, ctx):
         menu = SudokuMenu(ctx)
         try:
             await asyncio.wait_for(menu.run(), timeout=20)
         except asyncio.TimeoutError:
             await ctx.send('Took too long...')
             return None
-        return menu.board
+
+        if menu.difficulty is None:
+            # Either they resumed their saved game or they didn't pick anything.
+            return menu.board
+        return await self._new_board(menu.difficulty)
 
     @commands.command()
     @commands.bot_has_permissions(embed_links=True, add_reactions=True)
@@ -623,9 +1057,9 @@ class Sudoku:
             return await ctx.send('Please finish your other Sudoku game first.')
 
         if difficulty is None:
-            board = await self._get_difficulty(ctx)
+            board = await self._get_board(ctx)
         else:
-            board = getattr(Board, difficulty)()
+            board = await self._new_board(difficulty)
 
         if board is None:
             return
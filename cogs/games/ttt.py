@@ -1,10 +1,13 @@
+import array
 import asyncio
 import contextlib
+import enum
 import itertools
 import random
 from collections import namedtuple
 
 import discord
+from discord.ext import commands
 from more_itertools import chunked
 
 from .bases import Status, TwoPlayerGameCog
@@ -29,9 +32,76 @@ WINNING_TILES = ['\U0000274e', '\U0001f17e']
 WINNING_TILE_MAP = dict(zip(TILES, WINNING_TILES))
 DIVIDER = '\N{BOX DRAWINGS LIGHT HORIZONTAL}' * SIZE
 
+# ------ Solved tables ------
+#
+# Every board is encoded as a base-3 number, with each cell being 0 if
+# it's empty, or 1 or 2 for the first and second tile respectively. There
+# are only 3 ** 9 = 19683 of these, so the whole game can be solved once
+# and every lookup after that is just indexing a table.
+
+_POWERS = [3 ** i for i in range(SIZE)]
+_NUM_CODES = 3 ** SIZE
+_UNSOLVED = -128
+
+
+def _empty_cells(code):
+    return [i for i, power in enumerate(_POWERS) if not code // power % 3]
+
+
+def _build_lines():
+    # code -> 1 + index of the winning line in WIN_COMBINATIONS, 0 if none.
+    lines = bytearray(_NUM_CODES)
+    for code in range(_NUM_CODES):
+        cells = [code // power % 3 for power in _POWERS]
+        for i, (a, b, c) in enumerate(WIN_COMBINATIONS, 1):
+            if cells[a] == cells[b] == cells[c] != 0:
+                lines[code] = i
+                break
+    return lines
+
+
+_LINES = _build_lines()
+# _SCORES[piece - 1][code] is the score for piece when it's their turn,
+# positive if they'll win, negative if they'll lose, the bigger the sooner.
+# _BEST[piece - 1][code] is a bitmask of the moves that get that score.
+_SCORES = [array.array('b', [_UNSOLVED]) * _NUM_CODES for _ in range(2)]
+_BEST = [array.array('H', [0]) * _NUM_CODES for _ in range(2)]
+
+
+def _solve(code, piece):
+    scores = _SCORES[piece - 1]
+    score = scores[code]
+    if score != _UNSOLVED:
+        return score
+
+    empty = _empty_cells(code)
+    if _LINES[code]:
+        # The other player just won.
+        score = -(len(empty) + 1)
+    elif not empty:
+        score = 0
+    else:
+        score, best = _UNSOLVED, 0
+        for i in empty:
+            child = -_solve(code + piece * _POWERS[i], 3 - piece)
+            if child > score:
+                score, best = child, 1 << i
+            elif child == score:
+                best |= 1 << i
+        _BEST[piece - 1][code] = best
+
+    scores[code] = score
+    return score
+
+
+_solve(0, 1)
+_solve(0, 2)
+
+
 class Board:
     def __init__(self):
         self._board = [None] * SIZE
+        self._code = 0
 
     def __str__(self):
         return f'\n{DIVIDER}\n'.join(
@@ -43,32 +113,66 @@ class Board:
         if self._board[x] is not None:
             raise IndexError(f'{x} is already occupied')
         self._board[x] = thing
+        self._code += (TILES.index(thing) + 1) * _POWERS[x]
 
     def is_full(self):
         return None not in self._board
 
     def _winning_line(self):
-        board = self._board
-        for a, b, c in WIN_COMBINATIONS:
-            if board[a] == board[b] == board[c] is not None:
-                return a, b, c
-        return None
+        line = _LINES[self._code]
+        return WIN_COMBINATIONS[line - 1] if line else None
 
     def winner(self):
         result = self._winning_line()
         if not result:
             return result
-        return self._board[result[0]]
+        return TILES[self._code // _POWERS[result[0]] % 3 - 1]
 
     def mark(self):
         result = self._winning_line()
         if not result:
             return
 
-        tile = WINNING_TILE_MAP[self._board[result[0]]]
+        tile = WINNING_TILE_MAP[self.winner()]
         for r in result:
             self._board[r] = tile
 
+    def best_move(self, thing, *, mistake_chance=0):
+        """Return the cell that thing should be placed in.
+
+        With a chance of mistake_chance, a random cell is picked instead.
+        """
+        if random.random() < mistake_chance:
+            return random.choice(_empty_cells(self._code))
+
+        best = _BEST[TILES.index(thing)][self._code]
+        return random.choice([i for i in range(SIZE) if best >> i & 1])
+
+
+class Difficulty(enum.Enum):
+    # The values are how likely Chiaki will make a random move.
+    easy = 0.4
+    medium = 0.15
+    perfect = hard = 0
+
+    def __str__(self):
+        return self.name.title()
+
+    @classmethod
+    async def convert(cls, ctx, arg):
+        lowered = arg.lower()
+        try:
+            return cls[lowered]
+        except KeyError:
+            difficulties = '\n'.join(str(m).lower() for m in cls)
+            raise commands.BadArgument(
+                f'"{arg}" is not a difficulty. Valid difficulties:\n{difficulties}'
+            ) from None
+
+    @classmethod
+    def random_example(cls, ctx):
+        return random.choice(list(cls._member_map_))
+
 
 Player = namedtuple('Player', 'user symbol')
 Stats = namedtuple('Stats', 'winner turns')
@@ -78,9 +182,10 @@ FOREFIT_ICON = emoji_url('\N{WAVING WHITE FLAG}')
 TIMEOUT_ICON = emoji_url('\N{ALARM CLOCK}')
 
 class TicTacToeSession:
-    def __init__(self, ctx, opponent):
+    def __init__(self, ctx, opponent, *, difficulty=Difficulty.perfect):
         self.ctx = ctx
         self.opponent = opponent
+        self.difficulty = difficulty
 
         xo = random.sample(TILES, 2)
         self._players = list(map(Player, (self.ctx.author, self.opponent), xo))
@@ -116,6 +221,10 @@ class TicTacToeSession:
             return
         return True
 
+    def _make_ai_move(self):
+        tile = self.current.symbol
+        self._board.place(self._board.best_move(tile, mistake_chance=self.difficulty.value), tile)
+
     async def get_input(self):
         message = await self.ctx.bot.wait_for('message', timeout=120, check=self._check_message)
         with contextlib.suppress(discord.HTTPException):
@@ -162,20 +271,24 @@ class TicTacToeSession:
             user, tile = self.current
             self._update_display()
 
-            async with temp_message(self.ctx, content=f'{user.mention} It is your turn.',
-                                    embed=self._game_screen):
-                try:
-                    await self.get_input()
-                except asyncio.TimeoutError:
-                    self._status = Status.TIMEOUT
-
-                if self._status is not Status.PLAYING:
-                    return Stats(self._players[not self._turn], counter)
-
-                winner = self.winner
-                if winner or self._board.is_full():
-                    self._status = Status.END
-                    return Stats(winner, counter)
+            if user == self.ctx.me:
+                # No need to show the board, this is instant anyway.
+                self._make_ai_move()
+            else:
+                async with temp_message(self.ctx, content=f'{user.mention} It is your turn.',
+                                        embed=self._game_screen):
+                    try:
+                        await self.get_input()
+                    except asyncio.TimeoutError:
+                        self._status = Status.TIMEOUT
+
+            if self._status is not Status.PLAYING:
+                return Stats(self._players[not self._turn], counter)
+
+            winner = self.winner
+            if winner or self._board.is_full():
+                self._status = Status.END
+                return Stats(winner, counter)
 
             self._turn = not self._turn
 
@@ -196,7 +309,13 @@ class TicTacToeSession:
 
 
 class TicTacToe(TwoPlayerGameCog, name='Tic-Tac-Toe', game_cls=TicTacToeSession, aliases=['ttt']):
-    pass
+    async def _game_ai(self, ctx, difficulty: Difficulty = Difficulty.medium):
+        """Starts a game of {name} against me.
+
+        The difficulty can be easy, medium or perfect.
+        Good luck beating me on perfect.
+        """
+        await self._play_against_bot(ctx, difficulty=difficulty)
 
 def setup(bot):
     bot.add_cog(TicTacToe(bot))
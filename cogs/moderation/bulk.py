@@ -0,0 +1,165 @@
+"""Helpers for doing a lot of moderation API calls at once.
+
+Things like mass bans or setting up the overwrites for the muted role
+end up making a request for every target. Doing them one at a time is
+slow, and doing them all at once gets us rate-limited, so this runs them
+with a bounded amount of concurrency instead.
+"""
+
+import asyncio
+import collections
+import contextlib
+import datetime
+import time
+
+import discord
+
+from operator import methodcaller
+
+
+class BulkResult(collections.namedtuple('BulkResult', 'target result error')):
+    """The result of running an action on a single target."""
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class BulkExecutor:
+    """Runs a coroutine function on a bunch of targets concurrently.
+
+    At most concurrency calls will be running at the same time, and at
+    most per_bucket calls will be running for the same bucket. The bucket
+    of a target is given by the key function, and should correspond to the
+    route the request hits (e.g. the channel ID when editing overwrites),
+    since Discord rate-limits per route.
+
+    Errors are not retried. discord.py already waits out and retries
+    429s itself, so anything that gets here is an actual failure.
+
+    If progress is a discord.Message, it will be edited every now and then
+    to show how many targets are done.
+    """
+
+    def __init__(self, *, concurrency=5, per_bucket=1, key=None,
+                 progress=None, progress_interval=2, label='Working'):
+        self.concurrency = concurrency
+        self.per_bucket = per_bucket
+        self.key = key or (lambda target: None)
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.label = label
+
+        self._done = 0
+        self._total = 0
+        self._last_update = 0
+
+    async def _update_progress(self, *, force=False):
+        if self.progress is None:
+            return
+
+        now = time.monotonic()
+        if not force and now - self._last_update < self.progress_interval:
+            return
+
+        self._last_update = now
+        with contextlib.suppress(discord.HTTPException):
+            await self.progress.edit(content=f'{self.label}... ({self._done}/{self._total})')
+
+    async def run(self, func, targets):
+        """Call func on every target, returning a list of BulkResults
+        in the same order as the targets.
+        """
+        targets = list(targets)
+        self._done, self._total = 0, len(targets)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        buckets = collections.defaultdict(lambda: asyncio.Semaphore(self.per_bucket))
+
+        async def run_one(target):
+            async with buckets[self.key(target)], semaphore:
+                try:
+                    result = await func(target)
+                except Exception as e:
+                    result = BulkResult(target, None, e)
+                else:
+                    result = BulkResult(target, result, None)
+
+            self._done += 1
+            await self._update_progress()
+            return result
+
+        results = await asyncio.gather(*map(run_one, targets))
+        await self._update_progress(force=True)
+        return results
+
+
+async def bulk_run(func, targets, **kwargs):
+    """Shorthand for BulkExecutor(**kwargs).run(func, targets)"""
+    return await BulkExecutor(**kwargs).run(func, targets)
+
+
+async def purge(channel, *, limit=100, check=None, before=None, after=None, bulk=True):
+    """Deletes messages from a channel, returning a Counter of how many
+    messages were deleted per author.
+
+    Unlike TextChannel.purge, this deletes the messages as the history
+    is being fetched, rather than collecting everything first. While a
+    chunk of (up to) 100 messages is being bulk-deleted, the next page is
+    already being fetched and filtered.
+
+    Messages older than 14 days can't be bulk-deleted, so those (or all
+    of them if bulk is False) are deleted one by one through the
+    BulkExecutor once the history is exhausted.
+    """
+    check = check or (lambda m: True)
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=14)
+    minimum_id = discord.utils.time_snowflake(cutoff, high=False)
+
+    authors = collections.Counter()
+    chunk, singles = [], []
+    pending = None
+
+    async def delete_chunk(messages):
+        if len(messages) == 1:
+            await messages[0].delete()
+        else:
+            await channel.delete_messages(messages)
+        authors.update(m.author for m in messages)
+
+    async def flush(messages):
+        nonlocal pending
+        # Only have one bulk-delete in flight at a time, they're all on the
+        # same route anyway.
+        if pending is not None:
+            await pending
+        pending = asyncio.ensure_future(delete_chunk(messages))
+
+    try:
+        async for message in channel.history(limit=limit, before=before, after=after):
+            if not check(message):
+                continue
+
+            if not bulk or message.id < minimum_id:
+                singles.append(message)
+                continue
+
+            chunk.append(message)
+            if len(chunk) == 100:
+                await flush(chunk)
+                chunk = []
+
+        if chunk:
+            await flush(chunk)
+        if pending is not None:
+            await pending
+    finally:
+        if not (pending is None or pending.done()):
+            pending.cancel()
+
+    if singles:
+        results = await bulk_run(methodcaller('delete'), singles)
+        authors.update(r.target.author for r in results if r.ok)
+
+    return authors
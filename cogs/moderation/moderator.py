@@ -11,7 +11,7 @@ from collections import Counter, namedtuple
 from discord.ext import commands
 from operator import attrgetter
 
-from ..utils import formats, time, varpos
+from ..utils import cache, formats, time, varpos
 from ..utils.context_managers import temp_attr
 from ..utils.converter import union
 from ..utils.examples import get_example, static_example, wrap_example
@@ -19,6 +19,8 @@ from ..utils.jsonf import JSONFile
 from ..utils.misc import ordinal
 from ..utils.paginator import Paginator, FieldPaginator
 
+from .bulk import bulk_run, purge
+
 from core import errors
 
 __schema__ = """
@@ -26,9 +28,15 @@ __schema__ = """
         id SERIAL PRIMARY KEY,
         guild_id BIGINT NOT NULL,
         user_id BIGINT NOT NULL,
+        -- Warns from before this was added don't have a mod, so this
+        -- has to stay nullable.
+        mod_id BIGINT,
         reason TEXT NOT NULL,
         warned_at TIMESTAMP NOT NULL
     );
+    ALTER TABLE warn_entries ADD COLUMN IF NOT EXISTS mod_id BIGINT;
+    CREATE INDEX IF NOT EXISTS warn_entries_guild_id_user_id_warned_at_idx
+    ON warn_entries (guild_id, user_id, warned_at);
 
     CREATE TABLE IF NOT EXISTS warn_timeouts (
         guild_id BIGINT PRIMARY KEY,
@@ -56,10 +64,78 @@ class AlreadyWarned(errors.ChiakiException):
     pass
 
 
-# Dummy punishment class for default warn punishment
-_DummyPunishment = namedtuple('_DummyPunishment', 'warns type duration')
-_default_punishment = _DummyPunishment(warns=3, type='mute', duration=60 * 10)
-del _DummyPunishment
+_Punishment = namedtuple('_Punishment', 'warns type duration')
+_default_punishment = _Punishment(warns=3, type='mute', duration=60 * 10)
+_default_warn_timeout = datetime.timedelta(minutes=15)
+
+_WarnPolicy = namedtuple('_WarnPolicy', 'timeout punishments')
+
+# explicit is True if it was set through the muted_roles table, rather
+# than being guessed from the role names.
+_MutedRole = namedtuple('_MutedRole', 'id explicit')
+
+_muted_permissions = dict.fromkeys(['send_messages', 'manage_messages', 'add_reactions',
+                                    'speak', 'connect', 'use_voice_activation'], False)
+
+
+def _overwrite_fingerprint(overwrite):
+    # Only the permissions we care about, the rest can be anything.
+    return tuple(getattr(overwrite, name) for name in _muted_permissions)
+
+
+_MUTED_FINGERPRINT = _overwrite_fingerprint(discord.PermissionOverwrite(**_muted_permissions))
+
+
+@cache.cache(maxsize=4096, make_key=lambda a, kw: a[-1])
+async def _get_warn_policy(connection, guild_id):
+    # Get both the timeout and the punishments in one go, these are
+    # needed for every warn.
+    query = """SELECT timeout, warns, type, duration
+               FROM (SELECT $1::BIGINT AS guild_id) AS g
+               LEFT JOIN warn_timeouts USING (guild_id)
+               LEFT JOIN warn_punishments USING (guild_id);
+            """
+    records = await connection.fetch(query, guild_id)
+
+    timeout = records[0]['timeout'] or _default_warn_timeout
+    punishments = {
+        warns: _Punishment(warns, type, duration)
+        for _, warns, type, duration in records
+        if warns is not None
+    }
+    return _WarnPolicy(timeout, punishments)
+
+
+async def _add_warn(connection, guild_id, user_id, mod_id, reason, timeout, now):
+    # Add the warn, unless they were warned in the last minute. Apart from
+    # the lock, this is all done in one query so we don't have to go back
+    # and forth.
+    #
+    # Returns the number of warns they had before this one, when they were
+    # last warned, and whether or not this one was added.
+    lock_query = 'SELECT pg_advisory_xact_lock($1::BIGINT # $2::BIGINT);'
+    query = """WITH active AS (
+                   SELECT warned_at FROM warn_entries
+                   WHERE guild_id = $1 AND user_id = $2 AND warned_at > $6 - $5::INTERVAL
+               ), inserted AS (
+                   INSERT INTO warn_entries (guild_id, user_id, mod_id, reason, warned_at)
+                   SELECT $1, $2, $3, $4, $6
+                   WHERE NOT EXISTS (
+                       SELECT 1 FROM active WHERE warned_at > $6 - INTERVAL '60 seconds'
+                   )
+                   RETURNING id
+               )
+               SELECT (SELECT COUNT(*) FROM active) AS warns,
+                      (SELECT MAX(warned_at) FROM active) AS last_warn,
+                      EXISTS (SELECT 1 FROM inserted) AS inserted;
+            """
+    async with connection.transaction():
+        # Two warns for the same member at the same time would both see no
+        # recent warns, and both get in. This makes the second one wait for
+        # the first to commit, so it sees it. Different members might end
+        # up with the same lock, but that only means one waits a bit.
+        await connection.execute(lock_query, guild_id, user_id)
+        return await connection.fetchrow(query, guild_id, user_id, mod_id, reason, timeout, now)
 
 
 def _get_lower_member(ctx):
@@ -223,6 +299,9 @@ class Moderator:
         self.slowmodes = JSONFile('slowmodes.json')
         self.slowmode_bucket = {}
 
+        # guild_id -> _MutedRole
+        self._muted_roles = {}
+
         if hasattr(self.bot, '__mod_mute_role_create_bucket__'):
             self._mute_role_create_cooldowns = self.bot.__mod_mute_role_create_bucket__
         else:
@@ -407,14 +486,14 @@ class Moderator:
 
         if isinstance(num_or_user, int):
             if num_or_user < 1:
-                return await ctx.send(f"How can I delete {number} messages...?")
-            deleted = await ctx.channel.purge(limit=min(num_or_user, 1000) + 1)
+                return await ctx.send(f"How can I delete {num_or_user} messages...?")
+            deleted = await purge(ctx.channel, limit=min(num_or_user, 1000) + 1)
         elif isinstance(num_or_user, discord.Member):
-            deleted = await ctx.channel.purge(check=lambda m: m.author.id == num_or_user.id)
+            deleted = await purge(ctx.channel, check=lambda m: m.author.id == num_or_user.id)
         else:
-            deleted = await ctx.channel.purge(check=lambda m: m.author.id == ctx.bot.user.id)
+            deleted = await purge(ctx.channel, check=lambda m: m.author.id == ctx.bot.user.id)
 
-        messages = formats.pluralize(message=len(deleted) - 1)
+        messages = formats.pluralize(message=sum(deleted.values()) - 1)
         await ctx.send(f"Deleted {messages} successfully!", delete_after=1.5)
 
     @commands.command(aliases=['clean'])
@@ -436,7 +515,7 @@ class Moderator:
         bot_id = ctx.bot.user.id
 
         bot_perms = ctx.channel.permissions_for(ctx.me)
-        purge = functools.partial(ctx.channel.purge, limit=limit, before=ctx.message)
+        do_purge = functools.partial(purge, ctx.channel, limit=limit, before=ctx.message)
         can_bulk_delete = bot_perms.manage_messages and bot_perms.read_message_history
 
         if can_bulk_delete:
@@ -444,14 +523,16 @@ class Moderator:
                 if m.author.id == bot_id:
                     return True
                 return m.content.startswith(prefixes) and not m.content[1:2].isspace()
-            deleted = await purge(check=is_possible_command_invoke)
+            deleted = await do_purge(check=is_possible_command_invoke)
         else:
             # We can only delete the bot's messages, because trying to delete
             # other users' messages without Manage Messages will raise an error.
             # Also we can't use bulk-deleting for the same reason.
-            deleted = await purge(check=lambda m: m.author.id == bot_id, bulk=False)
+            deleted = await do_purge(check=lambda m: m.author.id == bot_id, bulk=False)
 
-        spammers = Counter(str(m.author) for m in deleted)
+        spammers = Counter()
+        for author, count in deleted.items():
+            spammers[str(author)] += count
 
         total_deleted = sum(spammers.values())
         second_part = 's was' if total_deleted == 1 else ' were'
@@ -490,64 +571,43 @@ class Moderator:
             f"```py\n{type(cause).__name__}: {cause}```"
         )
 
-    async def _get_warn_timeout(self, connection, guild_id):
-        query = 'SELECT timeout FROM warn_timeouts WHERE guild_id = $1;'
-        row = await connection.fetchrow(query, guild_id)
-        return row['timeout'] if row else datetime.timedelta(minutes=15)
-
     @commands.command()
     @commands.has_permissions(manage_messages=True)
     async def warn(self, ctx, member: discord.Member, *, reason: str):
         """Warns a user (obviously)"""
         author, current_time, guild_id = ctx.author, ctx.message.created_at, ctx.guild.id
-        timeout = await self._get_warn_timeout(ctx.db, guild_id)
+        timeout, punishments = await _get_warn_policy(ctx.db, guild_id)
 
-        query = """SELECT warned_at FROM warn_entries
-                   WHERE guild_id = $1 AND user_id = $2 AND warned_at + $3 > $4
-                   ORDER BY id
-                """
-        records = await ctx.db.fetch(query, guild_id, member.id, timeout, current_time)
-        warn_queue = [r[0] for r in records]
+        args = (guild_id, member.id, author.id, reason, timeout, current_time)
+        warns, last_warn, inserted = await _add_warn(ctx.db, *args)
 
-        try:
-            last_warn = warn_queue[-1]
-        except IndexError:
-            pass
-        else:
+        if not inserted:
             retry_after = (current_time - last_warn).total_seconds()
-            if retry_after <= 60:
-                # Must throw an error because return await triggers on_command_completion
-                # Which would end up logging a case even though it doesn't work.
-                raise AlreadyWarned(f"{member} has been warned already, try again in "
-                                    f"{60 - retry_after :.2f} seconds...")
-
-        # Add the warn
-        query = """INSERT INTO warn_entries (guild_id, user_id, mod_id, reason, warned_at)
-                   VALUES ($1, $2, $3, $4, $5)
-                """
-        await ctx.db.execute(query, guild_id, member.id, author.id, reason, current_time)
+            # Must throw an error because return await triggers on_command_completion
+            # Which would end up logging a case even though it doesn't work.
+            raise AlreadyWarned(f"{member} has been warned already, try again in "
+                                f"{60 - retry_after :.2f} seconds...")
 
         # See if there's a punishment
-        current_warn_number = len(warn_queue) + 1
-        query = 'SELECT type, duration FROM warn_punishments WHERE guild_id = $1 AND warns = $2'
-        row = await ctx.db.fetchrow(query, guild_id, current_warn_number)
+        current_warn_number = warns + 1
+        punishment = punishments.get(current_warn_number)
 
-        if row is None:
+        if punishment is None:
             if current_warn_number == 3:
-                row = _default_punishment
+                punishment = _default_punishment
             else:
                 return await ctx.send(f"\N{WARNING SIGN} Warned {member.mention} successfully!")
 
         # Auto-punish the user
         args = member,
-        duration = row['duration']
-        if duration > 0:
+        duration = punishment.duration
+        if duration:
             args += duration,
             punished_for = f' for {time.duration_units(duration)}'
         else:
             punished_for = f''
 
-        punishment = row['type']
+        punishment = punishment.type
         punishment_command = getattr(self, punishment)
         punishment_reason = f'{reason}\n({ordinal(current_warn_number)} warning)'
 
@@ -603,6 +663,7 @@ class Moderator:
                    DO UPDATE SET type = $3, duration = $4;
                 """
         await ctx.db.execute(query, ctx.guild.id, num, punishment, true_duration)
+        _get_warn_policy.invalidate(None, ctx.guild.id)
 
         extra = f'for {duration}' if duration else ''
         await ctx.send(f'\N{OK HAND SIGN} if a user has been warned {num} times, '
@@ -636,32 +697,45 @@ class Moderator:
                    DO UPDATE SET timeout = $2
                 """
         await ctx.db.execute(query, ctx.guild.id, datetime.timedelta(seconds=duration.duration))
+        _get_warn_policy.invalidate(None, ctx.guild.id)
 
         await ctx.send(
             f'Alright, if a user was warned within **{duration}** '
             'after their oldest warn, bad things will happen.'
         )
 
-    async def _get_muted_role_from_db(self, guild, *, connection=None):
+    async def _resolve_muted_role(self, guild, connection=None):
+        try:
+            return self._muted_roles[guild.id]
+        except KeyError:
+            pass
+
         connection = connection or self.bot.pool
 
         query = 'SELECT role_id FROM muted_roles WHERE guild_id = $1'
-        row = await connection.fetchrow(query, guild.id)
-        if row is None:
-            return None
-
-        return discord.utils.get(guild.roles, id=row['role_id'])
+        role_id = await connection.fetchval(query, guild.id)
+        role = discord.utils.get(guild.roles, id=role_id) if role_id else None
 
-    async def _get_muted_role(self, guild, connection=None):
-        role = await self._get_muted_role_from_db(guild, connection=connection)
         if role is not None:
-            return role
+            resolved = _MutedRole(role.id, explicit=True)
+        else:
+            def probably_mute_role(r):
+                lowered = r.name.lower()
+                return lowered == 'muted' or 'mute' in lowered
 
-        def probably_mute_role(r):
-            lowered = r.name.lower()
-            return lowered == 'muted' or 'mute' in lowered
+            role = discord.utils.find(probably_mute_role, guild.role_hierarchy)
+            resolved = _MutedRole(role and role.id, explicit=False)
 
-        return discord.utils.find(probably_mute_role, guild.role_hierarchy)
+        self._muted_roles[guild.id] = resolved
+        return resolved
+
+    async def _get_muted_role_from_db(self, guild, *, connection=None):
+        role_id, explicit = await self._resolve_muted_role(guild, connection)
+        return discord.utils.get(guild.roles, id=role_id) if explicit else None
+
+    async def _get_muted_role(self, guild, connection=None):
+        role_id, _ = await self._resolve_muted_role(guild, connection)
+        return role_id and discord.utils.get(guild.roles, id=role_id)
 
     async def _update_muted_role(self, guild, new_role, connection=None):
         connection = connection or self.bot.pool
@@ -670,29 +744,41 @@ class Moderator:
                    DO UPDATE SET role_id = $2
                 """
         await connection.execute(query, guild.id, new_role.id)
+        self._muted_roles[guild.id] = _MutedRole(new_role.id, explicit=True)
 
     @staticmethod
-    async def _regen_muted_role_perms(role, *channels):
-        muted_permissions = dict.fromkeys(['send_messages', 'manage_messages', 'add_reactions',
-                                           'speak', 'connect', 'use_voice_activation'], False)
-
+    async def _regen_muted_role_perms(role, *channels, progress=None):
         permissions_in = channels[0].guild.me.permissions_in
-        for channel in channels:
+
+        def needs_update(channel):
+            # Save discord the HTTP request
             if not permissions_in(channel).manage_roles:
-                # Save discord the HTTP request
-                continue
+                return False
 
-            await asyncio.sleep(random.uniform(0, 0.5))
+            # Only touch the channels that don't already have the muted
+            # overwrites, so we don't redo every channel each time.
+            return _overwrite_fingerprint(channel.overwrites_for(role)) != _MUTED_FINGERPRINT
 
-            try:
-                await channel.set_permissions(role, **muted_permissions)
-            except discord.NotFound as e:
-                # The role could've been deleted midway while Chiaki was
-                # setting up the overwrites.
-                if 'Unknown Overwrite' in str(e):
-                    raise
-            except discord.HTTPException:
-                pass
+        def set_permissions(channel):
+            # Keep whatever else was set in the overwrite.
+            overwrite = channel.overwrites_for(role)
+            overwrite.update(**_muted_permissions)
+            return channel.set_permissions(role, overwrite=overwrite)
+
+        channels = list(filter(needs_update, channels))
+        if not channels:
+            return
+
+        # Overwrites are rate-limited per channel, so each channel is its own bucket.
+        results = await bulk_run(set_permissions, channels, key=attrgetter('id'),
+                                 progress=progress, label='Setting up the channel overwrites')
+
+        for result in results:
+            error = result.error
+            # The role could've been deleted midway while Chiaki was
+            # setting up the overwrites.
+            if isinstance(error, discord.NotFound) and 'Unknown Overwrite' in str(error):
+                raise error
 
     async def _do_mute(self, member, when, role, *, connection=None, reason=None):
         if role in member.roles:
@@ -731,7 +817,8 @@ class Moderator:
             with contextlib.suppress(discord.HTTPException):
                 await role.edit(position=ctx.me.top_role.position - 1)
 
-            await self._regen_muted_role_perms(role, *ctx.guild.channels)
+            await self._regen_muted_role_perms(role, *ctx.guild.channels,
+                                               progress=ctx.__new_mute_role_message__)
             await ctx.acquire()
             await self._update_muted_role(ctx.guild, role, ctx.db)
             return role
@@ -907,10 +994,30 @@ class Moderator:
     @commands.has_permissions(ban_members=True)
     async def massban(self, ctx, reason: Reason, *members: CheckedMemberID):
         """Bans multiple users from the server (obviously)"""
-        for m in members:
-            await ctx.guild.ban(m, reason=reason)
+        progress = await ctx.send(f'Banning {formats.pluralize(member=len(members))}...')
 
-        await ctx.send(f"Done. What happened...?")
+        def ban(member):
+            return ctx.guild.ban(member, reason=reason)
+
+        # Bans all share the guild's rate limit, which discord.py already
+        # keeps track of, so there's no need to do them one at a time here.
+        results = await bulk_run(ban, members, per_bucket=5, progress=progress, label='Banning')
+
+        failed = [r.target for r in results if not r.ok]
+        if not failed:
+            return await progress.edit(content='Done. What happened...?')
+
+        if len(failed) == len(results):
+            # Nothing to log, so don't make a case for it.
+            ctx.args[3:] = []
+            return await progress.edit(content="I couldn't ban any of them...")
+
+        # Don't log the ones that failed.
+        ctx.args[3:] = [r.target for r in results if r.ok]
+        await progress.edit(
+            content=f"Done, but I couldn't ban {formats.pluralize(member=len(failed))}: "
+                    f"{', '.join(map(str, failed))}"
+        )
 
     # --------- Events ---------
 
@@ -930,6 +1037,22 @@ class Moderator:
 
         await self._regen_muted_role_perms(role, channel)
 
+    async def on_guild_role_delete(self, role):
+        self._muted_roles.pop(role.guild.id, None)
+
+    async def on_guild_role_create(self, role):
+        # The guessed role might change if a role was created or renamed.
+        cached = self._muted_roles.get(role.guild.id)
+        if cached and not cached.explicit:
+            del self._muted_roles[role.guild.id]
+
+    async def on_guild_role_update(self, before, after):
+        if before.name != after.name:
+            await self.on_guild_role_create(after)
+
+    async def on_guild_remove(self, guild):
+        self._muted_roles.pop(guild.id, None)
+
     async def on_member_join(self, member):
         # Prevent mute-evasion
         expires = await self._remove_time_entry(member.guild, member)
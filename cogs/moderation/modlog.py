@@ -15,7 +15,7 @@ from functools import partial, reduce
 
 from ..utils import cache, varpos
 from ..utils.misc import emoji_url, truncate, unique
-from ..utils.paginator import FieldPaginator
+from ..utils.paginator import KeysetFieldPaginator
 from ..utils.time import duration_units, parse_delta
 
 from core import errors
@@ -36,7 +36,8 @@ __schema__ = """
         action VARCHAR(16) NOT NULL,
         mod_id BIGINT NOT NULL,
         reason TEXT NOT NULL,
-        extra TEXT NOT NULL
+        extra TEXT NOT NULL,
+        case_number INTEGER
     );
     CREATE INDEX IF NOT EXISTS modlog_guild_id_idx ON modlog (guild_id);
 
@@ -45,6 +46,8 @@ __schema__ = """
         entry_id INTEGER REFERENCES modlog ON DELETE CASCADE,
         user_id BIGINT NOT NULL
     );
+    -- Covers the lookups in case user so they can be done on the index alone.
+    CREATE INDEX IF NOT EXISTS modlog_targets_user_id_entry_id_idx ON modlog_targets (user_id, entry_id);
 
     CREATE TABLE IF NOT EXISTS modlog_config (
         guild_id BIGINT PRIMARY KEY,
@@ -56,8 +59,33 @@ __schema__ = """
         dm_user BOOLEAN NOT NULL DEFAULT TRUE,
         poll_audit_log BOOLEAN NOT NULL DEFAULT TRUE,
 
-        events INTEGER NOT NULL DEFAULT {default_flags}
+        events INTEGER NOT NULL DEFAULT {default_flags},
+
+        -- The number of the most recent case. Incremented atomically when a
+        -- new case is made.
+        case_count INTEGER NOT NULL DEFAULT 0
     );
+
+    -- Migration for case numbers. Cases were originally numbered by their
+    -- position in the guild's cases, which required an OFFSET scan for
+    -- every lookup. Now each case stores its own number.
+    ALTER TABLE modlog ADD COLUMN IF NOT EXISTS case_number INTEGER;
+    ALTER TABLE modlog_config ADD COLUMN IF NOT EXISTS case_count INTEGER NOT NULL DEFAULT 0;
+
+    -- Both of these only touch the rows that haven't been migrated, so
+    -- they do nothing once the migration has been done.
+    UPDATE modlog SET case_number = numbered.row_number
+    FROM (SELECT id, row_number() OVER (PARTITION BY guild_id ORDER BY id)
+          FROM modlog WHERE case_number IS NULL) AS numbered
+    WHERE modlog.id = numbered.id AND modlog.case_number IS NULL;
+
+    UPDATE modlog_config SET case_count = latest.max
+    FROM (SELECT guild_id, MAX(case_number) FROM modlog
+          WHERE guild_id IN (SELECT guild_id FROM modlog_config WHERE case_count = 0)
+          GROUP BY guild_id) AS latest
+    WHERE modlog_config.guild_id = latest.guild_id AND modlog_config.case_count < latest.max;
+
+    CREATE UNIQUE INDEX IF NOT EXISTS modlog_guild_id_case_number_idx ON modlog (guild_id, case_number);
 """
 
 ModAction = collections.namedtuple('ModAction', 'repr emoji colour')
@@ -123,11 +151,166 @@ async def _get_message(channel, message_id):
     return msg
 
 
-@cache.cache(maxsize=None, make_key=lambda a, kw: a[-1])
-async def _get_number_of_cases(connection, guild_id):
-    query = 'SELECT COUNT(*) FROM modlog WHERE guild_id=$1;'
+_CONFIG_CHANNEL = 'modlog_config'
+# How often to check that the connection listening for config changes is
+# still alive, in seconds.
+_CONFIG_LISTENER_CHECK_INTERVAL = 30
+
+
+@cache.cache(maxsize=4096, make_key=lambda a, kw: a[-1])
+async def _fetch_case_config(connection, guild_id):
+    query = """SELECT channel_id, enabled, log_auto, dm_user, poll_audit_log, events
+               FROM modlog_config
+               WHERE guild_id = $1
+            """
     row = await connection.fetchrow(query, guild_id)
-    return row['count']
+    # Guilds without a config are cached too, as those are the majority.
+    return ModLogConfig(**row) if row else None
+
+
+async def _get_number_of_cases(connection, guild_id):
+    query = 'SELECT case_count FROM modlog_config WHERE guild_id = $1;'
+    return await connection.fetchval(query, guild_id) or 0
+
+
+async def _get_latest_case_number(connection, guild_id):
+    # Not case_count, in case there are any holes from before cases were
+    # only numbered once they were sent.
+    query = 'SELECT MAX(case_number) FROM modlog WHERE guild_id = $1;'
+    return await connection.fetchval(query, guild_id) or 0
+
+
+async def _reserve_case_numbers(connection, guild_id, amount=1):
+    # This is one statement on its own, so the row is only locked for as
+    # long as it takes to bump the count, never while a case is being sent.
+    #
+    # Returns the last number reserved.
+    query = """UPDATE modlog_config SET case_count = case_count + $2
+               WHERE guild_id = $1
+               RETURNING case_count;
+            """
+    return await connection.fetchval(query, guild_id, amount)
+
+
+async def _release_case_numbers(connection, guild_id, last, amount=1):
+    # Give back the last few numbers of a reservation that ended up unused.
+    # This only works if no one reserved any numbers after them, otherwise
+    # we're stuck with the hole.
+    query = """UPDATE modlog_config SET case_count = case_count - $3
+               WHERE guild_id = $1 AND case_count = $2;
+            """
+    await connection.execute(query, guild_id, last, amount)
+
+
+# Events that come in within this many seconds of each other will be
+# looked up in the same audit log fetch.
+_AUDIT_LOG_POLL_WINDOW = 1
+_AUDIT_LOG_POLL_ATTEMPTS = 3
+
+
+class _PendingEvent:
+    __slots__ = ('user', 'after', 'attempts')
+
+    def __init__(self, user):
+        self.user = user
+        # We'll try to be generous with delays because discord is a good service:tm:
+        # Seriously some guilds might have large latency with audit logs, meaning the
+        # could've added the entry way before the event is called.
+        self.after = datetime.utcnow() - timedelta(seconds=2)
+        self.attempts = 0
+
+
+class _AuditLogPoller:
+    """Polls the audit log for a single guild.
+
+    Rather than fetching the audit log for every ban, unban or kick,
+    events are queued up and looked up together, so a mass ban only
+    takes a few audit log requests rather than one for each member.
+    """
+
+    def __init__(self, cog, guild):
+        self.cog = cog
+        self.guild = guild
+        self._pending = {}
+        self._task = None
+
+    def add(self, action, user):
+        self._pending.setdefault((action, user.id), _PendingEvent(user))
+        if self._task is None or self._task.done():
+            self._task = self.cog.bot.loop.create_task(self._run())
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _fetch_entries(self):
+        guild = self.guild
+        actions = {action for action, _ in self._pending}
+        after = min(p.after for p in self._pending.values())
+
+        # With after, the entries come oldest first, which is the order the
+        # cases should be numbered in.
+        found = []
+        async for entry in guild.audit_logs(limit=None, after=after, reverse=True):
+            action = entry.action.name
+            if action not in actions or entry.target is None:
+                continue
+
+            if self._pending.pop((action, entry.target.id), None) is not None:
+                found.append((action, entry))
+
+        return found
+
+    async def _run(self):
+        guild = self.guild
+        # This delay is here for two reasons:
+        # 1. We want to collect as many events as we can into one fetch,
+        #    so we don't rate-limit the bot too hard during a mass ban.
+        # 2. We'll wait for long periods of time so that we can sufficiently
+        #    wait for the audit log entry to be added, we don't know what
+        #    the delay is, but we'll take a best guess
+        #
+        # It shouldn't take too long... Right, Discord?
+        while self._pending:
+            retries = max(p.attempts for p in self._pending.values())
+            await asyncio.sleep(_AUDIT_LOG_POLL_WINDOW * (retries + 1))  # cruddy backoff
+
+            try:
+                entries = await self._fetch_entries()
+            except discord.Forbidden:
+                # should not happen but this is here just in case it happens
+                self._pending.clear()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Don't let one bad fetch stop the polling. The events still
+                # count this as an attempt, so we don't keep trying forever.
+                log.exception('Failed to fetch the audit log for guild %s (ID: %d)', guild, guild.id)
+                entries = []
+
+            for key, pending in list(self._pending.items()):
+                pending.attempts += 1
+                if pending.attempts < _AUDIT_LOG_POLL_ATTEMPTS:
+                    continue
+
+                action, _ = key
+                user = pending.user
+                log.info('%s (ID: %d) in guild %s (ID: %d) never had an entry for event %r',
+                         user, user.id, guild, guild.id, action)
+                # We should just give up here. Because we need a non-None entry,
+                # and in the case of member_remove, the member could've just up
+                # and left the server, which means it won't make sense for it to
+                # be logged.
+                del self._pending[key]
+
+            if entries:
+                try:
+                    await self.cog._log_audit_entries(guild, entries)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    log.exception('Failed to log audit log entries for guild %s (ID: %d)', guild, guild.id)
 
 
 class CaseNumber(commands.Converter):
@@ -138,7 +321,7 @@ class CaseNumber(commands.Converter):
             raise commands.BadArgument("This has to be an actual number... -.-")
 
         if num < 0:
-            num_cases = await _get_number_of_cases(ctx.db, ctx.guild.id)
+            num_cases = await _get_latest_case_number(ctx.db, ctx.guild.id)
             if not num_cases:
                 raise commands.BadArgument('There are no cases... yet.')
 
@@ -161,9 +344,30 @@ class ModLog:
         self._cache_cleaner = asyncio.ensure_future(self._clean_cache())
         self._cache_locks = collections.defaultdict(asyncio.Event)
         self._cache = set()
+        self._pollers = {}
+
+        # Stats for the config cache, reset every hour.
+        self._config_lookups = 0
+        self._config_queries = 0
+        self.config_queries_saved_last_hour = 0
+        self._config_stats_task = asyncio.ensure_future(self._report_config_stats())
+
+        self._config_listener = None
+        self._config_listener_task = asyncio.ensure_future(self._listen_for_config_changes())
 
     def __unload(self):
         self._cache_cleaner.cancel()
+        self._config_stats_task.cancel()
+        self._config_listener_task.cancel()
+        for poller in self._pollers.values():
+            poller.cancel()
+
+        self.bot.loop.create_task(self._release_config_listener())
+        _fetch_case_config.cache.clear()
+
+    async def shutdown(self):
+        self._config_listener_task.cancel()
+        await self._release_config_listener()
 
     async def _clean_cache(self):
         # Used to clear the message cache every now and then
@@ -171,49 +375,135 @@ class ModLog:
             await asyncio.sleep(60 * 20)
             _get_message.cache.clear()
 
+    async def _report_config_stats(self):
+        while True:
+            await asyncio.sleep(60 * 60)
+            saved = self._config_lookups - self._config_queries
+            log.info('modlog config cache saved %d queries in the past hour (%d lookups)',
+                     saved, self._config_lookups)
+
+            self.config_queries_saved_last_hour = saved
+            self._config_lookups = self._config_queries = 0
+
+    # Other processes (e.g. other shards) can change the config, so we need
+    # to know when to drop our cached copy.
+    def _on_config_notify(self, connection, pid, channel, payload):
+        _fetch_case_config.invalidate(None, int(payload))
+
+    async def _listen_for_config_changes(self):
+        # The listener goes away with the connection, so if it's lost we
+        # have to listen again on a new one.
+        while True:
+            connection = self._config_listener
+            if connection is None or connection.is_closed():
+                if connection is not None:
+                    log.warning('Lost the connection listening for modlog config changes, reconnecting.')
+                    await self._drop_config_listener()
+
+                try:
+                    self._config_listener = await self.bot.pool.acquire()
+                    await self._config_listener.add_listener(_CONFIG_CHANNEL, self._on_config_notify)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    log.exception('Failed to listen for modlog config changes, will try again later.')
+                    await self._drop_config_listener()
+                else:
+                    # Any changes made while we weren't listening were missed.
+                    _fetch_case_config.cache.clear()
+
+            await asyncio.sleep(_CONFIG_LISTENER_CHECK_INTERVAL)
+
+    async def _drop_config_listener(self):
+        # For when the connection is broken, there's no point in removing
+        # the listener from it first.
+        connection, self._config_listener = self._config_listener, None
+        if connection is not None:
+            with contextlib.suppress(Exception):
+                await self.bot.pool.release(connection)
+
+    async def _release_config_listener(self):
+        connection, self._config_listener = self._config_listener, None
+        if connection is None:
+            return
+
+        await connection.remove_listener(_CONFIG_CHANNEL, self._on_config_notify)
+        await self.bot.pool.release(connection)
+
     async def _get_case_config(self, guild_id, *, connection=None):
-        connection = connection or self.bot.pool
-        query = """SELECT channel_id, enabled, log_auto, dm_user, poll_audit_log, events
-                   FROM modlog_config
-                   WHERE guild_id = $1
-                """
-        row = await connection.fetchrow(query, guild_id)
-        return ModLogConfig(**row) if row else None
+        self._config_lookups += 1
+        if _fetch_case_config.get_key(None, guild_id) not in _fetch_case_config.cache:
+            self._config_queries += 1
 
-    async def _send_case(self, config, action, server, mod, targets, reason,
-                         *, extra=None, auto=False, connection=None):
+        return await _fetch_case_config(connection or self.bot.pool, guild_id)
+
+    async def _invalidate_case_config(self, guild_id, *, connection):
+        # Drop it here first. The notification will come back to us as well,
+        # but we want the next lookup to be correct right away.
+        _fetch_case_config.invalidate(None, guild_id)
+        await connection.execute('SELECT pg_notify($1, $2);', _CONFIG_CHANNEL, str(guild_id))
+
+    @staticmethod
+    def _should_log(config, action, auto=False):
         if not (config and config.enabled and config.channel_id):
-            return None
+            return False
 
         if not config.events & ActionFlag[action]:
-            return None
+            return False
 
-        if auto and not config.log_auto:
-            return None
+        return not auto or config.log_auto
 
+    @staticmethod
+    def _get_case_channel(config, server):
         channel = server.get_channel(config.channel_id)
         if not channel:
             raise ModLogError(f"The channel ID you specified ({config.channel_id}) doesn't exist.")
 
+        permissions = channel.permissions_for(server.me)
+        if not (permissions.send_messages and permissions.embed_links):
+            # Check this before reserving a case number, so we don't leave
+            # a hole in the case numbers.
+            raise ModLogError(
+                f"I can't send messages to {channel.mention}. Check my privileges pls..."
+            )
+
+        return channel
+
+    async def _send_case(self, config, action, server, mod, targets, reason,
+                         *, extra=None, auto=False, connection):
+        if not self._should_log(config, action, auto):
+            return
+
+        channel = self._get_case_channel(config, server)
+
         if auto:
             action = f'auto-{action}'
 
-        connection = connection or self.bot.pool
-        # Get the case number, this is why the guild_id is indexed.
-        count = await _get_number_of_cases(connection, server.id)
+        number = await _reserve_case_numbers(connection, server.id)
 
         # Send the case like normal
-        embed = self._create_embed(count + 1, action, mod, targets, reason, extra)
+        embed = self._create_embed(number, action, mod, targets, reason, extra)
 
         try:
             message = await channel.send(embed=embed)
         except discord.Forbidden:
+            await _release_case_numbers(connection, server.id, number)
             raise ModLogError(
                 f"I can't send messages to {channel.mention}. Check my privileges pls..."
             )
+        except:
+            await _release_case_numbers(connection, server.id, number)
+            raise
 
-        query = """INSERT INTO modlog (guild_id, channel_id, message_id, action, mod_id, reason, extra)
-                   VALUES ($1, $2, $3, $4, $5, $6, $7::jsonb)
+        query, args = self._case_query(server, channel, message, action, mod, reason, extra, number)
+        async with connection.transaction():
+            await self._insert_case(server.id, targets, query, args, connection=connection)
+
+    @staticmethod
+    def _case_query(server, channel, message, action, mod, reason, extra, number):
+        query = """INSERT INTO modlog (guild_id, channel_id, message_id, action,
+                                     mod_id, reason, extra, case_number)
+                   VALUES ($1, $2, $3, $4, $5, $6, $7::jsonb, $8)
                    RETURNING id
                 """
 
@@ -231,6 +521,7 @@ class ModLog:
             mod.id,
             reason,
             {'args': [delta]},
+            number,
         )
 
         return query, args
@@ -278,16 +569,12 @@ class ModLog:
                 """
             await connection.execute(q, *args, targets[0].id)
         else:
-            entry_id = await connection.execute(query, *args)
+            entry_id = await connection.fetchval(query, *args)
             columns = ('entry_id', 'user_id')
             to_insert = [(entry_id, t.id) for t in targets]
 
             await connection.copy_records_to_table('modlog_targets', columns=columns, records=to_insert)
 
-        # Because we've successfully added a new case by this point,
-        # the number of cases is no longer accurate.
-        _get_number_of_cases.invalidate(None, guild_id)
-
     async def _notify_user(self, config, action, server, user, targets, reason,
                            extra=None, auto=False):
         if action == 'massban':
@@ -363,6 +650,11 @@ class ModLog:
         if ctx.command_failed:
             return
 
+        # massban drops the members it failed to ban, if it couldn't ban
+        # anyone there's nothing to log.
+        if name == 'massban' and not ctx.args[3:]:
+            return
+
         targets = [m for m in ctx.args if isinstance(m, discord.Member)]
         # Will be set by warn in the event of auto-punishment
         auto = getattr(ctx, 'auto_punished', False)
@@ -393,25 +685,10 @@ class ModLog:
         #      the thing.
         await self._notify_user(*args, extra=extra, auto=auto)
 
-        try:
-            query_args = await self._send_case(
-                *args,
-                extra=extra,
-                auto=auto,
-                connection=ctx.db
-            )
-        except ModLogError as e:
-            pass
-        else:
-            if query_args:
-                query, args = query_args
-                await self._insert_case(
-                    connection=ctx.db,
-                    guild_id=ctx.guild.id,
-                    targets=targets,
-                    query=query,
-                    args=args
-                )
+        # The command might've released its connection, we need one for the transaction.
+        connection = await ctx.acquire()
+        with contextlib.suppress(ModLogError):
+            await self._send_case(*args, extra=extra, auto=auto, connection=connection)
 
     async def _poll_audit_log(self, guild, user, *, action):
         if (action, guild.id, user.id) in self._cache:
@@ -423,67 +700,75 @@ class ModLog:
                 # early out
                 return
 
-        config = await self._get_case_config(guild.id)
+        try:
+            poller = self._pollers[guild.id]
+        except KeyError:
+            poller = self._pollers[guild.id] = _AuditLogPoller(self, guild)
+
+        poller.add(action, user)
 
+    async def _log_audit_entries(self, guild, entries):
+        config = await self._get_case_config(guild.id)
         if not (config and config.poll_audit_log):
             return
 
-        # poll the audit log for some nice shit
-        # XXX: This doesn't catch softbans.
-        audit_action = discord.AuditLogAction[action]
-
-        # We'll try to be generous with delays because discord is a good service:tm:
-        # Seriously some guilds might have large latency with audit logs, meaning the
-        # could've added the entry way before the event is called.
-        after = datetime.utcnow() - timedelta(seconds=2)
+        entries = [(action, e) for action, e in entries if self._should_log(config, action)]
+        if not entries:
+            return
 
         try:
-            for attempt in range(3):
-                # This delay is here for two reasons:
-                # 1. We want to avoid rate-limiting the bot too hard.
-                # 2. We'll wait for long periods of time so that we can sufficiently
-                #    wait for the audit log entry to be added, we don't know what
-                #    the delay is, but we'll take a best guess
-                #
-                # It shouldn't take too long... Right, Discord?
-                await asyncio.sleep(0.5 * (attempt + 1))  # cruddy backoff
-
-                entry = await guild.audit_logs(action=audit_action, after=after).get(target=user)
-                if entry is not None:
-                    break
-
-            else:  # hooray for for-else
-                log.info('%s (ID: %d) in guild %s (ID: %d) never had an entry for event %r',
-                         user, user.id, guild, guild.id, action)
-                # We should just give up here. Because we need a non-None entry,
-                # and in the case of member_remove, the member could've just up
-                # and left the server, which means it won't make sense for it to
-                # be logged.
-                return
+            channel = self._get_case_channel(config, guild)
+        except ModLogError:
+            return
 
-        except discord.Forbidden:
-            return  # should not happen but this is here just in case it happens
+        # Reserve all the numbers in one go, we know how many cases we need.
+        pool = self.bot.pool
+        last = await _reserve_case_numbers(pool, guild.id, len(entries))
+        number = last - len(entries)
 
-        with contextlib.suppress(ModLogError):
-            targets = [entry.target]
-            query_args = await self._send_case(
-                config,
-                action,
-                guild,
-                entry.user,
-                targets,
-                entry.reason
-            )
+        # The numbers are handed out as the cases are sent, so a case that
+        # failed to send only leaves unused numbers at the end, which we can
+        # usually give back.
+        records = []
+        try:
+            for action, entry in entries:
+                embed = self._create_embed(number + 1, action, entry.user, [entry.target], entry.reason, None)
+                try:
+                    message = await channel.send(embed=embed)
+                except discord.HTTPException:
+                    log.info('Failed to send a case for %r in guild %s (ID: %d)', action, guild, guild.id)
+                    continue
+
+                number += 1
+                records.append((message.id, action, entry.user.id, entry.reason or '', number, entry.target.id))
+        finally:
+            # Even if we got interrupted, the cases that were sent have to be
+            # saved, otherwise their numbers would be reused.
+            if number != last:
+                await _release_case_numbers(pool, guild.id, last, last - number)
+            if records:
+                await self._insert_cases(guild.id, channel.id, records)
+
+    async def _insert_cases(self, guild_id, channel_id, records, *, connection=None):
+        # Bulk version of _insert_case, but only for single-target cases,
+        # which is always the case for audit log entries.
+        connection = connection or self.bot.pool
+
+        query = """WITH entries AS (
+                       INSERT INTO modlog (guild_id, channel_id, message_id, action,
+                                           mod_id, reason, extra, case_number)
+                       SELECT $1, $2, message_id, action, mod_id, reason, '{"args": [null]}', case_number
+                       FROM unnest($3::BIGINT[], $4::TEXT[], $5::BIGINT[], $6::TEXT[], $7::INTEGER[])
+                            AS x(message_id, action, mod_id, reason, case_number)
+                       RETURNING id, case_number
+                   )
+                   INSERT INTO modlog_targets (entry_id, user_id)
+                   SELECT entries.id, x.user_id
+                   FROM entries
+                   JOIN unnest($7::INTEGER[], $8::BIGINT[]) AS x(case_number, user_id) USING (case_number);
+                """
 
-            if query_args:
-                query, args = query_args
-                await self._insert_case(
-                    connection=self.bot.pool,
-                    guild_id=guild.id,
-                    targets=targets,
-                    query=query,
-                    args=args
-                )
+        await connection.execute(query, guild_id, channel_id, *map(list, zip(*records)))
 
     async def _poll_ban(self, guild, user, *, action):
         if ('softban', guild.id, user.id) in self._cache:
@@ -501,11 +786,17 @@ class ModLog:
     async def on_member_remove(self, member):
         await self._poll_audit_log(member.guild, member, action='kick')
 
+    async def on_guild_remove(self, guild):
+        _fetch_case_config.invalidate(None, guild.id)
+        poller = self._pollers.pop(guild.id, None)
+        if poller is not None:
+            poller.cancel()
+
     # ------------------- something ------------------
 
     async def _get_case(self, guild_id, num, *, connection):
-        query = 'SELECT * FROM modlog WHERE guild_id = $1 ORDER BY id OFFSET $2 LIMIT 1;'
-        return await connection.fetchrow(query, guild_id, num - 1)
+        query = 'SELECT * FROM modlog WHERE guild_id = $1 AND case_number = $2;'
+        return await connection.fetchrow(query, guild_id, num)
 
     # ----------------- Now for the commands. ----------------------
 
@@ -523,7 +814,7 @@ class ModLog:
 
         # Solving some weird nasty edge cases first
         if num is None:
-            num = await _get_number_of_cases(ctx.db, ctx.guild.id)
+            num = await _get_latest_case_number(ctx.db, ctx.guild.id)
             if not num:
                 return await ctx.send('There are no cases here.')
 
@@ -563,22 +854,35 @@ class ModLog:
         Only members who are in the server can be searched.
         """
 
-        # Major credit to Cute#0313 for helping me with the query for this. <3
-        query = """SELECT message_id, action, mod_id, reason
-                   FROM modlog, modlog_targets
-                   WHERE modlog.id = modlog_targets.entry_id
-                   AND guild_id = $1
-                   AND user_id = $2
-                   ORDER BY modlog.id;
+        query = """SELECT COUNT(*)
+                   FROM modlog_targets
+                   INNER JOIN modlog ON modlog.id = modlog_targets.entry_id
+                   WHERE guild_id = $1 AND user_id = $2;
                 """
+        total = await ctx.db.fetchval(query, ctx.guild.id, member.id)
 
-        results = await ctx.db.fetch(query, ctx.guild.id, member.id)
+        if not total:
+            yay = f'{member} has a clean record! Give them a medal or a cookie or something! ^.^'
+            return await ctx.send(yay)
+
+        # Major credit to Cute#0313 for helping me with the query for this. <3
+        #
+        # The entries are fetched a page at a time, using the last entry_id
+        # of the previous page, so this stays fast no matter how many cases
+        # the member has.
+        query = """SELECT entry_id, message_id, action, mod_id, reason
+                   FROM modlog_targets
+                   INNER JOIN modlog ON modlog.id = modlog_targets.entry_id
+                   WHERE guild_id = $1 AND user_id = $2 AND entry_id > $3
+                   ORDER BY entry_id
+                   LIMIT $4 OFFSET $5;
+                """
 
         get_time = discord.utils.snowflake_time
         get_user = ctx.bot.get_user
+        pool = ctx.pool
 
-        entries = []
-        for message_id, action, mod_id, reason in results:
+        def format_entry(message_id, action, mod_id, reason):
             action = _mod_actions[action]
             name = f'{action.emoji} {action.repr.title()}'
             formatted = (
@@ -588,17 +892,18 @@ class ModLog:
                 f"**Reason:** {truncate(reason, 512, '...')}\n"
                 "-------------------"
             )
-
-            entries.append((name, formatted))
-
-        if not entries:
-            yay = f'{member} has a clean record! Give them a medal or a cookie or something! ^.^'
-            return await ctx.send(yay)
-
-        pages = FieldPaginator(
-            ctx, entries,
-            title=f'Cases for {member}',
-            description=f'{member} has {len(entries)} cases',
+            return name, formatted
+
+        async def fetch(last_id, limit, *, offset=0):
+            # The connection is released once the paginator starts, so we
+            # have to go through the pool.
+            results = await pool.fetch(query, ctx.guild.id, member.id, last_id or 0, limit, offset)
+            return [(entry_id, format_entry(*rest)) for entry_id, *rest in results]
+
+        pages = KeysetFieldPaginator(
+            ctx, fetch,
+            total=total,
+            title=f'Cases for {member} ({total})',
             colour=member.colour,
             inline=False
         )
@@ -652,6 +957,7 @@ class ModLog:
                    RETURNING channel_id;
                 """
         channel_id, = await ctx.db.fetchrow(query, ctx.guild.id, enable)
+        await self._invalidate_case_config(ctx.guild.id, connection=ctx.db)
 
         message = ("Yay! What are the mods gonna do today? ^o^"
                    if enable else
@@ -685,6 +991,7 @@ class ModLog:
                    DO UPDATE SET channel_id = $2
                 """
         await ctx.db.execute(query, ctx.guild.id, channel.id)
+        await self._invalidate_case_config(ctx.guild.id, connection=ctx.db)
 
         await ctx.send(f'Ok, {channel.mention} it is then!')
 
@@ -717,6 +1024,7 @@ class ModLog:
         # For some reason I can't do DEFAULT | $2 so I have to do it manually.
         default = default_op(reduced)
         channel_id, events = await ctx.db.fetchrow(query, ctx.guild.id, reduced.value, default)
+        await self._invalidate_case_config(ctx.guild.id, connection=ctx.db)
 
         enabled_flags = ', '.join(f.name for f in ActionFlag if events & f)
 
@@ -790,6 +1098,7 @@ class ModLog:
                 """
 
         channel_id, = await ctx.db.fetchrow(query, ctx.guild.id, enable)
+        await self._invalidate_case_config(ctx.guild.id, connection=ctx.db)
 
         message = '\U0001f440' if enable else '\U0001f626'
         await self._check_modlog_channel(ctx, channel_id, message)
@@ -809,6 +1118,7 @@ class ModLog:
                 """
 
         channel_id, = await ctx.db.fetchrow(query, ctx.guild.id, dm_user)
+        await self._invalidate_case_config(ctx.guild.id, connection=ctx.db)
         await self._check_modlog_channel(ctx, channel_id, '\N{OK HAND SIGN}')
 
     # XXX: This command takes *way* too long.
@@ -4,6 +4,7 @@ import math
 from discord.ext import commands
 
 from ..utils import disambiguate
+from ..utils.memberstats import get_member_counts
 
 
 # These functions are usually used for doing ratings
@@ -52,11 +53,13 @@ class AntiBotCollections:
     """
     __hidden__ = True
 
+    def __init__(self, bot):
+        self.bot = bot
+
     # Determining if a server is a "bot collection server" is no easy task,
     # because there are a lot of edge cases in servers where it might not be
     # a bot farm but merely a testing server with only a few bots.
-    @staticmethod
-    def is_bot_farm(guild):
+    def is_bot_farm(self, guild):
         """Return True if the guilds is considered to be a "bot farm".
 
         Bot farms are guilds where the bot-to-member ratio is extremely high.
@@ -64,7 +67,7 @@ class AntiBotCollections:
         to the bot and could even pose problems as people in those bot farms
         like to hammer bots with a lot of commands.
         """
-        bots = sum(m.bot for m in guild.members)
+        bots = get_member_counts(self.bot, guild).bots
         total = guild.member_count
 
         return _ci_lower_bound(bots, total, 0.9) >= 0.42
@@ -94,7 +97,7 @@ class AntiBotCollections:
         A bot collection server is a server that has a high
         ratio of bots to members.
         """
-        bots = sum(m.bot for m in server.members)
+        bots = get_member_counts(ctx.bot, server).bots
         total = server.member_count
 
         bot_farm = self.is_bot_farm(server)
@@ -122,4 +125,4 @@ class AntiBotCollections:
 
 
 def setup(bot):
-    bot.add_cog(AntiBotCollections())
+    bot.add_cog(AntiBotCollections(bot))
@@ -0,0 +1,99 @@
+import logging
+
+from discord.ext import commands
+
+from ..utils import disambiguate
+from ..utils.guildindex import GuildIndex
+from ..utils.memberstats import MemberCounts
+
+log = logging.getLogger(__name__)
+
+
+class MemberStats:
+    """Keeps count of the humans, bots and statuses in every server.
+
+    The counts are only made the first time they're needed for a server,
+    and are then kept up to date from the member events.
+    """
+    __hidden__ = True
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._counts = GuildIndex(lambda guild: MemberCounts.from_members(guild.members))
+        self._counts.attach(bot)
+        # If this is on, every lookup is checked against a full recount.
+        # Only meant for debugging, as it defeats the point of all this.
+        self.self_check = False
+
+    def __unload(self):
+        self._counts.detach(self.bot)
+
+    async def __local_check(self, ctx):
+        return await ctx.bot.is_owner(ctx.author)
+
+    def get(self, guild):
+        """Return the MemberCounts of a guild."""
+        if self.self_check:
+            return self.verify(guild)
+        return self._counts[guild]
+
+    def verify(self, guild):
+        """Recount the members of a guild, fixing the counts if they're wrong."""
+        expected = MemberCounts.from_members(guild.members)
+        actual = self._counts.get(guild)
+        if actual is not None and actual != expected:
+            log.warning('Member counts for guild %s (ID: %s) drifted: expected %r, got %r',
+                        guild, guild.id, expected, actual)
+
+        self._counts[guild] = expected
+        return expected
+
+    # ------ Events -------
+
+    async def on_member_join(self, member):
+        counts = self._counts.get(member.guild)
+        if counts is not None:
+            counts.add(member)
+
+    async def on_member_remove(self, member):
+        counts = self._counts.get(member.guild)
+        if counts is not None:
+            counts.remove(member)
+
+    async def on_member_update(self, before, after):
+        counts = self._counts.get(after.guild)
+        if counts is not None:
+            counts.update(before, after)
+
+    # ------ Commands -------
+
+    @commands.command(name='checkmemberstats')
+    async def check_member_stats(self, ctx, *, server: disambiguate.Guild = None):
+        """Checks the member counts against a full recount.
+
+        If no server is given, every server is checked.
+        """
+        guilds = [server] if server else list(ctx.bot.guilds)
+        drifted = []
+        for guild in guilds:
+            # Servers that haven't been counted yet have nothing to check.
+            counts = self._counts.get(guild)
+            if counts is not None and counts != self.verify(guild):
+                drifted.append(guild)
+
+        if not drifted:
+            return await ctx.send(f'All {len(guilds)} server(s) have the right counts. \N{OK HAND SIGN}')
+
+        names = ', '.join(map(str, drifted[:10]))
+        await ctx.send(f'Fixed the counts for **{len(drifted)}** server(s): {names}')
+
+    @commands.command(name='memberstatsselfcheck')
+    async def toggle_self_check(self, ctx):
+        """Toggles checking the member counts on every lookup."""
+        self.self_check = not self.self_check
+        state = 'on' if self.self_check else 'off'
+        await ctx.send(f'Member count self-checking is now **{state}**.')
+
+
+def setup(bot):
+    bot.add_cog(MemberStats(bot))
@@ -1,5 +1,4 @@
 import collections
-import contextlib
 import datetime
 import discord
 import functools
@@ -9,7 +8,7 @@ import random
 import time
 
 from discord.ext import commands
-from itertools import accumulate, chain, count, dropwhile, starmap
+from itertools import accumulate, count, dropwhile, starmap
 from math import log10
 from more_itertools import chunked, sliced
 from operator import attrgetter
@@ -20,6 +19,8 @@ from ..utils.context_managers import temp_message
 from ..utils.converter import union
 from ..utils.examples import wrap_example
 from ..utils.formats import *
+from ..utils.guildindex import GuildIndex
+from ..utils.memberstats import get_member_counts
 from ..utils.misc import emoji_url, group_strings, str_join, nice_time, ordinal
 from ..utils.paginator import InteractiveSession, Paginator, trigger
 
@@ -186,8 +187,9 @@ class ServerPages(InteractiveSession):
 
         odfkeys = collections.OrderedDict.fromkeys
         statuses = odfkeys(['online', 'idle', 'dnd', 'offline'], 0)
-        statuses.update(collections.Counter(m.status.name for m in server.members if not m.bot))
-        statuses['bot_tag'] = sum(m.bot for m in server.members)
+        counts = get_member_counts(self.context.bot, server)
+        statuses.update(counts.human_statuses)
+        statuses['bot_tag'] = counts.bots
 
         if self.context.bot_has_permissions(external_emojis=True):
             formatter = self._format_statuses_with_emojis
@@ -355,12 +357,81 @@ def _format_activity(activity):
     return playing
 
 
+class _RoleIndex:
+    """Maps the roles of a guild to the IDs of the members who have them.
+
+    role.members goes through every member of the guild, which gets really
+    slow in big guilds, especially when it's done for several roles. This
+    is built once and then kept up to date from the member events.
+
+    The default role is left out, since everyone has it anyway.
+    """
+    __slots__ = ('_members',)
+
+    def __init__(self, guild):
+        self._members = collections.defaultdict(set)
+        for member in guild.members:
+            self.add(member)
+
+    def add(self, member, roles=None):
+        for role in member.roles if roles is None else roles:
+            if not role.is_default():
+                self._members[role.id].add(member.id)
+
+    def remove(self, member, roles=None):
+        for role in member.roles if roles is None else roles:
+            members = self._members.get(role.id)
+            if members is not None:
+                members.discard(member.id)
+
+    def update(self, before, after):
+        if before.roles == after.roles:
+            return
+
+        old, new = set(before.roles), set(after.roles)
+        self.remove(before, old - new)
+        self.add(after, new - old)
+
+    def remove_role(self, role):
+        self._members.pop(role.id, None)
+
+    def members_in(self, role):
+        if role.is_default():
+            return {m.id for m in role.guild.members}
+        return self._members.get(role.id, set())
+
+
 class Information:
     """Info related commands"""
 
     def __init__(self, bot):
         self.bot = bot
         self.process = psutil.Process()
+        self._role_indexes = GuildIndex(_RoleIndex)
+        self._role_indexes.attach(bot)
+
+    def __unload(self):
+        self._role_indexes.detach(self.bot)
+
+    async def on_member_join(self, member):
+        index = self._role_indexes.get(member.guild)
+        if index is not None:
+            index.add(member)
+
+    async def on_member_remove(self, member):
+        index = self._role_indexes.get(member.guild)
+        if index is not None:
+            index.remove(member)
+
+    async def on_member_update(self, before, after):
+        index = self._role_indexes.get(after.guild)
+        if index is not None:
+            index.update(before, after)
+
+    async def on_guild_role_delete(self, role):
+        index = self._role_indexes.get(role.guild)
+        if index is not None:
+            index.remove_role(role)
 
     @commands.command()
     @commands.guild_only()
@@ -635,11 +706,13 @@ class Information:
             sorted(member.roles, reverse=True)[:-1]  # remove @everyone
         )
 
-        padding = int(log10(max(map(len, (role.members for role in roles))))) + 1
+        members_in = self._role_indexes[ctx.guild].members_in
+        counts = [len(members_in(role)) for role in roles]
+        padding = int(log10(max(max(counts), 1))) + 1
 
         author_roles = ctx.author.roles
         get_name = functools.partial(bold_name, predicate=lambda r: r in author_roles)
-        hierarchy = [f"`{len(role.members) :<{padding}}\u200b` {get_name(role)}" for role in roles]
+        hierarchy = [f"`{count :<{padding}}\u200b` {get_name(role)}" for role, count in zip(roles, counts)]
         pages = Paginator(ctx, hierarchy, title=f'Roles in {ctx.guild} ({len(hierarchy)})')
         await pages.interact()
 
@@ -656,7 +729,7 @@ class Information:
 
 
     @staticmethod
-    async def _inrole(ctx, *roles, members, final='and'):
+    async def _inrole(ctx, *roles, member_ids, final='and'):
         joined_roles = human_join(map(str, roles), final=final)
         header = f'Members in role{"s" * (len(roles) != 1)} {joined_roles}'
         truncated_title = truncate(header, 256, '...')
@@ -664,14 +737,18 @@ class Information:
         total_color = map(sum, zip(*(role.colour.to_rgb() for role in roles)))
         average_color = discord.Colour.from_rgb(*map(round, (c / len(roles) for c in total_color)))
 
+        # The index only has IDs, and some of them might not be cached.
+        # Leave those out, so the total is right.
+        members = [m for m in map(ctx.guild.get_member, member_ids) if m is not None]
         if members:
-            entries = sorted(map(str, members))
-            # Make the author's name bold (assuming they have that role).
-            # We have to do it after the list was built, otherwise the author's name
-            # would be at the top.
-            with contextlib.suppress(ValueError):
-                index = entries.index(str(ctx.author))
-                entries[index] = f'**{entries[index]}**'
+            author = ctx.author
+            entries = [
+                # Make the author's name bold (assuming they have that role).
+                # We have to do it after sorting, otherwise the author's name
+                # would be at the top.
+                f'**{member}**' if member == author else str(member)
+                for member in sorted(members, key=str)
+            ]
         else:
             entries = ('There are no members :(', )
 
@@ -687,7 +764,8 @@ class Information:
         Only one role can be specified. For multiple roles, use `{prefix}inanyrole`
         or `{prefix}inallrole`.
         """
-        await self._inrole(ctx, role, members=role.members)
+        member_ids = self._role_indexes[ctx.guild].members_in(role)
+        await self._inrole(ctx, role, member_ids=member_ids)
 
     @varpos.require_va_command()
     @commands.guild_only()
@@ -698,8 +776,9 @@ class Information:
         If you don't want to mention a role and there's a space in the role name,
         you must put the role in quotes
         """
-        await self._inrole(ctx, *roles, members=set(chain.from_iterable(map(attrgetter('members'), roles))),
-                           final='or')
+        index = self._role_indexes[ctx.guild]
+        member_ids = set().union(*map(index.members_in, roles))
+        await self._inrole(ctx, *roles, member_ids=member_ids, final='or')
 
     @varpos.require_va_command()
     @commands.guild_only()
@@ -710,8 +789,10 @@ class Information:
         If you don't want to mention a role and there's a space in the role name,
         you must put that role in quotes
         """
-        role_members = (role.members for role in roles)
-        await self._inrole(ctx, *roles, members=set(next(role_members)).intersection(*role_members))
+        index = self._role_indexes[ctx.guild]
+        # Start from the smallest role so the intersection stays small.
+        smallest, *rest = sorted(map(index.members_in, roles), key=len)
+        await self._inrole(ctx, *roles, member_ids=smallest.intersection(*rest))
 
     @commands.command()
     @commands.guild_only()
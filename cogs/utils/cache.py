@@ -31,10 +31,24 @@ def cache(maxsize=128, make_key=default_key):
             cache = LRU(maxsize)
             get_stats = cache.get_stats
 
+        # key -> token of the latest call for that key that's still running.
+        # Invalidating a key drops its token, so a value that was fetched
+        # before the invalidation doesn't get stored after it.
+        pending = {}
+
         def wrap_and_store(key, coro):
+            token = pending[key] = object()
+
             async def func():
-                value = await coro
-                cache[key] = value
+                try:
+                    value = await coro
+                finally:
+                    fresh = pending.get(key) is token
+                    if fresh:
+                        del pending[key]
+
+                if fresh:
+                    cache[key] = value
                 return value
             return func()
 
@@ -69,8 +83,10 @@ def cache(maxsize=128, make_key=default_key):
             #
             # _sentinel = object()
             # return cache.pop(make_key(args, kwargs), _sentinel) is not _sentinel
+            key = make_key(args, kwargs)
+            pending.pop(key, None)
             try:
-                del cache[make_key(args, kwargs)]
+                del cache[key]
             except KeyError:
                 return False
             else:
@@ -0,0 +1,59 @@
+class GuildIndex:
+    """Per-guild data that's built from the member list the first time
+    it's needed, and then kept up to date by whoever owns it.
+
+    factory is called with the guild to build the data. Whenever a guild's
+    member list is (re)loaded, its data is dropped so it gets rebuilt from
+    the new list. attach() registers the listeners that do that, and
+    detach() removes them, so call them in the cog's __init__ and __unload.
+    """
+    __slots__ = ('_factory', '_data')
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._data = {}
+
+    def __getitem__(self, guild):
+        try:
+            return self._data[guild.id]
+        except KeyError:
+            data = self._data[guild.id] = self._factory(guild)
+            return data
+
+    def __setitem__(self, guild, data):
+        self._data[guild.id] = data
+
+    def get(self, guild):
+        """Return the data of a guild, or None if it hasn't been built.
+
+        This is what the member events should use, there's no point in
+        updating (or building) something that no one has asked for yet.
+        """
+        return self._data.get(guild.id)
+
+    def reset(self, guild):
+        self._data.pop(guild.id, None)
+
+    def clear(self):
+        self._data.clear()
+
+    # ------ Listeners -------
+
+    async def _on_ready(self):
+        self.clear()
+
+    async def _on_guild_reset(self, guild):
+        self.reset(guild)
+
+    def _listeners(self):
+        yield self._on_ready, 'on_ready'
+        for name in ['on_guild_join', 'on_guild_available', 'on_guild_remove']:
+            yield self._on_guild_reset, name
+
+    def attach(self, bot):
+        for func, name in self._listeners():
+            bot.add_listener(func, name)
+
+    def detach(self, bot):
+        for func, name in self._listeners():
+            bot.remove_listener(func, name)
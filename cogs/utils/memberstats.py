@@ -0,0 +1,73 @@
+import collections
+
+
+class MemberCounts:
+    """How many humans and bots are in a guild, and their statuses.
+
+    These are kept up to date by the MemberStats cog, so things that need
+    these numbers don't have to go through every member of the guild.
+    """
+    __slots__ = ('human_statuses', 'bot_statuses')
+
+    def __init__(self):
+        self.human_statuses = collections.Counter()
+        self.bot_statuses = collections.Counter()
+
+    def __eq__(self, other):
+        if not isinstance(other, MemberCounts):
+            return NotImplemented
+        # Counters with zeroes in them aren't equal to ones without them.
+        return (+self.human_statuses == +other.human_statuses
+                and +self.bot_statuses == +other.bot_statuses)
+
+    def __repr__(self):
+        return f'<MemberCounts humans={self.humans} bots={self.bots} online={self.online}>'
+
+    @classmethod
+    def from_members(cls, members):
+        self = cls()
+        for member in members:
+            self.add(member)
+        return self
+
+    def _statuses_for(self, member):
+        return self.bot_statuses if member.bot else self.human_statuses
+
+    def add(self, member):
+        self._statuses_for(member)[member.status.name] += 1
+
+    def remove(self, member):
+        self._statuses_for(member)[member.status.name] -= 1
+
+    def update(self, before, after):
+        if before.status is not after.status:
+            self.remove(before)
+            self.add(after)
+
+    @property
+    def humans(self):
+        return sum(self.human_statuses.values())
+
+    @property
+    def bots(self):
+        return sum(self.bot_statuses.values())
+
+    @property
+    def total(self):
+        return self.humans + self.bots
+
+    @property
+    def online(self):
+        return self.human_statuses['online'] + self.bot_statuses['online']
+
+
+def get_member_counts(bot, guild):
+    """Return the MemberCounts of a guild.
+
+    If the MemberStats cog isn't loaded the members will have to be
+    counted, which is slow for big guilds.
+    """
+    tracker = bot.get_cog('MemberStats')
+    if tracker is None:
+        return MemberCounts.from_members(guild.members)
+    return tracker.get(guild)
@@ -2,6 +2,7 @@ import asyncio
 import collections
 import contextlib
 import functools
+import inspect
 import itertools
 import re
 
@@ -390,11 +391,11 @@ class Paginator(InteractiveSession):
 
     def _goto_parse_input(self, content):
         try:
-            index = int(content)
+            index = int(content) - 1
         except ValueError:
             return None
 
-        return self.page_at(index - 1)
+        return index if 0 <= index < len(self._pages) else None
 
     # XXX: This needs to be fully refactored for the reaction-less paginator
     #      or possibly not used at all.
@@ -403,19 +404,21 @@ class Paginator(InteractiveSession):
     async def goto(self):
         """Go to page"""
         ctx = self.context
-        return_result = None
+        index = None
         user_message = None
 
         def check(m):
-            nonlocal return_result, user_message
+            nonlocal index, user_message
             if not (m.channel.id == self._channel.id and m.author.id == ctx.author.id):
                 return False
 
+            # This has to stay synchronous, the page itself is made once
+            # we're sure we're going there.
             result = self._goto_parse_input(m.content)
             if result is None:
                 return False
 
-            return_result = result
+            index = result
             user_message = m
             return True
 
@@ -456,7 +459,11 @@ class Paginator(InteractiveSession):
             result = done.pop().result()
 
             if isinstance(result, discord.Message):
-                return return_result
+                page = self.page_at(index)
+                # Subclasses might have page_at as a coroutine.
+                if inspect.isawaitable(page):
+                    page = await page
+                return page
             # The user probably removed a reaction.
             return None
         finally:
@@ -493,3 +500,80 @@ class FieldPaginator(Paginator):
         return embed
 
 EmbedFieldPages = FieldPaginator  # backwards compat
+
+# -------------- Lazy Pages ----------------------
+
+class KeysetPaginator(Paginator):
+    """Similar to Paginator, but fetches the pages lazily as they're needed.
+
+    Instead of the entries, this takes a coroutine function, fetch, and the
+    total number of entries. fetch is called with the key of the last entry
+    of the previous page (None for the first page) and the number of entries
+    to get, and should return a list of (key, entry) pairs in order.
+
+    Pages that are jumped to (like the last page) don't have a key yet, so
+    fetch is called with None and an offset keyword argument, the number of
+    entries to skip, instead.
+
+    Only a few pages are kept around at a time, so this is meant for things
+    that are too big to be fetched all at once, like rows in a large table.
+    """
+    def __init__(self, ctx, fetch, *, total, per_page=15, max_cached_pages=5, **kwargs):
+        super().__init__(ctx, (), per_page=per_page, **kwargs)
+        self._fetch = fetch
+        self._total = total
+        self._per_page = per_page
+
+        # Paginator only ever uses len(self._pages), so a range is enough.
+        self._pages = range(max(1, -(-total // per_page)))
+
+        # self._keys[i] is the key that page i starts after, for the pages
+        # we know it for.
+        self._keys = {0: None}
+        self._cached_pages = collections.OrderedDict()
+        self._max_cached_pages = max_cached_pages
+
+    async def _fetch_page(self, idx):
+        try:
+            key = self._keys[idx]
+        except KeyError:
+            # Walking there would take a query for every page in between,
+            # so skip straight to it instead.
+            rows = await self._fetch(None, self._per_page, offset=idx * self._per_page)
+        else:
+            rows = await self._fetch(key, self._per_page)
+
+        if rows:
+            self._keys[idx + 1] = rows[-1][0]
+
+        page = self._cached_pages[idx] = [entry for _, entry in rows]
+        if len(self._cached_pages) > self._max_cached_pages:
+            self._cached_pages.popitem(last=False)
+        return page
+
+    async def get_page(self, idx):
+        """Return the entries at a given page, fetching it if necessary."""
+        with contextlib.suppress(KeyError):
+            self._cached_pages.move_to_end(idx)
+            return self._cached_pages[idx]
+
+        return await self._fetch_page(idx)
+
+    async def page_at(self, idx):
+        if not 0 <= idx < len(self._pages):
+            return None
+
+        page = await self.get_page(idx)
+        if not page:
+            return None
+
+        self._index = idx
+        return self.create_embed(page)
+
+    @property
+    def total(self):
+        return self._total
+
+
+class KeysetFieldPaginator(KeysetPaginator, FieldPaginator):
+    """Similar to KeysetPaginator, but uses the fields instead of the description"""
@@ -0,0 +1,49 @@
+import asyncio
+import concurrent.futures
+import functools
+import os
+
+
+_pool = None
+
+
+def get_process_pool():
+    """Return the process pool shared by the CPU-heavy stuff, like rendering
+    images or generating puzzles.
+
+    Those would otherwise hog the default thread pool (and the GIL) which
+    everything else uses.
+    """
+    global _pool
+    if _pool is None:
+        _pool = concurrent.futures.ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 1) - 1))
+    return _pool
+
+
+def shutdown_process_pool(wait=True):
+    """Shut down the process pool, if it was ever made.
+
+    This blocks until the workers are done if wait is True, so don't call
+    it from the event loop directly. The next call to get_process_pool
+    makes a new pool.
+    """
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
+
+
+async def run_in_process(func, *args, loop=None, **kwargs):
+    """Run a function in the process pool.
+
+    func and its arguments must be picklable, so no lambdas or closures.
+    If the pool broke (e.g. a worker got killed), it's recreated once.
+    """
+    global _pool
+    loop = loop or asyncio.get_event_loop()
+    call = functools.partial(func, *args, **kwargs)
+    try:
+        return await loop.run_in_executor(get_process_pool(), call)
+    except concurrent.futures.process.BrokenProcessPool:
+        _pool = None
+        return await loop.run_in_executor(get_process_pool(), call)
@@ -21,6 +21,7 @@ from more_itertools import always_iterable
 from . import context, errors
 
 from cogs.utils.jsonf import JSONFile
+from cogs.utils.processes import shutdown_process_pool
 from cogs.utils.scheduler import DatabaseScheduler
 from cogs.utils.time import duration_units
 from cogs.utils.transformdict import CIDict
@@ -230,6 +231,21 @@ class Chiaki(commands.Bot):
         self.dispatch(entry.event, entry)
 
     async def close(self):
+        # Give the cogs a chance to save anything they haven't saved yet.
+        for name, cog in list(self.cogs.items()):
+            shutdown = getattr(cog, 'shutdown', None)
+            if shutdown is None:
+                continue
+
+            try:
+                await shutdown()
+            except Exception:
+                log.exception('Shutting down cog %s failed.', name)
+
+        # Done after the cogs, in case any of them still need it. The workers
+        # might be in the middle of something, so don't block the loop.
+        await self.loop.run_in_executor(None, shutdown_process_pool)
+
         await self.session.close()
         self._game_task.cancel()
         await super().close()
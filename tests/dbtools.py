@@ -0,0 +1,44 @@
+"""Helpers for the tests that need a Postgres database.
+
+Set CHIAKI_TEST_DSN to a postgresql:// URL to run them. Each test gets its
+tables in a throwaway schema, which is dropped afterwards.
+"""
+
+import asyncio
+import os
+import uuid
+
+DSN = os.environ.get('CHIAKI_TEST_DSN')
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+async def with_pool(schema_sql, func, *, size):
+    """Make a pool whose connections use a fresh schema with schema_sql run
+    in it, then call func with that pool.
+    """
+    import asyncpg
+
+    schema = f'chiaki_test_{uuid.uuid4().hex}'
+    setup = await asyncpg.connect(DSN)
+    try:
+        await setup.execute(f'CREATE SCHEMA {schema};')
+        pool = await asyncpg.create_pool(DSN, min_size=size, max_size=size,
+                                         server_settings={'search_path': schema})
+        try:
+            async with pool.acquire() as connection:
+                await connection.execute(schema_sql)
+            return await func(pool)
+        finally:
+            await pool.close()
+    finally:
+        await setup.execute(f'DROP SCHEMA {schema} CASCADE;')
+        await setup.close()
@@ -0,0 +1,85 @@
+"""Self-play harness for the Dots and Boxes AI.
+
+Plays a lot of games, the AI against a random player and against itself,
+checking that every move it makes is legal, and reports how often it wins
+and how long its moves take. It takes a while, so it's not part of the
+tests. Run it from the root of the repo:
+
+    python -m tests.selfplay_dotsboxes --games 5000
+"""
+
+import argparse
+import collections
+import multiprocessing
+import random
+import time
+
+from cogs.games import dotsboxes
+
+
+def play(args):
+    """Play one game, returning the winner (None for a tie) and the time
+    each of the AI's moves took. A player of None plays randomly.
+    """
+    seed, size, players, time_limit = args
+    rng = random.Random(seed)
+    board = dotsboxes.Board(*size)
+    move_times = []
+
+    while not board.is_finished():
+        legal = sorted(board.legal_moves())
+        if players[board.turn] is None:
+            move = rng.choice(legal)
+        else:
+            start = time.perf_counter()
+            move = dotsboxes.best_move(board, time_limit=time_limit)
+            move_times.append(time.perf_counter() - start)
+
+            if move not in legal:
+                raise AssertionError(f'illegal move {move!r} in game {seed}')
+
+        board.move(move)
+
+    width, height = size
+    if sum(score for _, score in board.scoreboard()) != width * height:
+        raise AssertionError(f'boxes went missing in game {seed}')
+
+    return board.winner(), move_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=2000, help='games per matchup')
+    parser.add_argument('--width', type=int, default=3)
+    parser.add_argument('--height', type=int, default=3)
+    parser.add_argument('--time-limit', type=float, default=0.02, help='seconds per AI move')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    size = args.width, args.height
+    matchups = {
+        'ai vs random': ('ai', None),
+        'random vs ai': (None, 'ai'),
+        'ai vs ai': ('ai', 'ai'),
+    }
+
+    with multiprocessing.Pool(args.processes) as pool:
+        for name, players in matchups.items():
+            jobs = [(seed, size, players, args.time_limit) for seed in range(args.games)]
+
+            start = time.perf_counter()
+            results = pool.map(play, jobs, chunksize=16)
+            elapsed = time.perf_counter() - start
+
+            wins = collections.Counter(winner for winner, _ in results)
+            move_times = [t for _, times in results for t in times]
+            print(
+                f'{name}: {args.games} games in {elapsed:.1f}s, '
+                f'first player won {wins[0]}, second won {wins[1]}, tied {wins[None]}; '
+                f'{len(move_times)} AI moves, mean {sum(move_times) / len(move_times) * 1000:.1f}ms, '
+                f'max {max(move_times) * 1000:.1f}ms'
+            )
+
+
+if __name__ == '__main__':
+    main()
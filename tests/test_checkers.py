@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+try:
+    from cogs.games import checkers
+except ImportError as e:  # discord.py rewrite isn't installed
+    pytest.skip(f"can't import the checkers cog ({e!r})", allow_module_level=True)
+
+
+def _perft(position, depth):
+    if not depth:
+        return 1
+
+    return sum(
+        _perft(checkers._apply_move(*position, move), depth - 1)
+        for move in checkers._legal_moves(*position)
+    )
+
+
+# Known move counts for English draughts from the starting position.
+@pytest.mark.parametrize('depth, expected', enumerate([7, 49, 302, 1469, 7361, 36768], 1))
+def test_perft(depth, expected):
+    assert _perft(checkers.Board().position, depth) == expected
+
+
+def _position(black=(), white=(), kings=(), turn=checkers.WHITE):
+    def bits(squares):
+        return sum(1 << checkers._to_i(checkers.X.index(s[0]), checkers.Y.index(s[1])) for s in squares)
+    return bits(black), bits(white), bits(kings), turn
+
+
+def _moves(position):
+    return sorted(map(checkers._move_to_str, checkers._legal_moves(*position)))
+
+
+def test_jumps_are_forced():
+    position = _position(black=['d4'], white=['c3', 'g3'])
+    assert _moves(position) == ['c3e5']
+
+
+def test_multi_jump():
+    position = _position(black=['d4', 'd6'], white=['c3'])
+    assert _moves(position) == ['c3e5c7']
+
+
+def test_promotion_ends_the_move():
+    # Jumping into the back row kings the piece, which ends the move, so
+    # it can't carry on by jumping b7 with its new powers.
+    position = _position(black=['d7', 'b7'], white=['e6'])
+    assert _moves(position) == ['e6c8']
+
+    black, white, kings, turn = checkers._apply_move(*position, checkers._legal_moves(*position)[0])
+    assert kings == white == _position(white=['c8'])[1]
+    assert black == _position(black=['b7'])[0]
+    assert turn == checkers.BLACK
+
+
+def test_board_move_and_game_over():
+    board = checkers.Board()
+    with pytest.raises(ValueError):
+        board.move('a1b2')
+
+    move = next(board.legal_moves())
+    board.move(move)
+    assert board.half_moves == 1
+    assert board.turn == checkers.BLACK
+
+    assert checkers.Board().is_game_over() is False
+    # No black pieces, so black can't move.
+    lost = checkers.Board()
+    lost._black = 0
+    lost.turn = checkers.BLACK
+    assert lost.is_game_over()
+
+
+def test_best_move_is_legal():
+    board = checkers.Board()
+    for _ in range(20):
+        if board.is_game_over():
+            break
+
+        move = board.best_move(time_limit=0.05)
+        assert move in set(board.legal_moves())
+        board.move(move)
+
+
+def test_search_benchmark():
+    # A fixed depth, so the number of nodes is the same every time and
+    # only the speed changes.
+    position = checkers.Board().position
+    search = checkers._Search(deadline=float('inf'))
+
+    start = time.perf_counter()
+    _, move = search.negamax(position, 8, 0, -checkers._WIN_SCORE - 1, checkers._WIN_SCORE + 1)
+    elapsed = time.perf_counter() - start
+
+    print(f'searched {search.nodes} nodes in {elapsed:.2f}s ({search.nodes / elapsed:.0f} nodes/s)')
+    assert move in checkers._legal_moves(*position)
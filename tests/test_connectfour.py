@@ -0,0 +1,161 @@
+import random
+import time
+
+import pytest
+
+try:
+    from cogs.games import connectfour as c4
+except ImportError as e:  # discord.py rewrite isn't installed
+    pytest.skip(f"can't import the connect four cog ({e!r})", allow_module_level=True)
+
+X, O = c4.Tile.X, c4.Tile.O
+
+
+def _cells(bb):
+    return {
+        (col, row) for col in range(c4.NUM_COLS) for row in range(c4.NUM_ROWS)
+        if bb >> (col * c4._H1 + row) & 1
+    }
+
+
+def _has_line(cells):
+    return any(
+        all((col + i * dx, row + i * dy) in cells for i in range(c4.WINNING_LENGTH))
+        for col, row in cells
+        for dx, dy in [(1, 0), (0, 1), (1, 1), (1, -1)]
+    )
+
+
+def _completes_line(cells, cell):
+    col, row = cell
+    cells = cells | {cell}
+    return any(
+        all((col + (start + i) * dx, row + (start + i) * dy) in cells for i in range(c4.WINNING_LENGTH))
+        for dx, dy in [(1, 0), (0, 1), (1, 1), (1, -1)]
+        for start in range(1 - c4.WINNING_LENGTH, 1)
+    )
+
+
+def _random_boards(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        board = c4.Board()
+        for piece in [X, O] * (c4.NUM_ROWS * c4.NUM_COLS // 2):
+            if board.winner is not None or rng.random() < 0.05:
+                break
+
+            column = rng.choice([c for c in range(c4.NUM_COLS) if board._mask & c4._COLUMNS[c] != c4._COLUMNS[c]])
+            board.place(column, piece)
+        yield board
+
+
+def test_is_win_matches_brute_force():
+    for board in _random_boards(500):
+        for bb in board._boards.values():
+            assert c4._is_win(bb) == _has_line(_cells(bb))
+
+
+def test_threats_match_brute_force():
+    for board in _random_boards(200, seed=1):
+        mask = board._mask
+        empty = _cells(c4._FULL & ~mask)
+        for bb in board._boards.values():
+            cells = _cells(bb)
+            expected = {cell for cell in empty if _completes_line(cells, cell)}
+            assert _cells(c4._threats(bb, mask)) == expected
+
+
+def test_place_stacks_and_fills_columns():
+    board = c4.Board()
+    for row in range(c4.NUM_ROWS):
+        board.place(3, X if row % 2 else O)
+        assert (3, row) in _cells(board._mask)
+
+    with pytest.raises(ValueError):
+        board.place(3, X)
+    with pytest.raises(IndexError):
+        board.place(c4.NUM_COLS, X)
+
+
+def test_vertical_win():
+    board = c4.Board()
+    for _ in range(c4.WINNING_LENGTH - 1):
+        board.place(0, X)
+        board.place(1, O)
+
+    assert board.winner is None
+    board.place(0, X)
+    assert board.winner is X
+
+
+def test_best_move_wins_and_blocks():
+    board = c4.Board()
+    for column in [0, 1, 2]:
+        board.place(column, X)
+        board.place(column, O)
+
+    # X to move can win in column 3.
+    assert board.best_move(X, time_limit=0.2) == 3
+    # O to move has to block it.
+    assert board.best_move(O, time_limit=0.2) == 3
+
+
+def test_best_move_is_legal_in_self_play():
+    board = c4.Board()
+    for piece in [X, O] * (c4.NUM_ROWS * c4.NUM_COLS // 2):
+        if board.winner is not None:
+            break
+
+        board.place(board.best_move(piece, time_limit=0.05), piece)
+
+    assert board.winner is not None or board.is_full()
+
+
+def _perft(position, mask, depth):
+    # position has the stones of the player to move, like in the search.
+    if not depth:
+        return 1
+
+    possible = (mask + c4._BOTTOM) & c4._FULL
+    total = 0
+    for column in c4._COLUMNS:
+        move = possible & column
+        if not move:
+            continue
+        if depth == 1 or c4._is_win(position | move):
+            # Nothing comes after a win.
+            total += 1
+        else:
+            total += _perft(position ^ mask, mask | move, depth - 1)
+    return total
+
+
+# No one can win before the 7th move, and no column can be full before
+# the 6th, so it's just 7 ** depth until then. On the 7th move, the
+# 7 games with the same column played 6 times only have 6 moves.
+@pytest.mark.parametrize('depth, expected', [(d, c4.NUM_COLS ** d) for d in range(1, 7)] + [(7, 7 ** 7 - 7)])
+def test_perft(depth, expected):
+    assert _perft(0, 0, depth) == expected
+
+
+def test_perft_benchmark():
+    depth = 7
+    start = time.perf_counter()
+    nodes = _perft(0, 0, depth)
+    elapsed = time.perf_counter() - start
+
+    print(f'perft({depth}) = {nodes} in {elapsed:.2f}s ({nodes / elapsed:.0f} nodes/s)')
+    assert nodes == 7 ** 7 - 7
+
+
+def test_search_benchmark():
+    # A fixed depth, so the number of nodes is the same every time and
+    # only the speed changes.
+    search = c4._Search(deadline=float('inf'))
+
+    start = time.perf_counter()
+    _, column = search.negamax(0, 0, 10, -c4._WIN_SCORE - 1, c4._WIN_SCORE + 1)
+    elapsed = time.perf_counter() - start
+
+    print(f'searched {search.nodes} nodes in {elapsed:.2f}s ({search.nodes / elapsed:.0f} nodes/s)')
+    assert 0 <= column < c4.NUM_COLS
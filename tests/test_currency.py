@@ -0,0 +1,82 @@
+"""Stress test for the balance cache. Needs a database, see dbtools."""
+
+import asyncio
+import random
+import types
+
+import pytest
+
+from dbtools import DSN, run, with_pool
+
+if DSN is None:
+    pytest.skip('CHIAKI_TEST_DSN is not set', allow_module_level=True)
+
+pytest.importorskip('asyncpg')
+currency = pytest.importorskip('cogs.fun.currency')
+
+USERS = 20
+STARTING_BALANCE = 1000
+
+
+async def _with_balances(tmp_path, func):
+    async def scenario(pool):
+        bot = types.SimpleNamespace(loop=asyncio.get_event_loop(), pool=pool)
+        balances = currency._BalanceCache(bot, journal=str(tmp_path / 'journal'), flush_interval=0.05)
+        try:
+            return await func(pool, balances)
+        finally:
+            await balances.close()
+
+    return await with_pool(currency.__schema__, scenario, size=10)
+
+
+def test_no_lost_updates(tmp_path):
+    rng = random.Random(0)
+
+    async def scenario(pool, balances):
+        for user_id in range(USERS):
+            await balances.change(user_id, STARTING_BALANCE)
+
+        async def give():
+            giver, recipient = rng.sample(range(USERS), 2)
+            return 'give', giver, await balances.transfer(giver, recipient, rng.randint(1, 300))
+
+        async def bet():
+            user_id, amount = rng.randrange(USERS), rng.randint(1, 300)
+            payout = rng.choice([0, amount * 2])
+            result = await balances.change(user_id, payout - amount, required=amount)
+            return 'bet', payout - amount, result
+
+        # Gives and bets all at once, on the same few users, while the
+        # cache is flushing in the background.
+        results = await asyncio.gather(*(rng.choice([give, bet])() for _ in range(2000)))
+        await balances.flush()
+
+        cached = {user_id: await balances.get(user_id) for user_id in range(USERS)}
+        stored = dict(await pool.fetch('SELECT user_id, amount FROM currency;'))
+        gives = await pool.fetchval('SELECT COUNT(*) FROM givelog;')
+        return results, cached, stored, gives
+
+    results, cached, stored, gives = run(_with_balances(tmp_path, scenario))
+
+    settled = sum(delta for kind, delta, result in results if kind == 'bet' and result is not None)
+    assert sum(stored.values()) == USERS * STARTING_BALANCE + settled
+    assert cached == stored
+    assert min(stored.values()) >= 0
+    assert gives == sum(1 for kind, _, result in results if kind == 'give' and result is not None)
+
+
+def test_journal_is_replayed(tmp_path):
+    async def first(pool, balances):
+        await balances.change(1, 500)
+        # Pretend we crashed before the change was flushed.
+        balances.detach()
+
+        bot = types.SimpleNamespace(loop=asyncio.get_event_loop(), pool=pool)
+        replayed = currency._BalanceCache(bot, journal=str(tmp_path / 'journal'))
+        try:
+            return await replayed.get(1), await pool.fetchval('SELECT amount FROM currency WHERE user_id = 1;')
+        finally:
+            await replayed.close()
+
+    assert run(_with_balances(tmp_path, first)) == (500, 500)
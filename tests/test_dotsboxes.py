@@ -0,0 +1,114 @@
+import random
+import time
+
+import pytest
+
+try:
+    from cogs.games import dotsboxes
+except ImportError as e:  # discord.py rewrite isn't installed
+    pytest.skip(f"can't import the dots and boxes cog ({e!r})", allow_module_level=True)
+
+
+def _play(board, players, seed=0):
+    """Play out a game, returning the moves made. A player of None plays
+    randomly, otherwise it's called with the board to get a move.
+    """
+    rng = random.Random(seed)
+    moves = []
+    while not board.is_finished():
+        player = players[board.turn]
+        legal = set(board.legal_moves())
+        move = rng.choice(sorted(legal)) if player is None else player(board)
+        assert move in legal
+
+        board.move(move)
+        moves.append(move)
+    return moves
+
+
+def _ai(board):
+    return dotsboxes.best_move(board, time_limit=0.05)
+
+
+@pytest.mark.parametrize('size', [(2, 2), (3, 3), (4, 3)])
+def test_self_play(size):
+    board = dotsboxes.Board(*size)
+    moves = _play(board, [_ai, _ai])
+
+    width, height = size
+    assert len(moves) == (height + 1) * width + height * (width + 1)
+    assert sum(score for _, score in board.scoreboard()) == width * height
+
+
+def test_beats_random():
+    wins = 0
+    for seed in range(10):
+        board = dotsboxes.Board()
+        _play(board, [_ai, None], seed=seed)
+        wins += board.winner() == 0
+
+    assert wins >= 8
+
+
+def _needs_textsize():
+    # The labels are drawn with ImageDraw.textsize, which is gone in Pillow 10.
+    if not hasattr(dotsboxes.ImageDraw.ImageDraw, 'textsize'):
+        pytest.skip('needs a Pillow older than 10')
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_incremental_render_matches_full_render(seed):
+    _needs_textsize()
+
+    board = dotsboxes.ImageBoard()
+    moves = []
+    rng = random.Random(seed)
+    while not board.is_finished():
+        move = rng.choice(sorted(board.legal_moves()))
+        board.move(move)
+        moves.append(move)
+        # Draw every move, like the game does.
+        board.image()
+
+    fresh = dotsboxes.ImageBoard()
+    for move in moves:
+        fresh.move(move)
+
+    assert board.image().tobytes() == fresh.image().tobytes()
+
+
+def test_image_file_is_a_png():
+    _needs_textsize()
+
+    board = dotsboxes.ImageBoard()
+    board.move('a1b1')
+    assert board.image_file().getvalue().startswith(b'\x89PNG')
+
+
+def test_render_benchmark():
+    _needs_textsize()
+
+    games = 20
+    renders = encodes = 0
+    render_time = encode_time = 0
+    rng = random.Random(0)
+
+    for _ in range(games):
+        board = dotsboxes.ImageBoard()
+        while not board.is_finished():
+            board.move(rng.choice(sorted(board.legal_moves())))
+
+            # Drawing and encoding are timed separately, the encoding is
+            # done in another process in the game.
+            start = time.perf_counter()
+            board.image()
+            render_time += time.perf_counter() - start
+            renders += 1
+
+            start = time.perf_counter()
+            board.image_file()
+            encode_time += time.perf_counter() - start
+            encodes += 1
+
+    print(f'{renders / render_time:.0f} renders/s, {encodes / encode_time:.0f} PNG encodes/s '
+          f'over {games} games')
@@ -0,0 +1,51 @@
+"""Benchmark for the images from ->flip."""
+
+import random
+import time
+
+import pytest
+from PIL import Image
+
+try:
+    from cogs.fun import currency
+except ImportError as e:  # discord.py rewrite isn't installed
+    pytest.skip(f"can't import the currency cog ({e!r})", allow_module_level=True)
+
+
+@pytest.fixture(scope='module')
+def coins():
+    coins = currency._CoinImages()
+    yield coins
+    coins.close()
+
+
+def _flip(coins, number):
+    # One coin just sends the file as is, like ->flip does.
+    if number == 1:
+        return coins.file(random.choice(currency.SIDES)).fp
+    return coins.flip_image(number)[1].fp
+
+
+@pytest.mark.parametrize('number', [1, 25, 100])
+def test_flip_benchmark(coins, number):
+    random.seed(0)
+    rounds = 50
+
+    # The first flip of a size scales the coins, which is only done once.
+    _flip(coins, number)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fp = _flip(coins, number)
+    elapsed = time.perf_counter() - start
+    print(f'flipping {number} coins: {elapsed / rounds * 1000:.2f}ms per image')
+
+    with Image.open(fp) as image:
+        assert image.width <= max(coins.size, currency.MAX_FLIP_IMAGE_WIDTH)
+
+
+def test_flip_message(coins):
+    random.seed(0)
+    message, _ = coins.flip_image(25)
+    counts = [int(word) for word in message.split() if word.isdigit()]
+    assert sum(counts) == 25
@@ -0,0 +1,93 @@
+import random
+import time
+
+import pytest
+
+try:
+    from cogs.games import minesweeper
+except ImportError as e:  # discord.py rewrite isn't installed
+    pytest.skip(f"can't import the minesweeper cog ({e!r})", allow_module_level=True)
+
+
+def _mines(width, height, indices):
+    mines = bytearray(width * height)
+    for i in indices:
+        mines[i] = 1
+    return mines
+
+
+def test_reveal_opens_empty_area():
+    board = minesweeper.Board(5, 5, 1)
+    # Mine in the corner, opening the other corner opens everything else.
+    board.place_mines([0], 24)
+
+    assert board.is_solved()
+    assert not board.is_visible(0, 0)
+
+
+def test_hitting_a_mine():
+    board = minesweeper.Board(5, 5, 1)
+    board.place_mines([0], 24)
+    with pytest.raises(minesweeper.HitMine):
+        board.show(0, 0)
+
+
+def test_first_click_is_safe():
+    random.seed(0)
+    for _ in range(50):
+        board = minesweeper.Board(9, 9, 10)
+        board.show(4, 4)
+        assert not any(board.is_mine(4 + dx, 4 + dy) for dx in range(-1, 2) for dy in range(-1, 2))
+        assert board.is_visible(4, 4)
+
+
+def test_is_solvable():
+    # The start opens up everything but the mine.
+    assert minesweeper._is_solvable(3, 3, _mines(3, 3, [0]), 8)
+    # Two cells, one mine, and nothing to tell them apart: a coin flip.
+    assert not minesweeper._is_solvable(2, 3, _mines(2, 3, [0]), 5)
+
+
+@pytest.mark.parametrize('level', [(9, 9, 10), (12, 12, 25)])
+def test_no_guess_boards(level):
+    random.seed(0)
+    width, height, mines = level
+    for _ in range(5):
+        placed, start = minesweeper.generate_no_guess_board(width, height, mines)
+        assert len(set(placed)) == mines
+        assert minesweeper._is_solvable(width, height, _mines(width, height, placed), start)
+
+        board = minesweeper.Board(width, height, mines)
+        board.place_mines(placed, start)
+        assert board._counts[start] == 0
+
+
+def test_reveal_benchmark():
+    random.seed(0)
+    width, height, mines = 13, 13, 20
+    boards = 300
+    shows = 0
+    show_time = render_time = 0
+
+    for _ in range(boards):
+        board = minesweeper.Board(width, height, mines)
+        # Open every safe cell, the first one usually opens up a big area.
+        cells = [(x, y) for y in range(height) for x in range(width)]
+        random.shuffle(cells)
+        for x, y in cells:
+            if board.is_visible(x, y) or board._placed and board.is_mine(x, y):
+                continue
+
+            start = time.perf_counter()
+            board.show(x, y)
+            show_time += time.perf_counter() - start
+            shows += 1
+
+            start = time.perf_counter()
+            str(board)
+            render_time += time.perf_counter() - start
+
+        assert board.is_solved()
+
+    print(f'{shows / show_time:.0f} reveals/s, {shows / render_time:.0f} renders/s '
+          f'over {boards} {width}x{height} boards')
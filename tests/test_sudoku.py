@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+try:
+    from cogs.games import sudoku
+except ImportError as e:  # discord.py rewrite isn't installed
+    pytest.skip(f"can't import the sudoku cog ({e!r})", allow_module_level=True)
+
+
+def _is_valid_solution(grid):
+    rows = [grid[i:i + 9] for i in range(0, 81, 9)]
+    columns = [grid[i::9] for i in range(9)]
+    boxes = [
+        [grid[(y + dy) * 9 + x + dx] for dy in range(3) for dx in range(3)]
+        for y in range(0, 9, 3) for x in range(0, 9, 3)
+    ]
+    return all(sorted(unit) == list(range(1, 10)) for unit in rows + columns + boxes)
+
+
+def test_filled_grid_is_valid():
+    random.seed(0)
+    for _ in range(10):
+        assert _is_valid_solution(sudoku._filled_grid())
+
+
+def test_count_solutions():
+    random.seed(0)
+    grid = sudoku._filled_grid()
+    assert sudoku.count_solutions(grid) == 1
+    assert sudoku.count_solutions([sudoku.EMPTY] * 81) == 2
+
+    # A repeat in a row can't be solved at all.
+    broken = grid[:]
+    broken[1] = broken[0]
+    assert sudoku.count_solutions(broken) == 0
+
+
+@pytest.mark.parametrize('level', [sudoku.BEGINNER, sudoku.INTERMEDIATE, sudoku.EXPERT])
+def test_generated_puzzles(level):
+    random.seed(level)
+    puzzle = sudoku.generate_puzzle(level)
+    assert sudoku.count_solutions(puzzle) == 1
+
+    (clue_range, techniques) = sudoku._LEVEL_RULES[level]
+    if clue_range is not None:
+        low, high = clue_range
+        assert low <= 81 - puzzle.count(sudoku.EMPTY) <= high
+    assert sudoku._LogicSolver(puzzle).grade() in techniques
+
+
+def test_validate_and_incremental_counts():
+    random.seed(0)
+    solution = sudoku._filled_grid()
+    puzzle = solution[:]
+    puzzle[0] = puzzle[1] = sudoku.EMPTY
+    board = sudoku.Board(puzzle, sudoku.BEGINNER)
+
+    with pytest.raises(ValueError):
+        board.validate()
+
+    # Put them in the wrong way round first.
+    board[0, 0], board[1, 0] = solution[1], solution[0]
+    assert board.is_full()
+    with pytest.raises(ValueError):
+        board.validate()
+
+    board[0, 0], board[1, 0] = solution[0], solution[1]
+    board.validate()
+
+    board.clear()
+    assert not board.is_full()
+
+
+def test_pack_round_trip():
+    random.seed(0)
+    board = sudoku.Board(sudoku.generate_puzzle(sudoku.BEGINNER), sudoku.BEGINNER)
+    x, y = next((x, y) for y in range(9) for x in range(9) if (x, y) not in board._clues)
+    board[x, y] = 5
+
+    data = board.to_bytes()
+    assert len(data) == 1 + sudoku._PACKED_CELLS_SIZE + sudoku._PACKED_CLUES_SIZE
+    assert sudoku._unpack_board(data) == (board._board, board._clues, sudoku.BEGINNER)
+
+    loaded = sudoku.Board.from_data({'data': data})
+    assert loaded._board == board._board
+    assert loaded._clues == board._clues
+    assert str(loaded) == str(board)
@@ -0,0 +1,105 @@
+import functools
+import itertools
+
+import pytest
+
+try:
+    from cogs.games import ttt
+except ImportError as e:  # discord.py rewrite isn't installed
+    pytest.skip(f"can't import the tic-tac-toe cog ({e!r})", allow_module_level=True)
+
+
+def _won(cells):
+    return any(cells[a] == cells[b] == cells[c] != 0 for a, b, c in ttt.WIN_COMBINATIONS)
+
+
+@functools.lru_cache(maxsize=None)
+def _minimax(cells, piece):
+    # Plain minimax straight from the cells, scored the same way as the
+    # tables: from the point of view of the player to move, the sooner the
+    # win (or the later the loss) the bigger the score.
+    empty = [i for i, cell in enumerate(cells) if not cell]
+    if _won(cells):
+        return -(len(empty) + 1)
+    if not empty:
+        return 0
+
+    return max(
+        -_minimax(cells[:i] + (piece, ) + cells[i + 1:], 3 - piece)
+        for i in empty
+    )
+
+
+def _reachable(first):
+    seen = set()
+    stack = [((0, ) * ttt.SIZE, first)]
+    while stack:
+        cells, piece = stack.pop()
+        if (cells, piece) in seen:
+            continue
+
+        seen.add((cells, piece))
+        if _won(cells):
+            continue
+
+        for i, cell in enumerate(cells):
+            if not cell:
+                stack.append((cells[:i] + (piece, ) + cells[i + 1:], 3 - piece))
+    return seen
+
+
+def _code(cells):
+    return sum(cell * power for cell, power in zip(cells, ttt._POWERS))
+
+
+@pytest.mark.parametrize('first', [1, 2])
+def test_tables_match_minimax(first):
+    for cells, piece in _reachable(first):
+        code = _code(cells)
+        expected = _minimax(cells, piece)
+        assert ttt._SCORES[piece - 1][code] == expected, cells
+
+        if _won(cells) or 0 not in cells:
+            # Game over, there's no best move.
+            continue
+
+        best = ttt._BEST[piece - 1][code]
+        for i, cell in enumerate(cells):
+            if cell:
+                assert not best >> i & 1
+                continue
+
+            child = -_minimax(cells[:i] + (piece, ) + cells[i + 1:], 3 - piece)
+            assert bool(best >> i & 1) == (child == expected), (cells, i)
+
+
+def test_empty_board_is_a_draw():
+    assert ttt._SCORES[0][0] == ttt._SCORES[1][0] == 0
+
+
+def test_perfect_play_draws():
+    for first in ttt.TILES:
+        board = ttt.Board()
+        for thing in itertools.islice(itertools.cycle([first, *set(ttt.TILES) - {first}]), ttt.SIZE):
+            board.place(board.best_move(thing), thing)
+            assert board.winner() is None
+
+        assert board.is_full()
+
+
+def test_takes_the_win():
+    x, o = ttt.TILES
+    board = ttt.Board()
+    for cell, thing in [(0, x), (3, o), (1, x), (4, o)]:
+        board.place(cell, thing)
+
+    assert board.best_move(x) == 2
+    board.place(2, x)
+    assert board.winner() == x
+
+
+def test_place_on_taken_cell():
+    board = ttt.Board()
+    board.place(4, ttt.TILES[0])
+    with pytest.raises(IndexError):
+        board.place(4, ttt.TILES[1])
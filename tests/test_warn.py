@@ -0,0 +1,84 @@
+"""Load test for the warn query. Needs a database, see dbtools."""
+
+import asyncio
+import datetime
+import time
+
+import pytest
+
+from dbtools import DSN, run, with_pool
+
+if DSN is None:
+    pytest.skip('CHIAKI_TEST_DSN is not set', allow_module_level=True)
+
+pytest.importorskip('asyncpg')
+moderator = pytest.importorskip('cogs.moderation.moderator')
+
+GUILD_ID = 1
+MOD_ID = 2
+TIMEOUT = datetime.timedelta(minutes=15)
+
+
+def _with_pool(func, *, size):
+    return with_pool(moderator.__schema__, func, size=size)
+
+
+async def _warn(pool, user_id, now):
+    async with pool.acquire() as connection:
+        return await moderator._add_warn(connection, GUILD_ID, user_id, MOD_ID, 'test', TIMEOUT, now)
+
+
+def test_concurrent_warns():
+    users = 500
+
+    async def scenario(pool):
+        now = datetime.datetime.utcnow()
+        start = time.perf_counter()
+        results = await asyncio.gather(*(_warn(pool, user_id, now) for user_id in range(users)))
+        elapsed = time.perf_counter() - start
+
+        count = await pool.fetchval('SELECT COUNT(*) FROM warn_entries;')
+        return results, count, elapsed
+
+    results, count, elapsed = run(_with_pool(scenario, size=20))
+    print(f'{users} warns in {elapsed:.2f}s ({users / elapsed:.0f} warns/s)')
+
+    assert count == users
+    assert all(inserted for _, _, inserted in results)
+    assert all(warns == 0 for warns, _, _ in results)
+
+
+def test_same_member_warned_at_once():
+    user_id = 42
+
+    async def scenario(pool):
+        now = datetime.datetime.utcnow()
+        results = await asyncio.gather(*(_warn(pool, user_id, now) for _ in range(20)))
+        count = await pool.fetchval('SELECT COUNT(*) FROM warn_entries;')
+        return results, count
+
+    results, count = run(_with_pool(scenario, size=20))
+
+    # Only the first one should get past the cooldown.
+    assert count == 1
+    assert sum(inserted for _, _, inserted in results) == 1
+
+
+def test_warn_cooldown_and_window():
+    user_id = 42
+
+    async def scenario(pool):
+        now = datetime.datetime.utcnow()
+        first = await _warn(pool, user_id, now - datetime.timedelta(minutes=5))
+        too_soon = await _warn(pool, user_id, now - datetime.timedelta(minutes=5, seconds=-30))
+        second = await _warn(pool, user_id, now)
+        # Outside the timeout, so the earlier warns don't count anymore.
+        later = await _warn(pool, user_id, now + TIMEOUT + datetime.timedelta(minutes=1))
+        return first, too_soon, second, later
+
+    first, too_soon, second, later = run(_with_pool(scenario, size=1))
+
+    assert first['inserted'] and first['warns'] == 0
+    assert not too_soon['inserted'] and too_soon['warns'] == 1
+    assert second['inserted'] and second['warns'] == 1
+    assert later['inserted'] and later['warns'] == 0